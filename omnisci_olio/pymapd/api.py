@@ -5,6 +5,8 @@
 import re
 import pandas as pd
 
+from . import trace
+
 
 def select(
     con,
@@ -40,6 +42,11 @@ def select(
         If IPC and GPU: ``cudf.DataFrame``
         If not IPC and with no GPU: ``pandas.DataFrame``
     """
+    with trace.span("select", ipc=ipc, gpu_device=gpu_device):
+        return _select(con, operation, parameters, first_n, ipc, gpu_device)
+
+
+def _select(con, operation, parameters, first_n, ipc, gpu_device):
     if ipc in (None, False) and gpu_device is None:
         return pd.read_sql(operation, con)
         # cursor = con.execute(operation)
@@ -52,6 +59,33 @@ def select(
         return con.select_ipc_gpu(operation, parameters, gpu_device, first_n)
 
 
+def select_iter(con, operation, chunk_rows=100000, arrow=False):
+    """
+    Executes the SQL operation and yields the result in chunks, ``pandas.DataFrame``
+    (or ``pyarrow.RecordBatch`` if ``arrow``) of at most ``chunk_rows`` rows,
+    so that no more than one chunk of rows is converted to a DataFrame at a time.
+    The driver receives the whole result on execute, so memory still grows with the result size,
+    for bounded memory use ``OmniSciDBClient.query_iter`` with a key, which fetches each chunk by its own query.
+    """
+    cursor = con.cursor()
+    with trace.span("select_iter.execute"):
+        cursor.execute(operation)
+    columns = [d.name for d in cursor.description]
+    while True:
+        with trace.span("select_iter.fetch", chunk_rows=chunk_rows) as s:
+            rows = cursor.fetchmany(chunk_rows)
+            s.set(rows=len(rows))
+        if not rows:
+            break
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        if arrow:
+            import pyarrow as pa
+
+            yield pa.RecordBatch.from_pandas(df, preserve_index=False)
+        else:
+            yield df
+
+
 def status(con):
     s = con._client.get_status(con.sessionid)
     return pd.DataFrame([t.__dict__ for t in s])
@@ -69,7 +103,8 @@ def copy_from(con, copy_from_sql):
     If it fails to do too many rejected records, raise an exception.
     If it succeeds, return a dict with loaded, rejected, and time in ms.
     """
-    rs = con.execute(copy_from_sql).fetchall()
+    with trace.span("copy_from"):
+        rs = con.execute(copy_from_sql).fetchall()
     msg = rs[0][0]
     if msg.startswith("Loaded:"):
         m = re.match(
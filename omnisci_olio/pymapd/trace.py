@@ -0,0 +1,373 @@
+"""
+Lightweight timing spans of client operations, with counts of the Thrift calls made in each span.
+
+Tracing is off by default, and a disabled `span()` returns a shared no-op context manager.
+Enable it with one or more exporters, which receive each finished root span and its children:
+
+    from omnisci_olio.pymapd import trace
+
+    spans = trace.MemoryExporter()
+    trace.enable(spans, trace.JsonLinesExporter("/tmp/olio_trace.jsonl"))
+    with connect() as con:
+        con.store(expr, "t")
+    print(spans.to_dataframe())
+
+or by env var OMNISCI_OLIO_TRACE_FILE, the path of a JSON lines file.
+
+`CallbackExporter` passes OpenTelemetry style span dicts to a function,
+and `OpenTelemetryExporter` records the spans with the `opentelemetry` API, if installed.
+"""
+
+import os
+import json
+import threading
+from time import perf_counter_ns, time_ns
+from itertools import count
+
+
+class _State:
+    enabled = False
+    exporters = []
+
+
+_state = _State()
+_local = threading.local()
+_ids = count(1)
+_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "attributes",
+        "parent",
+        "children",
+        "span_id",
+        "trace_id",
+        "start_ns",
+        "end_ns",
+        "_perf_start",
+        "duration_ns",
+        "thrift_calls",
+        "thread",
+        "error",
+    )
+
+    def __init__(self, name, attributes, parent):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.children = []
+        self.span_id = next(_ids)
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.start_ns = time_ns()
+        self._perf_start = perf_counter_ns()
+        self.end_ns = None
+        self.duration_ns = None
+        self.thrift_calls = 0
+        self.thread = threading.current_thread().name
+        self.error = None
+
+    @property
+    def duration_s(self):
+        return None if self.duration_ns is None else self.duration_ns / 1e9
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def walk(self, depth=0):
+        """
+        Yield (depth, span) for this span and its descendants, parents first.
+        """
+        yield depth, self
+        for child in self.children:
+            yield from child.walk(depth + 1)
+
+    def to_dict(self, depth=0):
+        return dict(
+            name=self.name,
+            trace_id=self.trace_id,
+            span_id=self.span_id,
+            parent_span_id=None if self.parent is None else self.parent.span_id,
+            depth=depth,
+            start_ns=self.start_ns,
+            end_ns=self.end_ns,
+            duration_s=self.duration_s,
+            thrift_calls=self.thrift_calls,
+            thread=self.thread,
+            error=self.error,
+            attributes=self.attributes,
+        )
+
+
+class _NoopSpan:
+    """
+    Returned by span() when tracing is disabled.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_noop = _NoopSpan()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _SpanContext:
+    __slots__ = ("name", "attributes", "span")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        stack = _stack()
+        parent = stack[-1] if stack else None
+        self.span = Span(self.name, self.attributes, parent)
+        if parent is not None:
+            parent.children.append(self.span)
+        stack.append(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        span = self.span
+        span.duration_ns = perf_counter_ns() - span._perf_start
+        span.end_ns = span.start_ns + span.duration_ns
+        if exc_val is not None:
+            span.error = f"{exc_type.__name__}: {exc_val}"
+        stack = _stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        if span.parent is not None:
+            span.parent.thrift_calls += span.thrift_calls
+        else:
+            _export(span)
+        return False
+
+
+def span(name, **attributes):
+    """
+    Context manager timing the block as a span, nested in the current span of this thread.
+    """
+    if not _state.enabled:
+        return _noop
+    return _SpanContext(name, attributes)
+
+
+def current_span():
+    if not _state.enabled:
+        return None
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def _export(root):
+    for exporter in list(_state.exporters):
+        try:
+            exporter.export(root)
+        except Exception:
+            # tracing must never break the traced operation
+            pass
+
+
+def enable(*exporters):
+    """
+    Enable tracing, adding exporters for the finished root spans.
+    """
+    with _lock:
+        _state.exporters = _state.exporters + list(exporters)
+        _state.enabled = True
+
+
+def disable():
+    """
+    Disable tracing and remove the exporters.
+    """
+    with _lock:
+        _state.enabled = False
+        exporters, _state.exporters = _state.exporters, []
+    for exporter in exporters:
+        close = getattr(exporter, "close", None)
+        if close is not None:
+            close()
+
+
+def is_enabled():
+    return _state.enabled
+
+
+########################
+# Thrift call counts
+########################
+
+
+class _CountingClient:
+    """
+    Proxy of a Thrift client that counts the calls in the current span.
+    """
+
+    def __init__(self, client):
+        self._olio_client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._olio_client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if _state.enabled:
+                stack = _stack()
+                if stack:
+                    stack[-1].thrift_calls += 1
+            return attr(*args, **kwargs)
+
+        return call
+
+
+def instrument(con):
+    """
+    Count the Thrift calls of a pymapd/pyomnisci connection, or of the connection of an Ibis backend.
+    Calling it again on the same connection does nothing.
+    """
+    con = getattr(con, "con", con)
+    client = getattr(con, "_client", None)
+    if client is not None and not isinstance(client, _CountingClient):
+        con._client = _CountingClient(client)
+    return con
+
+
+########################
+# Exporters
+########################
+
+
+class MemoryExporter:
+    """
+    Keeps the finished root spans in memory, the most recent `max_spans`.
+    """
+
+    def __init__(self, max_spans=10000):
+        self.max_spans = max_spans
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, root):
+        with self._lock:
+            self.spans.append(root)
+            if len(self.spans) > self.max_spans:
+                del self.spans[: len(self.spans) - self.max_spans]
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        with self._lock:
+            roots = list(self.spans)
+        rows = []
+        for root in roots:
+            for depth, s in root.walk():
+                d = s.to_dict(depth)
+                d.update(d.pop("attributes"))
+                rows.append(d)
+        return pd.DataFrame(rows)
+
+
+class JsonLinesExporter:
+    """
+    Appends one JSON object per span to a file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "a")
+        self._lock = threading.Lock()
+
+    def export(self, root):
+        lines = [json.dumps(s.to_dict(depth), default=str) for depth, s in root.walk()]
+        with self._lock:
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def otel_dict(s):
+    """
+    A span as a dict with the field names of the OpenTelemetry span data model.
+    """
+    attributes = {k: v if isinstance(v, (str, bool, int, float)) else str(v) for k, v in s.attributes.items()}
+    attributes["omnisci.thrift_calls"] = s.thrift_calls
+    attributes["thread.name"] = s.thread
+    return dict(
+        name=s.name,
+        trace_id=f"{s.trace_id:032x}",
+        span_id=f"{s.span_id:016x}",
+        parent_span_id=None if s.parent is None else f"{s.parent.span_id:016x}",
+        start_time_unix_nano=s.start_ns,
+        end_time_unix_nano=s.end_ns,
+        status_code="ERROR" if s.error else "OK",
+        status_message=s.error,
+        attributes=attributes,
+    )
+
+
+class CallbackExporter:
+    """
+    Calls callback(span_dict) for each span, parents first, see `otel_dict`.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def export(self, root):
+        for _, s in root.walk():
+            self.callback(otel_dict(s))
+
+
+class OpenTelemetryExporter:
+    """
+    Records the spans with an OpenTelemetry tracer, by default `opentelemetry.trace.get_tracer("omnisci_olio")`.
+    """
+
+    def __init__(self, tracer=None):
+        from opentelemetry import trace as otel_trace
+
+        self._otel_trace = otel_trace
+        self.tracer = tracer or otel_trace.get_tracer("omnisci_olio")
+
+    def _record(self, s, context):
+        d = otel_dict(s)
+        otel_span = self.tracer.start_span(
+            s.name, context=context, attributes=d["attributes"], start_time=s.start_ns
+        )
+        if s.error:
+            otel_span.set_status(self._otel_trace.Status(self._otel_trace.StatusCode.ERROR, s.error))
+        child_context = self._otel_trace.set_span_in_context(otel_span)
+        for child in s.children:
+            self._record(child, child_context)
+        otel_span.end(end_time=s.end_ns)
+
+    def export(self, root):
+        self._record(root, None)
+
+
+if os.environ.get("OMNISCI_OLIO_TRACE_FILE"):
+    enable(JsonLinesExporter(os.environ["OMNISCI_OLIO_TRACE_FILE"]))
@@ -1,3 +1,4 @@
 """OmniSci Olio schema: object API to construct table DDL"""
 
 from .schema import *
+from .migrate import MigrationPlan, plan_migration, parse_ddl_columns
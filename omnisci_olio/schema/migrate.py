@@ -0,0 +1,183 @@
+"""
+Plan the ALTER TABLE statements to migrate an existing table to a Table definition.
+
+The live definition is read once, from the text of SHOW CREATE TABLE, and compared with the Table:
+
+- columns with `is_drop` are dropped, in one statement
+- columns with `rename_from` are renamed
+- columns with a different datatype or encoding are converted by adding a new column,
+    copying the values with CAST, dropping the old column and renaming the new one,
+    which moves the column to the end of the table
+- new columns are added, in one statement
+
+Columns of the live table that are not in the Table are left as is.
+Column constraints of the live table, NOT NULL and DEFAULT, are not compared, and are kept.
+"""
+
+import re
+
+from .schema import ModelOperation
+
+
+def _split_top_level(text):
+    """
+    Split text at commas that are not inside parentheses or quotes.
+    """
+    parts = []
+    depth = 0
+    start = 0
+    quoted = False
+    for i, ch in enumerate(text):
+        if ch == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+_constraint_re = re.compile(r"\s+(NOT\s+NULL|NULL|DEFAULT\s+('(?:[^']|'')*'|\S+))(?=\s|$)", re.IGNORECASE)
+
+
+def strip_constraints(type_text):
+    """
+    The datatype of a column definition, without NOT NULL and DEFAULT.
+    """
+    return _constraint_re.sub("", " " + type_text).strip()
+
+
+def normalize_type(type_text):
+    return " ".join(str(type_text).upper().replace(", ", ",").split())
+
+
+def parse_ddl_columns(ddl_text):
+    """
+    Return a dict of column name to datatype text, in table order, from the text of SHOW CREATE TABLE,
+    without the NOT NULL and DEFAULT constraints.
+    """
+    start = ddl_text.index("(")
+    depth = 0
+    quoted = False
+    for end in range(start, len(ddl_text)):
+        if ddl_text[end] == "'":
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ddl_text[end] == "(":
+            depth += 1
+        elif ddl_text[end] == ")":
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        raise Exception(f"Unbalanced parentheses in DDL: {ddl_text}")
+
+    columns = {}
+    for item in _split_top_level(ddl_text[start + 1 : end]):
+        if re.match("(SHARD KEY|SHARED DICTIONARY) ", item, re.IGNORECASE):
+            continue
+        m = re.match('"?([A-Za-z0-9_]+)"? +(.*)$', item, re.DOTALL)
+        if m is None:
+            raise Exception(f'Can not parse column "{item}"')
+        columns[m[1]] = strip_constraints(m[2].strip())
+    return columns
+
+
+class MigrationPlan:
+    """
+    steps - list of ModelOperation, to run in order
+    """
+
+    def __init__(self, table, steps):
+        self.table = table
+        self.steps = steps
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def compile(self):
+        return ";\n".join(s.compile() for s in self.steps) + (";" if self.steps else "")
+
+    def __str__(self):
+        if not self.steps:
+            return f"-- {self.table.name}: no changes"
+        return self.compile()
+
+
+def plan_migration(table, live_ddl):
+    """
+    table - the Table definition
+    live_ddl - text of SHOW CREATE TABLE of the existing table,
+        or a dict of its column names to datatype text, or to None to not convert types
+    Returns a MigrationPlan.
+    """
+    live = dict(live_ddl) if isinstance(live_ddl, dict) else parse_ddl_columns(live_ddl)
+    name = table.name
+    drops = []
+    renames = []
+    conversions = []
+    adds = []
+
+    # names of the live columns after the drops and renames
+    present = set(live)
+    for col in table.columns:
+        if col.is_drop:
+            if col.name in present:
+                drops.append(col)
+                present.discard(col.name)
+
+    for col in table.columns:
+        if col.is_drop:
+            continue
+        if col.name in present:
+            live_type = live.get(col.name)
+        elif col.rename_from is not None and col.rename_from in present:
+            renames.append(col)
+            present.discard(col.rename_from)
+            present.add(col.name)
+            live_type = live.get(col.rename_from)
+        else:
+            adds.append(col)
+            continue
+        # a shared dictionary column shows as TEXT, without its encoding
+        if col.shared_dict is None and live_type is not None and "SHARED" not in live_type.upper():
+            if normalize_type(live_type) != normalize_type(col.datatype):
+                conversions.append((col, live_type))
+
+    steps = []
+    if drops:
+        cols = ", ".join(f"DROP COLUMN {c.name}" for c in drops)
+        steps.append(ModelOperation(table, f"ALTER TABLE {name} {cols}", "DROP"))
+    for col in renames:
+        steps.append(col.rename())
+    for col, live_type in conversions:
+        if col.datatype.typename == "GEOMETRY" or "GEOMETRY" in live_type.upper():
+            raise Exception(
+                f"Can not convert column {name}.{col.name} from {live_type} to {col.datatype}, recreate the table"
+            )
+        tmp = f"{col.name}__migrate"
+        steps += [
+            ModelOperation(col, f"ALTER TABLE {name} ADD COLUMN {tmp} {col.datatype}", "ALTER TYPE"),
+            ModelOperation(col, f"UPDATE {name} SET {tmp} = CAST({col.name} AS {_cast_type(col.datatype)})", "ALTER TYPE"),
+            ModelOperation(col, f"ALTER TABLE {name} DROP COLUMN {col.name}", "ALTER TYPE"),
+            ModelOperation(col, f"ALTER TABLE {name} RENAME COLUMN {tmp} TO {col.name}", "ALTER TYPE"),
+        ]
+    if adds:
+        cols = ", ".join(c.compile() for c in adds)
+        steps.append(ModelOperation(table, f"ALTER TABLE {name} ADD ({cols})", "DEFINE"))
+    return MigrationPlan(table, steps)
+
+
+def _cast_type(datatype):
+    # the type to CAST to, without the encoding, which is given by the new column
+    return re.sub(" ENCODING .*$", "", str(datatype))
@@ -33,7 +33,7 @@ class ModelOperation:
         return self.sql
     
     def model_table(self):
-        if self.model.hasattr('table'):
+        if hasattr(self.model, 'table'):
             return self.model.table
         else:
             return self.model
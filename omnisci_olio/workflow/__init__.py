@@ -4,3 +4,6 @@ OmniSci Olio workflow: high-level API client for workflow, schema API to constru
 
 from .client import connect, log_info, log_warning, log_error, clean_name, clean_names
 from .client import connect as omnisci_task
+from .pool import get_pool, close_pools
+from .aio import AsyncOmniSciDBClient
+from .pipeline import Pipeline
@@ -0,0 +1,97 @@
+"""
+asyncio client for OmniSciDB, running each operation on a pooled session in a thread,
+so that independent queries and updates run concurrently.
+
+For example:
+
+    async with AsyncOmniSciDBClient(url, concurrency=8) as con:
+        counts = await asyncio.gather(*[con.count(t) for t in tables])
+"""
+
+import os
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .pool import get_pool
+from .client import OmniSciDBClient
+
+
+class AsyncOmniSciDBClient:
+    """
+    Coroutine versions of the OmniSciDBClient operations.
+
+    Each operation runs in a clone of the OmniSciDBClient on its own session from the pool for uri,
+    with the same log, update_key and count semantics as the sync client.
+    concurrency - maximum operations running at the same time, by default the pool max_sessions
+    client_kwargs - passed to OmniSciDBClient, e.g. log_uri, default_severity, count_strategy
+    """
+
+    def __init__(self, uri=None, concurrency=None, **client_kwargs):
+        uri = uri or os.environ.get("OMNISCI_DB_URL")
+        if uri is None:
+            raise Exception(
+                "A DB connection URL must be provided by one of: `uri` param, or env var `OMNISCI_DB_URL`"
+            )
+        self.pool = get_pool(uri)
+        self.concurrency = concurrency or self.pool.max_sessions
+        # holds the log connection and caches shared by the operations
+        self.client = OmniSciDBClient(uri=uri, pool=self.pool, **client_kwargs)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="omnisci_olio_aio"
+        )
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close(exc_type, exc_val, exc_tb)
+
+    async def close(self, exc_type=None, exc_val=None, exc_tb=None):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, functools.partial(self._executor.shutdown, wait=True))
+        await loop.run_in_executor(
+            None, functools.partial(self.client.__exit__, exc_type, exc_val, exc_tb)
+        )
+
+    def _call(self, method, args, kwargs):
+        with self.client.session_clone() as client:
+            return getattr(client, method)(*args, **kwargs)
+
+    async def run(self, method, *args, **kwargs):
+        """
+        Run any OmniSciDBClient method by name on a pooled session.
+        """
+        if self._semaphore is None:
+            # created here to bind to the running event loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(self._call, method, args, kwargs)
+            )
+
+    def table(self, name):
+        """
+        Ibis table expression to build queries, not recorded as a source, pass `sources` to store.
+        """
+        return self.client.table_cache.table(self.client.con, name)
+
+    async def query(self, sql, **kwargs):
+        return await self.run("query", sql, **kwargs)
+
+    async def query1(self, expr):
+        return await self.run("query1", expr)
+
+    async def exec_update(self, table_name, sql, **kwargs):
+        return await self.run("exec_update", table_name, sql, **kwargs)
+
+    async def store(self, data, load_table, **kwargs):
+        return await self.run("store", data, load_table, **kwargs)
+
+    async def load_table(self, table_name, expr, **kwargs):
+        return await self.run("load_table", table_name, expr, **kwargs)
+
+    async def count(self, t):
+        return await self.run("count", t)
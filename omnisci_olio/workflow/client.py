@@ -1,11 +1,22 @@
 import os
+import re
 import sys
 from time import time
 
 # import logging
-import pathlib
-import hashlib
+import shutil
 import datetime
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
+
+try:
+    import resource
+except ImportError:
+    # not on Windows
+    resource = None
+import numpy as np
 import pandas as pd
 from sqlalchemy.engine.url import make_url
 
@@ -15,7 +26,24 @@ import ibis
 import ibis_omniscidb
 
 import omnisci_olio.schema as sc
+from omnisci_olio.pymapd import trace
 from omnisci_olio.ibis import connect as ibis_connect
+from omnisci_olio.pymapd import select_iter
+from .pool import SessionPool, get_pool
+from .metadata import TableCache, get_table_cache, is_ddl
+from .logsink import get_log_sink
+from .ingest import load_dataframe_arrow, write_parquet_chunks
+from .ingest import as_arrow_data, arrow_batches, load_arrow, table_from_arrow_schema
+from .counts import RowCounter, parse_copy_response
+from .resultcache import ResultCache, result_key, sql_names
+from .compilecache import CompileCache, sql_literal
+from .partition import PartitionedStore, PARTITION_MINMAX
+from .merge import Merge
+from .fingerprint import fingerprint, fingerprint_files
+from .copyfiles import BulkCopy, DEFAULT_GROUP_BYTES
+from .retry import RetryPolicy, is_idempotent
+from .histogram import get_histograms
+from .temptables import TempTables, sweep_temp_tables
 
 try:
     from ibis_omniscidb import Backend as OmniSciDBBackend
@@ -80,16 +108,6 @@ def log_infx(
     )
 """
 
-def _file_md5sum(filename):
-    h = hashlib.md5()
-    with open(filename, "rb") as f:
-        chunk = f.read(4096)
-        while chunk:
-            h.update(chunk)
-            chunk = f.read(4096)
-    return h
-
-
 def sqlpp(x):
     try:
         import sqlparse
@@ -105,50 +123,158 @@ def sqlpp(x):
             print(x.compile())
 
 
+class _ConversionPlan:
+    """
+    The column conversions to apply a schema to DataFrames with the same dtypes.
+    Computed once by `_conversion_plan` and cached.
+    """
+
+    def __init__(self, casts, use_ibis):
+        # list of (column, dtype, cast) where cast is a pandas dtype, or None for the Ibis conversion
+        self.casts = casts
+        self.use_ibis = use_ibis
+        self.columns = [column for column, _, _ in casts]
+
+    def apply(self, df, schema):
+        if self.use_ibis:
+            # some columns need the Ibis conversion, which checks and converts all columns in place
+            df = schema.apply_to(df)
+        for column, dtype, cast in self.casts:
+            col = df[column]
+            if cast is not None and _dtypes_differ(dtype.to_pandas(), col.dtype):
+                try:
+                    df[column] = col.astype(cast)
+                except (TypeError, ValueError):
+                    # same as astype(errors="ignore"), e.g. 1.5 to an int column
+                    pass
+        return df
+
+
+def _dtypes_differ(pandas_dtype, col_dtype):
+    try:
+        return pandas_dtype != col_dtype
+    except TypeError:
+        # ugh, we can't compare dtypes coming from pandas, assume not equal
+        return True
+
+
+def _plan_cast(dtype, col_dtype):
+    """
+    Return the pandas dtype to cast a column to `dtype` (Ibis), or None if the Ibis conversion is needed.
+    """
+    if isinstance(dtype, ibis.expr.datatypes.Integer):
+        if pd.api.types.is_integer_dtype(col_dtype) and not pd.api.types.is_extension_array_dtype(
+            col_dtype
+        ):
+            return dtype.to_pandas()
+        # Int32 instead of int32 (and other int sizes), which supports None
+        for int_type, nullable in [
+            (ibis.expr.datatypes.Int8, "Int8"),
+            (ibis.expr.datatypes.Int16, "Int16"),
+            (ibis.expr.datatypes.Int32, "Int32"),
+            (ibis.expr.datatypes.Int64, "Int64"),
+        ]:
+            if isinstance(dtype, int_type):
+                return nullable
+    elif isinstance(dtype, ibis.expr.datatypes.Floating):
+        return dtype.to_pandas()
+    return None
+
+
+_conversion_plans = OrderedDict()
+_conversion_plans_max = 256
+_conversion_plans_lock = threading.Lock()
+
+
+def _conversion_plan(schema, df):
+    """
+    Return the cached _ConversionPlan for the schema and the dtypes of df.
+    """
+    key = (
+        tuple(schema.names),
+        tuple(str(t) for t in schema.types),
+        tuple(df.columns),
+        tuple(str(t) for t in df.dtypes),
+    )
+    with _conversion_plans_lock:
+        plan = _conversion_plans.get(key)
+        if plan is not None:
+            _conversion_plans.move_to_end(key)
+            return plan
+
+    casts = []
+    use_ibis = False
+    for column, dtype in schema.items():
+        col_dtype = df[column].dtype
+        if isinstance(dtype, ibis.expr.datatypes.String):
+            # str values in an object column are already loadable as TEXT
+            if not pd.api.types.is_object_dtype(col_dtype):
+                use_ibis = True
+                casts.append((column, dtype, None))
+        elif _dtypes_differ(dtype.to_pandas(), col_dtype):
+            cast = _plan_cast(dtype, col_dtype)
+            use_ibis = use_ibis or cast is None
+            casts.append((column, dtype, cast))
+
+    plan = _ConversionPlan(casts, use_ibis)
+    with _conversion_plans_lock:
+        _conversion_plans[key] = plan
+        if len(_conversion_plans) > _conversion_plans_max:
+            _conversion_plans.popitem(last=False)
+    return plan
+
+
 def _schema_apply_to(schema, df):
     """
     With Pandas 1.0, int32 does not support None, so the Ibis apply_to is not effectively fixing the column type.
     With OmniSci 5.6, input validate is more strict, so "1.0" fails to load as an INT.
     This converts to Int32 instead of int32 (and other int sizes).
-    """
-    df = schema.apply_to(df)
-    for column, dtype in schema.items():
-        pandas_dtype = dtype.to_pandas()
-        col = df[column]
-        col_dtype = col.dtype
 
-        try:
-            not_equal = pandas_dtype != col_dtype
-        except TypeError:
-            # ugh, we can't compare dtypes coming from pandas, assume not equal
-            not_equal = True
+    The conversions are planned once per schema and input dtypes, and only the columns
+    with a different dtype are converted.
+    """
+    return _conversion_plan(schema, df).apply(df, schema)
 
-        if not_equal:
-            if isinstance(dtype, ibis.expr.datatypes.Int8):
-                df[column] = df[column].astype("Int8", errors="ignore")
-            elif isinstance(dtype, ibis.expr.datatypes.Int16):
-                df[column] = df[column].astype("Int16", errors="ignore")
-            elif isinstance(dtype, ibis.expr.datatypes.Int32):
-                df[column] = df[column].astype("Int32", errors="ignore")
-            elif isinstance(dtype, ibis.expr.datatypes.Int64):
-                df[column] = df[column].astype("Int64", errors="ignore")
 
-    return df
+def _peak_rss_mb():
+    """
+    The peak memory of the process over its lifetime, or None where it is not known.
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
 
 
-def clean_name(name, pretty=False):
+@lru_cache(maxsize=None)
+def _reserved_words():
     from sqlalchemy_omnisci.base import RESERVED_WORDS
 
-    name = name.strip(" ")
-    name = name.replace("%", "pct")
-    name = name.replace("<=", "le")
-    name = name.replace("<", "lt")
-    name = name.replace(">=", "ge")
-    name = name.replace(">", "gt")
-    name = name.replace("+", "plus")
-    # name = name.replace("-", "minus")
-    a = "".join([c if c.isalnum() else "_" for c in name.strip()])
-    b = (a + "_") if (a.upper() in RESERVED_WORDS) else a
+    # not uppercased, clean_name compares a.upper() with the words as they are
+    return frozenset(RESERVED_WORDS)
+
+
+_symbol_words = {"%": "pct", "<=": "le", "<": "lt", ">=": "ge", ">": "gt", "+": "plus"}
+_symbol_re = re.compile(r"<=|>=|[%<>+]")
+_non_word_re = re.compile(r"[^\w]")
+# ASCII characters that are not letters or digits become "_"
+_ascii_table = {i: "_" for i in range(128) if not chr(i).isalnum()}
+
+
+@lru_cache(maxsize=65536)
+def clean_name(name, pretty=False):
+    """
+    A name usable as a column or table name: symbols spelled out, other characters that are not
+    letters or digits replaced by "_", a trailing "_" after a reserved word, and a leading "_" before a digit.
+    pretty - also collapse "__", strip trailing "_" and lowercase.
+    """
+    name = _symbol_re.sub(lambda m: _symbol_words[m[0]], name.strip(" ")).strip()
+    if name.isascii():
+        a = name.translate(_ascii_table)
+    else:
+        # str.isalnum and \w agree on non-ASCII letters and digits
+        a = _non_word_re.sub("_", name)
+    b = (a + "_") if (a.upper() in _reserved_words()) else a
     if b[0].isdigit():
         b = "_" + b
     if pretty:
@@ -159,8 +285,29 @@ def clean_name(name, pretty=False):
     else:
         return b
 
-def clean_names(columns, pretty=False):
-    return [clean_name(c, pretty=pretty) for c in columns]
+
+def clean_names(columns, pretty=False, unique=False):
+    """
+    clean_name of each of columns.
+    unique - if several columns have the same clean name, the first keeps it and the others
+        get the first free suffix "_2", "_3", ..., that is not the clean name of another column.
+    """
+    names = [clean_name(c, pretty=pretty) for c in columns]
+    if not unique:
+        return names
+    taken = set(names)
+    seen = set()
+    result = []
+    for name in names:
+        if name in seen:
+            k = 2
+            while f"{name}_{k}" in taken:
+                k += 1
+            name = f"{name}_{k}"
+            taken.add(name)
+        seen.add(name)
+        result.append(name)
+    return result
 
 
 db_update_log_table = sc.Table(
@@ -197,9 +344,53 @@ db_update_log_table = sc.Table(
 )
 
 
+class _LazyConnection:
+    """
+    A connection made by connect() on first use, shared by a client and its clones,
+    also after the client replaced it by reconnecting.
+    """
+
+    def __init__(self, connect=None, con=None):
+        self._connect = connect
+        self.con = con
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self.con is None:
+            with self._lock:
+                if self.con is None:
+                    self.con = self._connect()
+        return self.con
+
+    def replace(self, con):
+        with self._lock:
+            self.con = con
+
+
+# uri -> (user, host, database, version) for the log, shared by the clients of the process
+_server_infos = {}
+_server_infos_lock = threading.Lock()
+
+
 class OmniSciDBClient:
     """
     If close_on_exit is False, don't automatically close the connection in a `with` block to not close other uses.
+    If pool is True (or a SessionPool), the session is checked out of the process-wide pool for the URI
+    and returned to the pool on exit instead of being closed.
+    table_cache: a TableCache for table names and schemas, or True to share one cache per URI
+        with other clients in the process. By default each client has its own cache.
+    If async_log is True and the log is a URL, rows for the db_update_log_table are written in batches
+    by a background thread, see `log_stats()` for written and dropped rows.
+    staging_dir: directory for files staged by store_by_copy and copy_to_and_from, which must also be readable
+        by the DB server, by default env var OMNISCI_DB_STAGING_DIR or /jhub_omnisci_dropbox/tmp.
+    count_strategy: how to count rows before and after updates, "exact", "epoch_cached" or "none",
+        by default env var OMNISCI_DB_COUNT_STRATEGY or "exact", see `omnisci_olio.workflow.counts`.
+    result_cache: a ResultCache, or True for a new one, to cache `query` results until a table read changes.
+    compile_cache: a CompileCache of SQL compiled from Ibis expressions, see `compile_cache.stats()` for hits and misses.
+    retry_policy: a RetryPolicy for statements that failed by a lost connection or session,
+        only idempotent statements are retried, see `omnisci_olio.workflow.retry`.
+    The connection, the log connection and the server info for the log are made on first use,
+    so a client that runs nothing makes no server calls.
     """
 
     def __init__(
@@ -211,51 +402,116 @@ class OmniSciDBClient:
         dryrun=False,
         log_uri=None,
         default_severity:str=None,
+        pool=None,
+        table_cache=None,
+        async_log=True,
+        staging_dir=None,
+        count_strategy=None,
+        result_cache=None,
+        compile_cache=None,
+        retry_policy=None,
     ):
         self.close_on_exit = close_on_exit
         self.sources = []
         self.storing = None
         self.dryrun = dryrun
+        self._pool = None
+        self._log_pool = None
+        self.staging_dir = staging_dir or os.environ.get("OMNISCI_DB_STAGING_DIR")
 
-        if _other is not None:
-            self.con = _other.con
+        self._uri = None
+        # connected by this client, so it can be replaced when lost, not shared with or supplied by the caller
+        self._owns_con = False
         if con is not None:
-            self.con = con
+            self._con_ref = _LazyConnection(con=con)
+            if trace.is_enabled():
+                trace.instrument(con)
+        elif _other is not None:
+            self._con_ref = _other._con_ref
+            self._uri = _other._uri
         else:
             uri = uri or os.environ.get("OMNISCI_DB_URL")
             if uri is None:
                 raise Exception(
                     "A DB connection URL must be provided by one of: `con`, `uri` param, or env var `OMNISCI_DB_URL`"
                 )
-            self.con = ibis_connect(uri)
+            self._uri = uri
+            self._owns_con = True
+            if isinstance(pool, SessionPool):
+                self._pool = pool
+            elif pool:
+                self._pool = get_pool(uri)
+            self._con_ref = _LazyConnection(self._connect)
+
+        self.row_counter = RowCounter(
+            self._count_exact,
+            self._table_epoch,
+            strategy=count_strategy or (_other.row_counter.strategy if _other is not None else None),
+            shared=_other.row_counter if _other is not None else None,
+        )
+
+        if isinstance(result_cache, ResultCache):
+            self.result_cache = result_cache
+        elif result_cache:
+            self.result_cache = ResultCache()
+        elif _other is not None:
+            self.result_cache = _other.result_cache
+        else:
+            self.result_cache = None
+
+        # process-wide latency histograms per SQL fingerprint
+        self.histograms = _other.histograms if _other is not None else get_histograms()
+
+        if retry_policy is not None:
+            self.retry_policy = retry_policy
+        elif _other is not None:
+            self.retry_policy = _other.retry_policy
+        else:
+            self.retry_policy = RetryPolicy()
+
+        if compile_cache is not None:
+            self.compile_cache = compile_cache
+        elif _other is not None:
+            self.compile_cache = _other.compile_cache
+        else:
+            self.compile_cache = CompileCache()
+
+        if isinstance(table_cache, TableCache):
+            self.table_cache = table_cache
+        elif _other is not None and con is None:
+            self.table_cache = _other.table_cache
+        elif table_cache:
+            self.table_cache = get_table_cache(self.uri)
+        else:
+            self.table_cache = TableCache()
 
         self._log_inited = False
         self._log_data = None
-        self._log_con = None
+        self._log_ref = None
+        self._log_sink = None
+        # shared by the log rows of one run of operations, by default the Prefect flow run
+        self.process_run = None
 
         if _other is not None:
             # to reducee the number of server calls
+            self.process_run = _other.process_run
             self._log_data = _other._log_data
-            self._log_con = _other._log_con
+            self._log_ref = _other._log_ref
+            self._log_sink = _other._log_sink
+            self.staging_dir = staging_dir or _other.staging_dir
         else:
             log_uri = log_uri or os.environ.get("OMNISCI_DB_LOG_URL", None)
             if isinstance(log_uri, str):
-                self._log_con = ibis_connect(log_uri)
-            else:
-                self._log_con = log_uri
-
-            if self._log_con is not None:
-                uri = make_url(self.con.uri)
-                ss = self._server_status()
-                si = self._session_info()
-                self._log_data = (
-                    si.user,
-                    uri.host if uri.host else ss.host_name,
-                    si.database,
-                    ss.version,
-                    self.con.con._session[:12],
-                )
-        
+                if async_log:
+                    self._log_sink = get_log_sink(log_uri, db_update_log_table)
+                if self._pool is not None:
+                    self._log_pool = get_pool(log_uri)
+                    self._log_ref = _LazyConnection(self._log_pool.checkout)
+                else:
+                    self._log_ref = _LazyConnection(lambda: ibis_connect(log_uri))
+            elif log_uri is not None:
+                self._log_ref = _LazyConnection(con=log_uri)
+
         self.default_severity = default_severity.upper() if default_severity else "DEBUG"
         if self.default_severity == "INFO":
             self.default_logger = log_info
@@ -272,12 +528,89 @@ class OmniSciDBClient:
         # return OmniSciDBClient(_other=self, close_on_exit=self.close_on_exit)
         return self
 
+    @property
+    def con(self):
+        """
+        The Ibis backend, connected on first use.
+        """
+        return self._con_ref.get()
+
+    @con.setter
+    def con(self, con):
+        # only this client, not the clones sharing the previous connection, unlike _reconnect
+        self._con_ref = _LazyConnection(con=con)
+
+    @property
+    def uri(self):
+        return self._uri if self._uri is not None else getattr(self.con, "uri", None)
+
+    @property
+    def _log_con(self):
+        return None if self._log_ref is None else self._log_ref.get()
+
+    def _connect(self):
+        if self._pool is not None:
+            con = self._pool.checkout()
+        else:
+            con = ibis_connect(self._uri)
+        if trace.is_enabled():
+            trace.instrument(con)
+        return con
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._log_sink is not None:
+            self._log_sink.flush()
         if self.close_on_exit:
-            self.con.__exit__(exc_type, exc_val, exc_tb)
-            if (self._log_con is not None) and (self.con != self._log_con):
-                self._log_con.__exit__(exc_type, exc_val, exc_tb)
+            con = self._con_ref.con
+            if con is None:
+                # never connected
+                pass
+            elif self._pool is not None:
+                # after an error, do not hand a broken session to the next task
+                discard = exc_type is not None and not self._pool._alive(con)
+                self._pool.checkin(con, discard=discard)
+            else:
+                con.__exit__(exc_type, exc_val, exc_tb)
+            log_con = None if self._log_ref is None else self._log_ref.con
+            if (log_con is not None) and (con is not log_con):
+                if self._log_pool is not None:
+                    self._log_pool.checkin(log_con)
+                else:
+                    log_con.__exit__(exc_type, exc_val, exc_tb)
+
+    @contextmanager
+    def session_clone(self, process_run=None):
+        """
+        A clone of this client on another session from the pool for the same URI,
+        for operations running concurrently with this client.
+        The clone shares the log, caches and settings of this client, but has its own `sources`.
+        process_run - logged by the clone instead of the process_run of this client
+        """
+        pool = self._pool
+        if pool is None:
+            if self.uri is None:
+                raise Exception("session_clone requires a client connected by URI")
+            pool = get_pool(self.uri)
+        con = pool.checkout()
+        clone = OmniSciDBClient(
+            con=con,
+            _other=self,
+            close_on_exit=False,
+            table_cache=self.table_cache,
+            default_severity=self.default_severity,
+            dryrun=self.dryrun,
+        )
+        # to replace the session from the same pool if it is lost
+        clone._pool = pool
+        clone._owns_con = True
+        if process_run is not None:
+            clone.process_run = process_run
+        try:
+            yield clone
+        except Exception:
+            pool.checkin(clone.con, discard=not pool._alive(clone.con))
+            raise
+        pool.checkin(clone.con)
 
     ########################
     # Utility functions
@@ -286,8 +619,8 @@ class OmniSciDBClient:
     def clean_name(self, name, pretty=False):
         return clean_name(name, pretty=pretty)
 
-    def clean_names(self, columns, pretty=False):
-        return clean_names(columns, pretty=pretty)
+    def clean_names(self, columns, pretty=False, unique=False):
+        return clean_names(columns, pretty=pretty, unique=unique)
 
     def pp(self, x):
         try:
@@ -300,6 +633,24 @@ class OmniSciDBClient:
     def tmp_tablename(self, task, src_table, *args):
         args_str = "__" + "_".join(args) if args else ""
         return self.clean_name(f"tmp_{task}__{src_table}" + args_str)
+
+    def temp_tables(self, temporary=True):
+        """
+        A scope of TEMPORARY tables for intermediate results, dropped on exit,
+        see `omnisci_olio.workflow.temptables`. For example:
+
+        with con.temp_tables() as tmp:
+            stage = tmp.store("stage", df)
+        """
+        return TempTables(self, temporary=temporary)
+
+    def sweep_temp_tables(self, older_than_hours=None):
+        """
+        Drop the tables of `temp_tables` scopes that were not dropped, e.g. of a killed process,
+        created more than older_than_hours ago, by default env var OMNISCI_DB_TEMP_TABLE_HOURS or 24.
+        The tables of scopes still open in other processes are dropped too if they are older.
+        """
+        return sweep_temp_tables(self, older_than_hours=older_than_hours)
     
     def get_logger_severity(self, severity:str=None):
         severity = severity.upper() if severity else self.default_severity
@@ -323,26 +674,46 @@ class OmniSciDBClient:
         self.sources.append(name)
         return name
 
-    def src_file(self, filename):
-        stat = pathlib.Path(filename).stat()
-        modtime = datetime.datetime.fromtimestamp(stat.st_mtime)
-        md5sum = _file_md5sum(filename).hexdigest()
-        self.default_logger(cmd="src_file", modtime=modtime, size=stat.st_size, md5sum=md5sum)
-
+    def _log_src_file(self, filename, fp):
+        modtime = datetime.datetime.fromtimestamp(fp.mtime_ns / 1e9)
+        if fp.hasher == "md5" and fp.mode == "full":
+            self.default_logger(cmd="src_file", modtime=modtime, size=fp.size, md5sum=fp.digest)
+        else:
+            self.default_logger(
+                cmd="src_file", modtime=modtime, size=fp.size, hasher=fp.hasher, mode=fp.mode, fingerprint=fp.digest
+            )
         self.sources.append(filename)
+
+    def src_file(self, filename, hasher=None, mode="full"):
+        """
+        Record filename as a source, logged with its fingerprint, see `omnisci_olio.workflow.fingerprint`.
+        hasher - e.g. "md5", "sha1" or "xxh3", by default env var OMNISCI_DB_FILE_HASHER or "md5",
+            logged as `md5sum`, other hashers and modes are logged as `fingerprint` with the hasher and mode
+        mode - "full", or "sampled" to hash only blocks of a very large file that is not changed in place
+        """
+        self._log_src_file(filename, fingerprint(filename, hasher=hasher, mode=mode))
         return filename
 
+    def src_files(self, filenames, hasher=None, mode="full", max_workers=None):
+        """
+        Record many files as sources, fingerprinted in parallel.
+        """
+        filenames = list(filenames)
+        for filename, fp in zip(filenames, fingerprint_files(filenames, hasher=hasher, mode=mode, max_workers=max_workers)):
+            self._log_src_file(filename, fp)
+        return filenames
+
     def src_table(self, t):
         if isinstance(t, ibis_omniscidb.client.OmniSciDBTable):
             # this reestablishes the table to be connected to self rather than some other (stale) connection
             self.sources.append(t.name)
-            return self.con.table(t.name)
+            return self.table_cache.table(self.con, t.name)
         elif isinstance(t, sc.Table):
             self.sources.append(t.name)
-            return self.con.table(t.name)
+            return self.table_cache.table(self.con, t.name)
         else:
             self.sources.append(t)
-            return self.con.table(t)
+            return self.table_cache.table(self.con, t)
 
     def table(self, t):
         return self.src_table(t)
@@ -359,16 +730,20 @@ class OmniSciDBClient:
             # assume a str is a table name
             return self.table(x)
 
-    def to_sql(self, expr):
+    def to_sql(self, expr, params=None):
+        """
+        params - dict of Ibis scalar parameter (`ibis.param`) to value
+        """
         if isinstance(expr, str):
             return expr
         elif isinstance(expr, sc.ModelOperation):
             return expr.compile()
         else:
-            return self.con.compile(expr)
+            with trace.span("compile"):
+                return self.compile_cache.compile(self.con, expr, params)
 
-    def compile(self, expr):
-        return self.to_sql(expr)
+    def compile(self, expr, params=None):
+        return self.to_sql(expr, params)
 
     def _name(self, thing):
         if isinstance(thing, ibis_omniscidb.client.OmniSciDBTable):
@@ -385,17 +760,28 @@ class OmniSciDBClient:
             return [self._name(things)]
 
     def exists_table(self, t):
-        return t in self.con.list_tables()
+        return self.table_cache.exists(self.con, t)
 
     def count(self, t):
         return self.con.execute(self.table(t).count())
 
+    def _count_exact(self, table_name):
+        return self.con.execute(self.table(table_name).count())
+
+    def _table_epoch(self, table_name):
+        return self.con.con._client.get_table_epoch_by_name(self.con.con._session, table_name)
+
+    def _count_rows(self, table_name, strategy=None):
+        if self.exists_table(table_name):
+            return self.row_counter.count(table_name, strategy)
+        return 0
+
     ########################
     # DB LOG
     ########################
 
     def _log_init(self):
-        if (not self._log_inited and self._log_con):
+        if not self._log_inited and self._log_ref is not None:
             self._log_inited = True
             with OmniSciDBClient(con=self._log_con, log_uri=self._log_con, close_on_exit=False, default_severity=self.default_severity) as log_con:
                 log_con.create_table(db_update_log_table)
@@ -403,9 +789,58 @@ class OmniSciDBClient:
     def _server_status(self):
         return self.con.con._client.get_server_status(self.con.con._session)
 
+    def _reconnect(self):
+        """
+        Login again on the same URI, after the connection or session was lost.
+        Only a connection made by this client is replaced, not one passed in `con` or shared with another client.
+        """
+        if not self._owns_con:
+            raise Exception("Can not reconnect a connection that this client did not open")
+        uri = self.uri
+        if uri is None:
+            raise Exception("Can not reconnect a client that was not connected by URI")
+        log_warning(cmd="reconnect", uri_host=make_url(uri).host)
+        old = self.con
+        con = self._pool.replace(old) if self._pool is not None else ibis_connect(uri)
+        if trace.is_enabled():
+            trace.instrument(con)
+        # in the holder shared with the clones of this client, so that they use the new connection too
+        self._con_ref.replace(con)
+        if self._pool is None:
+            try:
+                old.close()
+            except Exception:
+                pass
+
     def _session_info(self):
         return self.con.con._client.get_session_info(self.con.con._session)
 
+    def _log_fields(self):
+        """
+        (user, host, database, version, session) of the log rows, with the server info cached per URI for the process.
+        The server info of the first client of a URI is read over its data connection, which connects it if needed,
+        not over the log connection, which may be for another user or database.
+        """
+        if self._log_data is not None:
+            return self._log_data
+        uri = self.uri
+        with _server_infos_lock:
+            info = _server_infos.get(uri)
+        if info is None:
+            host = make_url(uri).host if uri else None
+            ss = self._server_status()
+            si = self._session_info()
+            info = (si.user, host if host else ss.host_name, si.database, ss.version)
+            if uri:
+                with _server_infos_lock:
+                    _server_infos[uri] = info
+        con = self._con_ref.con
+        if con is None:
+            # the server info is cached from another client of the URI, and this client has not connected yet
+            return info + (None,)
+        self._log_data = info + (con.con._session[:12],)
+        return self._log_data
+
     def _insert_log(
         self,
         start_time,
@@ -422,18 +857,20 @@ class OmniSciDBClient:
         message,
         src_tables=None,
         severity=None,
+        process_run=None,
     ):
-        if self._log_con is None:
+        if self._log_ref is None:
             return
         tend = time()
         now = datetime.datetime.now()
+        log_data = self._log_fields()
         row = (
             now,
-            self._log_data[0],
-            self._log_data[1],
-            self._log_data[2],
-            self._log_data[3],
-            self._log_data[4],
+            log_data[0],
+            log_data[1],
+            log_data[2],
+            log_data[3],
+            log_data[4],
             None,  # src_app
             src_paths or [],
             src_tables or [],
@@ -453,11 +890,23 @@ class OmniSciDBClient:
             getattr(prefect.context, "task_name", None),
             getattr(prefect.context, "map_index", None),
             severity,
-            getattr(prefect.context, "process_run_id", None), # process_run
+            process_run or self.process_run or getattr(prefect.context, "process_run_id", None), # process_run
         )
         self._log_init()
-        # TODO load_table method=rows is inserting string 'None' instead of None/NULL
-        self._log_con.con.load_table(db_update_log_table.name, [row], method="rows")
+        if self._log_sink is not None:
+            self._log_sink.write(row)
+        else:
+            # TODO load_table method=rows is inserting string 'None' instead of None/NULL
+            self._log_con.con.load_table(db_update_log_table.name, [row], method="rows")
+
+    def log_stats(self):
+        """
+        Counts of rows written, dropped (queue full) and failed by the background log writer,
+        or None if the log is written synchronously.
+        """
+        if self._log_sink is None:
+            return None
+        return self._log_sink.stats()
 
     def log(
         self,
@@ -474,8 +923,12 @@ class OmniSciDBClient:
         message=None,
         update_key=None,
         severity=None,
+        process_run=None,
         **kwargs,
     ):
+        """
+        process_run - logged instead of the process_run of this client
+        """
         tend = tend or time()
         sources = list(set(self._names((sources or []) + self.sources)))
         if severity is None:
@@ -499,22 +952,24 @@ class OmniSciDBClient:
         ))
 
         self.get_logger_severity(severity)(msg=msg)
-        self._insert_log(
-            start_time=tstart,
-            src_paths=None,
-            operation=cmd,
-            command=sql,
-            tgt_table=target,
-            process_rows=process_rows,
-            error_count=error_count,
-            rows_before=ct_before,
-            rows_after=ct_after,
-            data_timestamp=None,
-            update_key=update_key,
-            message=message,
-            src_tables=sources,
-            severity=severity,
-        )
+        with trace.span("log_insert"):
+            self._insert_log(
+                start_time=tstart,
+                src_paths=None,
+                operation=cmd,
+                command=sql,
+                tgt_table=target,
+                process_rows=process_rows,
+                error_count=error_count,
+                rows_before=ct_before,
+                rows_after=ct_after,
+                data_timestamp=None,
+                update_key=update_key,
+                message=message,
+                src_tables=sources,
+                severity=severity,
+                process_run=process_run,
+            )
 
     ########################
     # Ibis
@@ -538,49 +993,206 @@ class OmniSciDBClient:
     # Query and Update
     ########################
 
-    def query(self, sql):
+    def _tables_changed(self, table_names, ddl=False):
+        """
+        Invalidate cached metadata and results after this client updated table_names.
+        ddl - the tables may have been created, dropped, renamed or altered
+        """
+        if ddl:
+            self.table_cache.invalidate(table_names)
+            self.row_counter.forget(table_names)
+        if self.result_cache is not None:
+            self.result_cache.invalidate_tables(table_names)
+
+    def _result_key(self, sql):
+        """
+        Return (key, tables) for the result cache, or (None, None) if the tables read are not known.
+        """
+        names = sql_names(sql)
+        if not names:
+            return None, None
+        if not names <= self.table_cache.table_names(self.con):
+            # a table may have been created since the table list was cached
+            self.table_cache.invalidate([])
+            if not names <= self.table_cache.table_names(self.con):
+                return None, None
+        if names & self.table_cache.view_names(self.con):
+            # the epoch of a view does not change with the tables it reads
+            return None, None
+        tables = sorted(names)
+        versions = {}
+        for t in tables:
+            try:
+                versions[t] = self._table_epoch(t)
+            except Exception:
+                return None, None
+        return result_key(sql, versions), tables
+
+    def query(self, sql, cache=None):
+        """
+        cache: use the result cache, by default if the client has a result_cache
+        """
         sql = self.to_sql(sql)
+        key = None
+        if cache is None:
+            cache = self.result_cache is not None
+        elif cache and self.result_cache is None:
+            self.result_cache = ResultCache()
+        if cache:
+            key, tables = self._result_key(sql)
+            if key is not None:
+                df = self.result_cache.get(key)
+                if df is not None:
+                    return df
         tstart = time()
         try:
-            df = pd.read_sql(sql, self.con.con)
+            with trace.span("query"):
+                df, _, _ = self.retry_policy.run(
+                    lambda: pd.read_sql(sql, self.con.con), idempotent=True, reconnect=self._reconnect
+                )
             time_s = time() - tstart
+            self.histograms.record("query", sql, time_s)
             if time_s > 2.0:
                 # 2 seconds is sometimes a long time, but not sure this should be a warning
                 self.default_logger(cmd="query", time_s=round(time_s, 2), sql=sql)
-            return df
         except Exception as e:
             raise Exception(sql) from e
+        if key is not None:
+            self.result_cache.put(key, df, tables)
+        return df
+
+    def query_iter(self, sql, chunk_rows=100000, arrow=False, key=None):
+        """
+        Yield the result of sql in DataFrames (or pyarrow RecordBatches if arrow) of at most chunk_rows rows.
+        By default the result is fetched by one query, and read from the cursor with fetchmany,
+        so only one chunk at a time is converted to a DataFrame, in the order of the query.
+        The driver still receives the whole result on execute, so memory grows with the result size.
+
+        key: a column with unique, non-null values, to fetch each chunk by its own query,
+            `WHERE key > <last key> ORDER BY key LIMIT chunk_rows`, so the client holds one chunk at a time.
+            The chunks are in the order of key rather than any ORDER BY of sql.
+
+        Logs rows, rows per second, the largest chunk, and how much the peak memory of the process grew.
+        """
+        sql = self.to_sql(sql).strip().rstrip(";")
+        tstart = time()
+        rows = 0
+        chunks = 0
+        max_chunk_mb = 0
+        peak_before = _peak_rss_mb()
+        try:
+            if key is None:
+                batches = select_iter(self.con.con, sql, chunk_rows=chunk_rows)
+            else:
+                batches = self._query_pages(sql, chunk_rows, key)
+            for df in batches:
+                rows += len(df.index)
+                chunks += 1
+                max_chunk_mb = max(max_chunk_mb, df.memory_usage(deep=True).sum() / 1024 ** 2)
+                if arrow:
+                    import pyarrow as pa
+
+                    yield pa.RecordBatch.from_pandas(df, preserve_index=False)
+                else:
+                    yield df
+        except GeneratorExit:
+            raise
+        except Exception as e:
+            raise Exception(sql) from e
+        finally:
+            time_s = time() - tstart
+            self.log(
+                "query_iter",
+                tstart,
+                process_rows=rows,
+                sql=sql,
+                chunks=chunks,
+                rows_per_s=round(rows / time_s) if time_s > 0 else None,
+                max_chunk_mb=round(max_chunk_mb, 1),
+                # ru_maxrss is the peak of the process lifetime, so this is 0 if an earlier peak was higher
+                peak_rss_growth_mb=None if peak_before is None else round(_peak_rss_mb() - peak_before, 1),
+                paging_key=key,
+            )
+
+    def _query_pages(self, sql, chunk_rows, key):
+        last = None
+        while True:
+            where = "" if last is None else f"WHERE {key} > {sql_literal(last)}"
+            page = f"SELECT * FROM ({sql}) AS q {where} ORDER BY {key} LIMIT {chunk_rows}"
+            df = pd.read_sql(page, self.con.con)
+            if len(df.index) == 0:
+                break
+            yield df
+            if len(df.index) < chunk_rows:
+                break
+            last = df[key].iloc[-1]
+            if isinstance(last, np.generic):
+                # numpy scalar to python
+                last = last.item()
 
     def query1(self, expr):
-        return self.con.con.execute(self.compile(expr)).fetchone()[0]
+        sql = self.compile(expr)
+        tstart = time()
+        result = self.con.con.execute(sql).fetchone()[0]
+        self.histograms.record("query", sql, time() - tstart)
+        return result
 
     def execute(self, op, sources=None):
         # if isinstance(op, sc.ModelOperation):
-        return self.exec_update(op.model.name, op.compile(), sources=sources, cmd=op.category)
+        return self.exec_update(op.model_table().name, op.compile(), sources=sources, cmd=op.category)
 
-    def exec_update(self, table_name, sql, sources=None, cmd="execute_update", update_key=None):
+    def exec_update(
+        self,
+        table_name,
+        sql,
+        sources=None,
+        cmd="execute_update",
+        update_key=None,
+        count_strategy=None,
+        idempotent=None,
+        retry_prepare=None,
+    ):
+        """
+        count_strategy: overrides the client count_strategy for this statement
+        idempotent: if the statement can be retried after a lost connection, by default from the kind of statement
+        retry_prepare: SQL to run before a retry, e.g. DROP TABLE IF EXISTS before a CREATE TABLE AS
+        """
         sql = sql.strip().replace("\n", " ")
         if self.dryrun:
             sqlpp(sql)
-        else:
-            table_name = self._name(table_name)
+            return table_name
+        table_name = self._name(table_name)
+        with trace.span("exec_update", cmd=cmd, table=table_name):
             self.default_logger(cmd=cmd, target=table_name, sql=sql)
+            count_strategy = count_strategy or self.row_counter.strategy
 
             before = 0
-            if table_name in self.con.list_tables():
-                try:
-                    t = self.table(table_name)
-                    before = self.con.execute(t.count())
-                except Exception as e:
-                    log_warning(exception=e)
+            try:
+                with trace.span("count_before", strategy=count_strategy):
+                    before = self._count_rows(table_name, count_strategy)
+            except Exception as e:
+                log_warning(exception=e)
 
             tstart = time()
             try:
-                response = self.con.con.execute(sql).fetchall()
+                with trace.span("statement"):
+                    response, retries, backoff_s = self.retry_policy.run(
+                        lambda: self.con.con.execute(sql).fetchall(),
+                        idempotent=is_idempotent(sql) if idempotent is None else idempotent,
+                        reconnect=self._reconnect,
+                        prepare=None if retry_prepare is None else lambda: self.con.con.execute(retry_prepare),
+                        on_retry=lambda n, e, wait_s: log_warning(
+                            cmd=cmd, target=table_name, retry=n, backoff_s=round(wait_s, 2), exception=e
+                        ),
+                    )
             except Exception as e:
                 raise Exception(sql) from e
+            finally:
+                self._tables_changed([table_name] + self._names(sources or []), ddl=is_ddl(sql))
             tend = time()
+            self.histograms.record("update", sql, tend - tstart)
 
+            loaded = None
             if response and len(response) > 0 and len(response[0]) > 0:
                 msg = response[0][0]
                 if msg.find("Failed") > -1:
@@ -598,11 +1210,16 @@ class OmniSciDBClient:
                             )
                         )
                     )
+                copied = parse_copy_response(msg) if isinstance(msg, str) else None
+                if copied is not None:
+                    loaded = copied[0]
 
             after = 0
-            if self.exists_table(table_name):
-                t = self.table(table_name)
-                after = self.con.execute(t.count())
+            with trace.span("count_after", strategy=count_strategy):
+                if self.exists_table(table_name):
+                    after = self.row_counter.count_after(
+                        table_name, before, loaded=loaded, strategy=count_strategy
+                    )
 
             self.log(
                 cmd,
@@ -614,10 +1231,13 @@ class OmniSciDBClient:
                 sql=sql,
                 response=response,
                 update_key=update_key,
+                count_strategy=count_strategy,
+                retries=retries,
+                backoff_s=round(backoff_s, 2),
             )
         return table_name
 
-    def insert_as(self, table, sql, sources=None, update_key=None):
+    def insert_as(self, table, sql, sources=None, update_key=None, count_strategy=None):
         tn = self._name(table)
         return self.exec_update(
             tn,
@@ -625,6 +1245,7 @@ class OmniSciDBClient:
             sources=sources,
             cmd="INSERT",
             update_key=update_key,
+            count_strategy=count_strategy,
         )
 
     def _with_props(self, kwargs):
@@ -655,7 +1276,12 @@ class OmniSciDBClient:
     def show_create_table(self, tn):
         return self.query1(f"SHOW CREATE TABLE {tn}")
 
-    def create_table(self, table, ddl=None, drop=False):
+    def create_table(self, table, ddl=None, drop=False, migrate=False):
+        """
+        Create the table if it does not exist. An existing table of a sc.Table gets its dropped, renamed
+        and new columns, by the cached column names, and also its datatype conversions if migrate is True,
+        see `migrate_table`.
+        """
         if isinstance(table, sc.Table):
             tbl = table
         elif isinstance(ddl, sc.Table):
@@ -676,19 +1302,55 @@ class OmniSciDBClient:
             if not self.exists_table(tbl.name):
                 return self.execute(tbl.define())
             else:
-                for col in tbl.columns:
-                    t = self.table(tbl)
-                    if col.name in t.columns:
-                        if col.is_drop:
-                            self.execute(col.drop())
-                        # TODO validate column datatype
-                    elif not col.is_drop:
-                        if (col.rename_from is not None) and (col.rename_from in t.columns):
-                            self.execute(col.rename())
-                        else:
-                            self.execute(col.add())
+                self.migrate_table(tbl, convert_types=migrate)
                 return tbl.name
 
+    def migrate_table(self, tbl, dryrun=None, convert_types=True):
+        """
+        Alter the existing table to the sc.Table definition, see `omnisci_olio.schema.migrate`.
+        The statements are run in order, with one count before and after and one log row.
+        dryrun - print the plan and do not run it, by default the client dryrun
+        convert_types - also convert the columns with another datatype, by the live definition from
+            SHOW CREATE TABLE; if False, only drop, rename and add columns, by the cached column names
+        Returns the MigrationPlan.
+        """
+        if convert_types:
+            live = self.query1(tbl.show_def())
+        else:
+            live = {name: None for name in self.table_cache.schema(self.con, tbl.name).names}
+        plan = sc.plan_migration(tbl, live)
+        if dryrun or (dryrun is None and self.dryrun):
+            print(plan)
+            return plan
+        if not plan.steps:
+            return plan
+
+        count_strategy = self.row_counter.strategy
+        before = self._count_rows(tbl.name, count_strategy)
+        tstart = time()
+        try:
+            for step in plan:
+                sql = step.compile()
+                self.default_logger(cmd=step.category, target=tbl.name, sql=sql)
+                try:
+                    self.con.con.execute(sql)
+                except Exception as e:
+                    raise Exception(sql) from e
+        finally:
+            self._tables_changed([tbl.name], ddl=True)
+        after = self._count_rows(tbl.name, count_strategy)
+        self.log(
+            "MIGRATE",
+            tstart,
+            tbl.name,
+            None,
+            before,
+            after,
+            sql=plan.compile(),
+            steps=len(plan),
+            count_strategy=count_strategy,
+        )
+        return plan
 
     def create_table_as(self, table, sql, sources=None, drop=False, update_key=None, **kwargs):
         tn = self._name(table)
@@ -698,7 +1360,16 @@ class OmniSciDBClient:
         ctas = f"""CREATE TABLE {tn} AS (
 {self.to_sql(sql)}
 ) {props};"""
-        return self.exec_update(tn, ctas, sources=sources, cmd="CREATE TABLE AS", update_key=update_key)
+        # after a drop, the CTAS can be run again after dropping a table it may have created
+        return self.exec_update(
+            tn,
+            ctas,
+            sources=sources,
+            cmd="CREATE TABLE AS",
+            update_key=update_key,
+            idempotent=drop,
+            retry_prepare=f"DROP TABLE IF EXISTS {tn};" if drop else None,
+        )
 
     def create_view_as(self, target_name, sql, sources=None, drop=False, **kwargs):
         tn = self._name(target_name)
@@ -764,17 +1435,66 @@ class OmniSciDBClient:
             table_name, q, sources=[from_file_glob], cmd="COPY FROM"
         )
 
+    def copy_from_files(
+        self,
+        table_name,
+        files,
+        group_bytes=DEFAULT_GROUP_BYTES,
+        max_in_flight=2,
+        retries=2,
+        retry_failed=False,
+        **kwargs,
+    ):
+        """
+        COPY FROM each of files (a list of paths or glob patterns), one COPY per file, concurrently
+        with at most max_in_flight statements running into table_name, see `omnisci_olio.workflow.copyfiles`.
+        group_bytes - about the total size of the files copied one after the other on one session
+        retry_failed - also retry the files whose COPY failed, which loads rows twice if the COPY committed
+        kwargs - COPY FROM options, as for copy_from
+        Returns a DataFrame with the rows loaded and rejected and the throughput of each file,
+        or raises an Exception naming the files that were not loaded.
+        """
+        return BulkCopy(
+            self, group_bytes=group_bytes, max_in_flight=max_in_flight, retries=retries, retry_failed=retry_failed
+        ).copy(self._name(table_name), files, **kwargs)
+
     def _shared_tmp_dir(self):
+        if self.staging_dir:
+            os.makedirs(self.staging_dir, exist_ok=True)
+            return self.staging_dir
         path = "/jhub_omnisci_dropbox"
         if os.path.exists(path):
             path += "/tmp"
             os.makedirs(path, exist_ok=True)
             return path
         else:
-            # TODO add a config option so this is more flexible/usable
-            raise Exception(f"Path not found for shared tmp dir: {path}")
+            raise Exception(
+                f"Path not found for shared tmp dir: {path}, set `staging_dir` or env var OMNISCI_DB_STAGING_DIR"
+            )
 
-    def store_by_copy(self, df, tgt_table, ddl=None, sources=None, drop=False, key=""):
+    def _remove_staged(self, path):
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def store_by_copy(
+        self,
+        df,
+        tgt_table,
+        ddl=None,
+        sources=None,
+        drop=False,
+        key="",
+        staging_format="csv",
+        chunk_rows=None,
+        parallel=4,
+    ):
+        """
+        Load df with COPY FROM a file staged in the shared tmp dir.
+        staging_format: "csv", or "parquet" to write Parquet files of chunk_rows rows, `parallel` files at a time,
+            and COPY FROM all of them by glob.
+        """
         tstart = time()
         fname = self.clean_name(
             "__".join(
@@ -786,9 +1506,15 @@ class OmniSciDBClient:
                 ]
             )
         )
-        tmp_file = f"{self._shared_tmp_dir()}/{fname}.csv"
-        if os.path.exists(tmp_file):
-            os.remove(tmp_file)
+        if staging_format == "parquet":
+            tmp_path = f"{self._shared_tmp_dir()}/{fname}"
+            copy_glob = f"{tmp_path}/*.parquet"
+            copy_props = dict(parquet=True, max_reject=0)
+        else:
+            tmp_path = f"{self._shared_tmp_dir()}/{fname}.csv"
+            copy_glob = tmp_path
+            copy_props = dict(header=False, max_reject=0)
+        self._remove_staged(tmp_path)
         if drop:
             self.drop_table(tgt_table)
 
@@ -802,12 +1528,25 @@ class OmniSciDBClient:
             # fix datatypes in df
             df = _schema_apply_to(t.schema(), df)
 
-        df.to_csv(tmp_file, index=False, header=False)
+        try:
+            if staging_format == "parquet":
+                write_parquet_chunks(df, tmp_path, chunk_rows=chunk_rows, parallel=parallel)
+            else:
+                df.to_csv(tmp_path, index=False, header=False)
 
-        res = self.copy_from(tgt_table, tmp_file, header=False, max_reject=0)
+            res = self.copy_from(tgt_table, copy_glob, **copy_props)
+        finally:
+            self._remove_staged(tmp_path)
 
-        os.remove(tmp_file)
-        self.log("store_by_copy", tstart, tgt_table, sources=sources, rows_input=len(df), update_key=key)
+        self.log(
+            "store_by_copy",
+            tstart,
+            tgt_table,
+            sources=sources,
+            rows_input=len(df),
+            update_key=key,
+            staging_format=staging_format,
+        )
         return res
 
     def copy_to(self, table_name, from_expr, to_filename, **kwargs):
@@ -816,10 +1555,19 @@ class OmniSciDBClient:
         return self.exec_update(None, q, sources=[table_name], cmd="COPY TO")
 
     def copy_to_and_from(
-        self, src_table, from_expr, tgt_table, ddl=None, drop=False, update_key=None, **kwargs
+        self,
+        src_table,
+        from_expr,
+        tgt_table,
+        ddl=None,
+        drop=False,
+        update_key=None,
+        staging_format="csv",
+        **kwargs,
     ):
         """
         params: used to label the file name
+        staging_format: "csv", or "parquet" which requires a DB server that supports COPY TO Parquet files
         """
         tstart = time()
         fname = self.clean_name(
@@ -832,22 +1580,30 @@ class OmniSciDBClient:
                 ]
             )
         )
-        tmp_file = f"{self._shared_tmp_dir()}/{fname}.csv"
-        if os.path.exists(tmp_file):
-            os.remove(tmp_file)
+        if staging_format == "parquet":
+            tmp_file = f"{self._shared_tmp_dir()}/{fname}.parquet"
+            to_props = dict(file_type="Parquet")
+            from_props = dict(parquet=True)
+        else:
+            tmp_file = f"{self._shared_tmp_dir()}/{fname}.csv"
+            to_props = dict(header=False)
+            from_props = dict(header=False)
+        self._remove_staged(tmp_file)
         if drop:
             self.drop_table(tgt_table)
         self.table(src_table)
 
-        self.copy_to(src_table, from_expr, tmp_file, header=False, **kwargs)
+        try:
+            self.copy_to(src_table, from_expr, tmp_file, **to_props, **kwargs)
 
-        if ddl and not self.exists_table(tgt_table):
-            self.create_table(tgt_table, ddl)
+            if ddl and not self.exists_table(tgt_table):
+                self.create_table(tgt_table, ddl)
 
-        res = self.copy_from(tgt_table, tmp_file, header=False, max_reject=0, **kwargs)
+            res = self.copy_from(tgt_table, tmp_file, max_reject=0, **from_props, **kwargs)
+        finally:
+            self._remove_staged(tmp_file)
 
-        os.remove(tmp_file)
-        self.log("copy_to_and_from", tstart, tgt_table, update_key=update_key)
+        self.log("copy_to_and_from", tstart, tgt_table, update_key=update_key, staging_format=staging_format)
         return res
 
     def _store_expr(
@@ -868,18 +1624,34 @@ class OmniSciDBClient:
             if skip_if_exists:
                 return table_name
             else:
-                if take_counts:
-                    t = self.table(table_name)
-                    before = self.con.execute(t.count())
-
-                self.insert_as(table_name, expr, update_key=update_key)
+                # exec_update counts before and after the insert
+                self.insert_as(
+                    table_name,
+                    expr,
+                    update_key=update_key,
+                    count_strategy=None if take_counts else "none",
+                )
 
         else:
             self.create_table_as(table_name, expr, fragment_size=fragment_size, update_key=update_key)
 
         return table_name
 
-    def _load_table_from_df(self, table_name, ddl, df, take_counts=True, update_key=None):
+    def _load_table_from_df(
+        self,
+        table_name,
+        ddl,
+        df,
+        take_counts=True,
+        update_key=None,
+        load_method=None,
+        chunk_rows=None,
+        parallel=None,
+    ):
+        """
+        load_method: None to load with Ibis `load_data`,
+            or "arrow" to load in chunks of chunk_rows rows, uploaded concurrently on `parallel` sessions.
+        """
         sources = list(set(self._names(self.sources)))
         self.default_logger(
             cmd="load_table_from_df",
@@ -893,35 +1665,55 @@ class OmniSciDBClient:
             return table_name
 
         tstart = time()
+        count_strategy = self.row_counter.strategy if take_counts else "none"
 
         before = 0
         if self.exists_table(table_name):
             if take_counts:
-                t = self.table(table_name)
-                before = self.con.execute(t.count())
+                before = self.row_counter.count(table_name, count_strategy)
 
         elif ddl:
             self.create_table(table_name, ddl)
 
+        chunks = None
+        converted = None
         if self.dryrun:
             print(f"-- load_table {table_name} rows=" + len(df))
         else:
+            if load_method == "arrow" and not self.exists_table(table_name):
+                # unlike load_data, the arrow load does not create the table
+                self.create_table(sc.Table.from_dataframe(table_name, df))
+
             if self.exists_table(table_name):
                 t = self.table(table_name)
                 # fix column names in df, and drop extra columns
                 df = df[t.columns]
                 # fix datatypes in df
-                df = _schema_apply_to(t.schema(), df)
+                plan = _conversion_plan(t.schema(), df)
+                df = plan.apply(df, t.schema())
+                converted = plan.columns
 
-            self.con.load_data(table_name, df)
+            if load_method == "arrow":
+                chunks = load_dataframe_arrow(
+                    self.con, table_name, df, chunk_rows=chunk_rows, parallel=parallel or 4
+                )
+                self._tables_changed([table_name])
+            else:
+                exists = self.exists_table(table_name)
+                self.con.load_data(table_name, df)
+                # load_data creates the table if it does not exist
+                self._tables_changed([table_name], ddl=not exists)
 
         tend = time()
+        self.histograms.record("load", f"LOAD {table_name}", tend - tstart)
 
         rejected = None
         after = None
         if take_counts:
-            t = self.table(table_name)
-            after = self.con.execute(t.count())
+            after = self.row_counter.count_after(
+                table_name, before, loaded=len(df.index), strategy=count_strategy
+            )
+        if after is not None and before is not None:
             rejected = len(df.index) - after + before
 
         msg = dict(
@@ -934,8 +1726,9 @@ class OmniSciDBClient:
             ct_after=after,
             rejected=rejected,
             sources=list(set(self._names(self.sources))),
+            chunks=chunks,
         )
-        if take_counts and rejected is not None and rejected > 0:
+        if rejected is not None and rejected > 0:
             # this would only make sense if no parallel process is changing the same table
             raise Exception("Records rejected. " + str(msg))
         else:
@@ -949,10 +1742,163 @@ class OmniSciDBClient:
                 process_rows=len(df.index),
                 rejected=rejected,
                 update_key=update_key,
+                load_method=load_method,
+                chunks=chunks,
+                converted=converted,
+                count_strategy=count_strategy,
             )
 
         return table_name
 
+    def _arrow_target(self, table_name):
+        # the Ibis schema does not have the precision of timestamps, the types of SHOW CREATE TABLE do
+        return list(sc.parse_ddl_columns(self.show_create_table(table_name)).items())
+
+    def _load_table_from_arrow(
+        self,
+        table_name,
+        ddl,
+        data,
+        take_counts=True,
+        update_key=None,
+        chunk_rows=None,
+        parallel=None,
+    ):
+        """
+        Load Arrow data (see `ingest.as_arrow_data`) through the Arrow load path, without converting to pandas.
+        The columns of the table (or of ddl if the table does not exist) are read from Parquet,
+        and cast to the types of the table. Without ddl, a new table gets the columns of the Arrow schema.
+        """
+        sources = list(set(self._names(self.sources)))
+        self.default_logger(cmd="load_table_from_arrow", sources=sources, target=table_name, update_key=update_key)
+
+        tstart = time()
+        count_strategy = self.row_counter.strategy if take_counts else "none"
+
+        before = 0
+        if self.exists_table(table_name):
+            target = self._arrow_target(table_name)
+            if take_counts:
+                before = self.row_counter.count(table_name, count_strategy)
+        elif ddl:
+            target = [(c.name, c.datatype) for c in ddl.columns] if isinstance(ddl, sc.Table) else None
+        else:
+            target = None
+
+        schema, batches = arrow_batches(
+            data, columns=None if target is None else [name for name, _ in target], batch_rows=chunk_rows
+        )
+        if self.dryrun:
+            print(f"-- load_table {table_name} arrow columns={schema.names}")
+            return table_name
+
+        if not self.exists_table(table_name):
+            if ddl:
+                self.create_table(table_name, ddl)
+            else:
+                self.create_table(table_from_arrow_schema(table_name, schema))
+            if target is None:
+                target = self._arrow_target(table_name)
+
+        try:
+            chunks, converted = load_arrow(
+                self.con, table_name, schema, batches, target=target, chunk_rows=chunk_rows, parallel=parallel or 4
+            )
+        finally:
+            self._tables_changed([table_name])
+
+        tend = time()
+        self.histograms.record("load", f"LOAD {table_name}", tend - tstart)
+
+        rows = sum(c["rows"] for c in chunks)
+        after = None
+        rejected = None
+        if take_counts:
+            after = self.row_counter.count_after(table_name, before, loaded=rows, strategy=count_strategy)
+        if after is not None and before is not None:
+            rejected = rows - after + before
+
+        if rejected is not None and rejected > 0:
+            raise Exception(
+                "Records rejected. "
+                + str(
+                    dict(
+                        cmd="load_table_from_arrow",
+                        time_s=round(tend - tstart, 2),
+                        target=table_name,
+                        update_key=update_key,
+                        ct_input=rows,
+                        ct_before=before,
+                        ct_after=after,
+                        rejected=rejected,
+                        sources=sources,
+                        chunks=chunks,
+                    )
+                )
+            )
+        self.log(
+            "load_table_from_arrow",
+            tstart,
+            table_name,
+            None,
+            before,
+            after,
+            process_rows=rows,
+            rejected=rejected,
+            update_key=update_key,
+            chunks=chunks,
+            converted=converted,
+            count_strategy=count_strategy,
+        )
+        return table_name
+
+    def merge_into(self, target, source, keys, chunk_rows=None, sources=None, update_key=None):
+        """
+        Upsert: replace the rows of target with the same keys as the rows of source, and insert the others.
+        source - a DataFrame, Ibis expression or SQL, staged in a table with a unique name, see `temp_tables`
+        keys - the key column name, or a list of them
+        chunk_rows - staged rows merged per DELETE and INSERT, by default all at once
+        Returns a MergeReport with the rows staged, updated and inserted and the time of each phase.
+        """
+        return Merge(self, chunk_rows=chunk_rows).merge(
+            target, source, keys, sources=sources, update_key=update_key
+        )
+
+    def store_partitioned(
+        self,
+        expr,
+        table_name,
+        key,
+        partitions=4,
+        method=PARTITION_MINMAX,
+        sources=None,
+        update_key=None,
+        drop=False,
+        max_workers=None,
+        retries=2,
+        ddl=None,
+        fragment_size=None,
+    ):
+        """
+        INSERT ... SELECT expr into table_name in `partitions` ranges of the `key` column,
+        run concurrently on pooled sessions, see `omnisci_olio.workflow.partition`.
+        method - "minmax" for equal key ranges, "quantile" for ranges of about equal row counts
+        retries - times a failed partition is run again, on its own, if its key range was empty before
+        ddl, fragment_size - to create the table if it does not exist
+        """
+        return PartitionedStore(self, max_workers=max_workers, retries=retries).store(
+            expr,
+            self._name(table_name),
+            key,
+            partitions=partitions,
+            method=method,
+            sources=sources,
+            update_key=update_key,
+            drop=drop,
+            ddl=ddl,
+            fragment_size=fragment_size,
+        )
+
     def load_table(
         self,
         table_name,
@@ -965,6 +1911,9 @@ class OmniSciDBClient:
         take_counts=True,
         fragment_size=None,
         update_key=None,
+        load_method=None,
+        chunk_rows=None,
+        parallel=None,
     ):
         if sources:
             self.default_logger(
@@ -976,7 +1925,25 @@ class OmniSciDBClient:
             self.drop_table(table_name)
         if isinstance(expr, pd.DataFrame):
             return self._load_table_from_df(
-                table_name, ddl=ddl, df=expr, take_counts=take_counts, update_key=update_key,
+                table_name,
+                ddl=ddl,
+                df=expr,
+                take_counts=take_counts,
+                update_key=update_key,
+                load_method=load_method,
+                chunk_rows=chunk_rows,
+                parallel=parallel,
+            )
+        expr, arrow = as_arrow_data(expr)
+        if arrow:
+            return self._load_table_from_arrow(
+                table_name,
+                ddl=ddl,
+                data=expr,
+                take_counts=take_counts,
+                update_key=update_key,
+                chunk_rows=chunk_rows,
+                parallel=parallel,
             )
         else:
             return self._store_expr(
@@ -1001,14 +1968,41 @@ class OmniSciDBClient:
         fragment_size=None,
         sources=None,
         update_key=None,
+        load_method=None,
+        chunk_rows=None,
+        parallel=None,
+        partition_key=None,
+        partitions=4,
     ):
         """
         Loads `data` into a table if load_table is not None.
         Logs the sources from the table names from when `table()` was invoked.
-        data: an Ibis expr or Pandas DF.
+        data: an Ibis expr, Pandas DF, or Arrow data: a pyarrow Table, RecordBatch iterator,
+            or Parquet path, glob pattern or dataset, loaded without converting to pandas.
         ddl: should be provided if data is a DF and the table might not exist.
+        load_method: for a DF, "arrow" loads columnar in chunks of chunk_rows rows (default 1M),
+            uploaded concurrently on `parallel` sessions (default 4).
+            Chunked loads are not atomic: if a chunk fails, the chunks loaded before it stay in the table.
+        partition_key: for an Ibis expr or SQL, store by `store_partitioned` in `partitions` ranges of this column.
         Returns: the load_table name if the data was stored in a table, or the data.
         """
+        if load_table and partition_key is not None and not isinstance(data, pd.DataFrame):
+            # the first item of an iterator is read to check if it is Arrow data, so only when data is loaded
+            data, arrow = as_arrow_data(data)
+            if not arrow:
+                if skip_if_exists and self.exists_table(load_table):
+                    return self._name(load_table)
+                return self.store_partitioned(
+                    data,
+                    load_table,
+                    partition_key,
+                    partitions=partitions,
+                    sources=sources,
+                    update_key=update_key,
+                    drop=drop,
+                    ddl=ddl,
+                    fragment_size=fragment_size,
+                )
         if load_table:
             return self.load_table(
                 load_table,
@@ -1021,6 +2015,9 @@ class OmniSciDBClient:
                 take_counts=take_counts,
                 fragment_size=fragment_size,
                 update_key=update_key,
+                load_method=load_method,
+                chunk_rows=chunk_rows,
+                parallel=parallel,
             )
         else:
             return data
@@ -1030,7 +2027,7 @@ def col_renames(appendage, *cols):
     return [col.name(col.get_name() + appendage) for col in cols]
 
 
-def connect(con=None, close_on_exit=True, default_severity=None):
+def connect(con=None, close_on_exit=True, default_severity=None, pooled=False):
     """
     Connect to OmniSciDB.
     For use with Prefect, though does not depend on the Prefect API itself (other than logging).
@@ -1061,12 +2058,18 @@ def connect(con=None, close_on_exit=True, default_severity=None):
     Args:
         - con (URL string, Ibis connection, OmniSciDBClient, or None to use env var OMNISCI_DB_URL)
         - close_on_exit (bool, default True): if False, don't automatically close the connection in a nested `with` block so the parent block can continue.
+        - pooled (bool, default False): when connecting by URL, reuse a logged-in session from the process-wide pool
+            and return it to the pool at the end of the `with` block, rather than login and logout each time.
+            A pooled client holds one of the pool's max_sessions until its `with` block ends,
+            so nested or concurrent pooled clients wait for a session, for at most the pool timeout.
 
     Returns:
         OmniSciDBClient: with a Ibis con and Pyomnisci con.con, connected to OmniSciDB
     """
     if con is None or isinstance(con, str):
-        return OmniSciDBClient(uri=con, close_on_exit=close_on_exit, default_severity=default_severity)
+        return OmniSciDBClient(
+            uri=con, close_on_exit=close_on_exit, default_severity=default_severity, pool=pooled
+        )
     elif isinstance(con, OmniSciDBClient):
         # return con
         return OmniSciDBClient(_other=con, close_on_exit=False, default_severity=default_severity)
@@ -0,0 +1,188 @@
+"""
+Cache of SQL compiled from Ibis expressions, keyed by the structure of the expression.
+
+Expressions with Ibis scalar parameters (`ibis.param`) are cached as a SQL template,
+so a loop that compiles the same expression with different parameter values compiles it only once.
+Only integer and plain text values are put in a template, other values are compiled by Ibis each time.
+"""
+
+import re
+import datetime
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+def sql_literal(value):
+    """
+    Format a python value as a SQL literal.
+    """
+    if value is None:
+        return "NULL"
+    elif isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    elif isinstance(value, (int, float)):
+        return repr(value)
+    elif isinstance(value, (datetime.datetime, pd.Timestamp)):
+        return f"TIMESTAMP '{value.isoformat(sep=' ')}'"
+    elif isinstance(value, datetime.date):
+        return f"DATE '{value.isoformat()}'"
+    else:
+        s = str(value).replace("'", "''")
+        return f"'{s}'"
+
+
+class _ExprKey:
+    """
+    Hash and compare Ibis expressions by structure.
+    """
+
+    __slots__ = ("expr", "hash")
+
+    def __init__(self, expr):
+        self.expr = expr
+        self.hash = hash(expr)
+
+    def __hash__(self):
+        return self.hash
+
+    def __eq__(self, other):
+        return self.expr.equals(other.expr)
+
+
+def _sentinel(i, value):
+    """
+    A placeholder value of the same type as value, that is easy to find in compiled SQL.
+    """
+    if isinstance(value, bool):
+        return None
+    elif isinstance(value, int):
+        return 1987654301 + i
+    elif isinstance(value, str):
+        return f"__olio_param_{i}__"
+    return None
+
+
+def _templatable(value):
+    """
+    True for the values whose literal does not depend on how Ibis formats it,
+    integers, and text without quotes, backslashes or control characters.
+    """
+    if type(value) is int:
+        return True
+    elif type(value) is str:
+        return value.isprintable() and "'" not in value and "\\" not in value
+    return False
+
+
+class _SqlTemplate:
+    def __init__(self, parts, order, types):
+        # SQL text parts, between which the parameter literals go, in the order of `order` (param keys)
+        self.parts = parts
+        self.order = order
+        # param key -> type of the values the template was checked with
+        self.types = types
+
+    def accepts(self, params):
+        return params.keys() == self.types.keys() and all(
+            type(v) is self.types[p] and _templatable(v) for p, v in params.items()
+        )
+
+    def render(self, params):
+        out = [self.parts[0]]
+        for param, part in zip(self.order, self.parts[1:]):
+            out.append(sql_literal(params[param]))
+            out.append(part)
+        return "".join(out)
+
+
+def _make_template(sql, sentinels):
+    """
+    Split sql at the literals of the sentinel values.
+    """
+    literals = {sql_literal(v): param for param, v in sentinels.items()}
+    alternatives = "|".join(re.escape(lit) for lit in sorted(literals, key=len, reverse=True))
+    pieces = re.split(f"({alternatives})", sql)
+    types = {param: type(v) for param, v in sentinels.items()}
+    return _SqlTemplate(pieces[0::2], [literals[lit] for lit in pieces[1::2]], types)
+
+
+class CompileCache:
+    """
+    LRU cache of compiled SQL, with counters of hits and misses.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def compile(self, con, expr, params=None):
+        """
+        Return the SQL of `con.compile(expr, params=params)`, from the cache if compiled before.
+        """
+        try:
+            # with the params, so that an expression compiled without params is not reused with them
+            key = (_ExprKey(expr), frozenset(_ExprKey(p) for p in (params or {})))
+        except TypeError:
+            # not hashable, do not cache
+            with self._lock:
+                self.misses += 1
+            return con.compile(expr, params=params) if params else con.compile(expr)
+
+        entry = self._get(key)
+        if entry is None:
+            entry = self._compile_entry(con, expr, params)
+            self._put(key, entry)
+            if isinstance(entry, tuple):
+                return entry[1]
+        if isinstance(entry, _SqlTemplate):
+            if entry.accepts(params or {}):
+                return entry.render(params or {})
+            # a value Ibis may format differently from the values the template was made with
+            return con.compile(expr, params=params)
+        elif isinstance(entry, tuple):
+            # parameters could not be templated, compile each time
+            return con.compile(expr, params=params)
+        return entry
+
+    def _compile_entry(self, con, expr, params):
+        if not params:
+            return con.compile(expr)
+        sql = con.compile(expr, params=params)
+        if not all(_templatable(v) for v in params.values()):
+            return (None, sql)
+        sentinels = {p: _sentinel(i, v) for i, (p, v) in enumerate(params.items())}
+        if any(v is None for v in sentinels.values()):
+            return (None, sql)
+        template = _make_template(con.compile(expr, params=sentinels), sentinels)
+        # the template must give the same SQL as Ibis, e.g. if Ibis formats a literal differently
+        if template.render(params) != sql:
+            return (None, sql)
+        return template
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, entries=len(self._entries))
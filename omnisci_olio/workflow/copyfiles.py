@@ -0,0 +1,237 @@
+"""
+Load many files into a table by COPY FROM, concurrently, with a bounded number of statements in flight per table.
+
+Each file is loaded by its own COPY FROM, so each file is accounted for in the log
+with its rows loaded and rejected and its throughput; no COPY loads several files.
+The files are split into groups of about `group_bytes` and about the same total size, largest first,
+and each group is copied file by file on its own pooled session, up to `max_in_flight` groups at a time,
+so that the sessions finish at about the same time.
+
+A COPY that failed may have committed rows before the error, e.g. when the connection is lost,
+so its file is not copied again unless `retry_failed` is True. The files of a group that were not copied
+yet when its session failed are retried in a new group.
+If any file is not loaded after the retries, an Exception names the files whose COPY failed and those not copied.
+
+The file paths must be readable by the DB server at the same path.
+"""
+
+import os
+import glob
+import threading
+from time import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from .counts import parse_copy_response
+
+
+DEFAULT_GROUP_BYTES = 1024 ** 3
+
+# (uri, table name) -> semaphore of the COPY statements in flight, shared by all loaders in the process
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def _table_semaphore(uri, table_name, max_in_flight):
+    """
+    The semaphore of the table, created with the max_in_flight of its first loader,
+    so that all loaders of the table are bounded together.
+    """
+    with _in_flight_lock:
+        key = (uri, table_name)
+        sem = _in_flight.get(key)
+        if sem is None:
+            sem = _in_flight[key] = threading.BoundedSemaphore(max_in_flight)
+        return sem
+
+
+def expand_files(files):
+    """
+    A list of file paths from a glob pattern or a list of paths and patterns.
+    """
+    if isinstance(files, str):
+        files = [files]
+    paths = []
+    for f in files:
+        matches = sorted(glob.glob(f)) if glob.has_magic(f) else [f]
+        paths.extend(matches)
+    return paths
+
+
+def size_groups(paths, group_bytes=DEFAULT_GROUP_BYTES, min_groups=1):
+    """
+    Group paths into lists of about group_bytes and about the same total size,
+    and at least min_groups lists if there are as many paths.
+    """
+    sized = sorted(((os.path.getsize(p), p) for p in paths), reverse=True)
+    total = sum(s for s, _ in sized)
+    count = max(1, -(-total // group_bytes), min(min_groups, len(sized)))
+    groups = [[] for _ in range(count)]
+    sizes = [0] * count
+    for size, path in sized:
+        # the least full group
+        i = sizes.index(min(sizes))
+        groups[i].append(path)
+        sizes[i] += size
+    return [g for g in groups if g]
+
+
+class FileCopy:
+    def __init__(self, path):
+        self.path = path
+        self.bytes = os.path.getsize(path)
+        self.loaded = None
+        self.rejected = None
+        self.time_s = None
+        self.attempts = 0
+        self.error = None
+
+    def to_dict(self):
+        return dict(
+            path=self.path,
+            bytes=self.bytes,
+            loaded=self.loaded,
+            rejected=self.rejected,
+            time_s=self.time_s,
+            mb_per_s=None if not self.time_s else round(self.bytes / 1024 ** 2 / self.time_s, 2),
+            attempts=self.attempts,
+            error=None if self.error is None else str(self.error),
+        )
+
+
+class BulkCopy:
+    """
+    client - an OmniSciDBClient connected by URL, each group of files is copied on a session_clone of it
+    group_bytes - about the total size of the files copied one after the other on one session
+    max_in_flight - COPY statements running at the same time into one table, from all loaders in this process,
+        set by the first loader of the table
+    retries - times the files that were not copied are retried
+    retry_failed - also retry the files whose COPY failed, which loads rows twice if the COPY committed
+    """
+
+    def __init__(self, client, group_bytes=DEFAULT_GROUP_BYTES, max_in_flight=2, retries=2, retry_failed=False):
+        self.client = client
+        self.group_bytes = group_bytes
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.retry_failed = retry_failed
+
+    def _copy_file(self, con, table_name, fc, props):
+        q = f"""COPY "{table_name}" FROM '{fc.path}' {props};"""
+        fc.attempts += 1
+        tstart = time()
+        try:
+            response = con.con.con.execute(q).fetchall()
+        except Exception as e:
+            fc.error = e
+            return False
+        fc.time_s = time() - tstart
+        msg = response[0][0] if response and response[0] else ""
+        if isinstance(msg, str) and msg.find("Failed") > -1:
+            fc.error = msg
+            return False
+        copied = parse_copy_response(msg) if isinstance(msg, str) else None
+        if copied is not None:
+            fc.loaded, fc.rejected = copied
+        fc.error = None
+        stats = fc.to_dict()
+        con.log(
+            "COPY FROM FILE",
+            tstart,
+            table_name,
+            [fc.path],
+            process_rows=fc.loaded,
+            error_count=fc.rejected,
+            sql=q,
+            response=response,
+            bytes=fc.bytes,
+            mb_per_s=stats["mb_per_s"],
+            rows_per_s=None if not fc.time_s or fc.loaded is None else round(fc.loaded / fc.time_s),
+            attempt=fc.attempts,
+        )
+        return True
+
+    def _run_group(self, table_name, group, props, semaphore):
+        """
+        Returns the files that failed or were not copied.
+        """
+        done = set()
+        try:
+            with self.client.session_clone() as con:
+                for fc in group:
+                    with semaphore:
+                        ok = self._copy_file(con, table_name, fc, props)
+                    if ok:
+                        done.add(fc.path)
+                    elif isinstance(fc.error, Exception):
+                        # the session may be broken, discard it and retry the rest of the group
+                        raise fc.error
+        except Exception as e:
+            self.client.default_logger(cmd="COPY FROM FILE", target=table_name, exception=e)
+        failed = [fc for fc in group if fc.path not in done]
+        for fc in failed:
+            if fc.error is None:
+                fc.error = "not copied"
+        return failed
+
+    def copy(self, table_name, files, **copy_props):
+        """
+        Returns a DataFrame with a row per file,
+        or raises an Exception naming the files that were not loaded after retries.
+        copy_props - COPY FROM options, e.g. header="true", delimiter="|"
+        """
+        client = self.client
+        tstart = time()
+        paths = expand_files(files)
+        copies = {p: FileCopy(p) for p in paths}
+        props = client._with_props(copy_props)
+        semaphore = _table_semaphore(getattr(client.con, "uri", None), table_name, self.max_in_flight)
+        before = client._count_rows(table_name)
+
+        groups = [[copies[p] for p in g] for g in size_groups(paths, self.group_bytes, self.max_in_flight)]
+        try:
+            for attempt in range(self.retries + 1):
+                if not groups:
+                    break
+                with ThreadPoolExecutor(
+                    max_workers=self.max_in_flight, thread_name_prefix="omnisci_olio_copy"
+                ) as executor:
+                    results = list(
+                        executor.map(lambda g: self._run_group(table_name, g, props, semaphore), groups)
+                    )
+                failed = [fc for r in results for fc in r]
+                # a file is attempted when its COPY ran, whether or not it committed
+                groups = [[fc] for fc in failed if self.retry_failed or fc.attempts == 0]
+        finally:
+            client._tables_changed([table_name], ddl=True)
+
+        report = pd.DataFrame([fc.to_dict() for fc in copies.values()])
+        failed = [fc for fc in copies.values() if fc.error is not None]
+        after = client._count_rows(table_name)
+        total_s = time() - tstart
+        client.log(
+            "COPY FROM FILES",
+            tstart,
+            table_name,
+            None,
+            before,
+            after,
+            process_rows=int(report["loaded"].fillna(0).sum()) if len(report) else 0,
+            error_count=len(failed),
+            files=len(copies),
+            bytes=int(report["bytes"].sum()) if len(report) else 0,
+            mb_per_s=round(report["bytes"].sum() / 1024 ** 2 / total_s, 2) if len(report) and total_s else None,
+            rejected=int(report["rejected"].fillna(0).sum()) if len(report) else 0,
+        )
+        if failed:
+            # a failed COPY may have committed some of its rows, a file not copied has none
+            copy_failed = {fc.path: str(fc.error) for fc in failed if fc.attempts > 0}
+            not_copied = [fc.path for fc in failed if fc.attempts == 0]
+            raise Exception(
+                f"COPY FROM did not load {len(failed)} of {len(copies)} files into {table_name}. "
+                f"COPY failed, and may have loaded some rows, for {len(copy_failed)} files"
+                + ("" if self.retry_failed else " (not retried, see retry_failed)")
+                + f": {copy_failed}. Not copied: {not_copied}"
+            )
+        return report
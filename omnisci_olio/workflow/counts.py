@@ -0,0 +1,111 @@
+"""
+Row counts of tables before and after updates, with a selectable strategy:
+
+- "exact": SELECT COUNT(*) before and after every update (default)
+- "epoch_cached": reuse an exact count while the table epoch is unchanged, so that the count before an update
+    is usually not run again, and compute the count after a load from the rows loaded
+    (the COPY FROM response or the input rows). Known counts are shared with the session clones of a client.
+    The server does not return the rows changed by INSERT ... SELECT, UPDATE or DELETE,
+    nor does the table metadata have a row count, so after those writes it still runs an exact COUNT(*).
+- "none": no counts
+"""
+
+import os
+import re
+import threading
+
+
+COUNT_EXACT = "exact"
+COUNT_EPOCH_CACHED = "epoch_cached"
+COUNT_NONE = "none"
+COUNT_STRATEGIES = (COUNT_EXACT, COUNT_EPOCH_CACHED, COUNT_NONE)
+
+_copy_response_re = re.compile("Loaded: ([0-9]+) recs, Rejected: ([0-9]+) recs")
+
+
+def parse_copy_response(msg):
+    """
+    Return (loaded, rejected) from a COPY FROM response message, or None if not found.
+    """
+    m = _copy_response_re.search(msg or "")
+    if m:
+        return int(m[1]), int(m[2])
+    return None
+
+
+class RowCounter:
+    """
+    count_fn(table_name) - exact count of rows
+    epoch_fn(table_name) - current epoch of the table, which changes with each update
+    shared - a RowCounter to share the known counts with, e.g. of the client this one is cloned from
+    """
+
+    def __init__(self, count_fn, epoch_fn, strategy=None, shared=None):
+        strategy = (strategy or os.environ.get("OMNISCI_DB_COUNT_STRATEGY", COUNT_EXACT)).lower()
+        if strategy not in COUNT_STRATEGIES:
+            raise Exception(f"Unknown count strategy {strategy}, must be one of {COUNT_STRATEGIES}")
+        self.strategy = strategy
+        self._count_fn = count_fn
+        self._epoch_fn = epoch_fn
+        if shared is not None:
+            self._known = shared._known
+            self._lock = shared._lock
+        else:
+            self._known = {}
+            self._lock = threading.Lock()
+
+    def _remember(self, table_name, count):
+        try:
+            epoch = self._epoch_fn(table_name)
+        except Exception:
+            return
+        with self._lock:
+            self._known[table_name] = (epoch, count)
+
+    def _epoch_cached_count(self, table_name):
+        # read the epoch before the count, if the table changes between the two, the next call counts again
+        try:
+            epoch = self._epoch_fn(table_name)
+        except Exception:
+            epoch = None
+        with self._lock:
+            known = self._known.get(table_name)
+        if epoch is not None and known is not None and known[0] == epoch:
+            return known[1]
+        count = self._count_fn(table_name)
+        if epoch is not None:
+            with self._lock:
+                self._known[table_name] = (epoch, count)
+        return count
+
+    def count(self, table_name, strategy=None):
+        strategy = strategy or self.strategy
+        if strategy == COUNT_NONE:
+            return None
+        elif strategy == COUNT_EPOCH_CACHED:
+            return self._epoch_cached_count(table_name)
+        else:
+            return self._count_fn(table_name)
+
+    def count_after(self, table_name, before, loaded=None, strategy=None):
+        """
+        Count after an update that loaded `loaded` rows, if known.
+        """
+        strategy = strategy or self.strategy
+        if strategy == COUNT_EPOCH_CACHED:
+            if before is not None and loaded is not None:
+                count = before + loaded
+                self._remember(table_name, count)
+                return count
+            # the rows changed are not known, and the epoch changed with the update,
+            # so a known count can not be reused
+            return self._count_fn(table_name)
+        return self.count(table_name, strategy)
+
+    def forget(self, table_names=None):
+        with self._lock:
+            if table_names is None:
+                self._known.clear()
+            else:
+                for name in table_names:
+                    self._known.pop(name, None)
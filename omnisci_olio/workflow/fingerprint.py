@@ -0,0 +1,171 @@
+"""
+Fingerprints (hashes) of source files, for the lineage recorded by `OmniSciDBClient.src_file`.
+
+- hasher: "md5", or any other `hashlib` algorithm, e.g. "sha1", "blake2b", or "xxh3" (the `xxhash` package),
+    by default env var OMNISCI_DB_FILE_HASHER or "md5", the md5sum of the file as logged before
+- mode: "full" hashes the whole file, "sampled" hashes the size and blocks at the head, middle and tail,
+    for very large files that are not changed in place
+
+Fingerprints are cached in a SQLite file by (path, size, mtime, inode, hasher, mode),
+so an unchanged file is not read again, by default `~/.cache/omnisci_olio/fingerprints.sqlite`,
+or env var OMNISCI_DB_FINGERPRINT_CACHE, which can be set to "" for no cache.
+If the cache file can not be created, e.g. in a read-only home directory, files are hashed without a cache.
+"""
+
+import os
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+
+READ_BYTES = 8 * 1024 ** 2
+SAMPLE_BYTES = 4 * 1024 ** 2
+
+MODE_FULL = "full"
+MODE_SAMPLED = "sampled"
+
+Fingerprint = namedtuple("Fingerprint", ["path", "size", "mtime_ns", "hasher", "mode", "digest"])
+
+
+DEFAULT_HASHER = "md5"
+
+
+def default_hasher():
+    return os.environ.get("OMNISCI_DB_FILE_HASHER") or DEFAULT_HASHER
+
+
+def _new_hash(hasher):
+    if hasher == "xxh3":
+        import xxhash
+
+        return xxhash.xxh3_128()
+    return hashlib.new(hasher)
+
+
+def _hash_full(f, h):
+    buf = bytearray(READ_BYTES)
+    view = memoryview(buf)
+    while True:
+        n = f.readinto(buf)
+        if not n:
+            break
+        # hashlib releases the GIL for large buffers, so files hash in parallel in threads
+        h.update(view[:n])
+
+
+def _hash_sampled(f, h, size):
+    h.update(str(size).encode())
+    if size <= 3 * SAMPLE_BYTES:
+        _hash_full(f, h)
+        return
+    for offset in (0, size // 2 - SAMPLE_BYTES // 2, size - SAMPLE_BYTES):
+        f.seek(offset)
+        h.update(f.read(SAMPLE_BYTES))
+
+
+class FingerprintCache:
+    """
+    Fingerprints in a SQLite file, shared by threads and processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._con = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._con:
+            self._con.execute(
+                """CREATE TABLE IF NOT EXISTS fingerprint (
+                    path TEXT, size INTEGER, mtime_ns INTEGER, inode INTEGER, hasher TEXT, mode TEXT, digest TEXT,
+                    PRIMARY KEY (path, size, mtime_ns, inode, hasher, mode))"""
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._con.execute(
+                """SELECT digest FROM fingerprint
+                WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ? AND hasher = ? AND mode = ?""",
+                key,
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def put(self, key, digest):
+        with self._lock, self._con:
+            # older fingerprints of the same path are stale
+            self._con.execute("DELETE FROM fingerprint WHERE path = ? AND hasher = ? AND mode = ?", (key[0], key[4], key[5]))
+            self._con.execute("INSERT OR REPLACE INTO fingerprint VALUES (?, ?, ?, ?, ?, ?, ?)", key + (digest,))
+
+    def close(self):
+        with self._lock:
+            self._con.close()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_fingerprint_cache(path=None):
+    """
+    The process-wide FingerprintCache for path, or the default path,
+    or None if caching is disabled or the cache can not be created.
+    """
+    if path is None:
+        path = os.environ.get("OMNISCI_DB_FINGERPRINT_CACHE")
+        if path is None:
+            home = os.path.expanduser("~")
+            # no home directory, not expanded
+            if home.startswith("~"):
+                return None
+            path = os.path.join(home, ".cache", "omnisci_olio", "fingerprints.sqlite")
+    if not path:
+        return None
+    with _caches_lock:
+        if path not in _caches:
+            try:
+                _caches[path] = FingerprintCache(path)
+            except (OSError, sqlite3.Error):
+                # do not try again for every file
+                _caches[path] = None
+        return _caches[path]
+
+
+def fingerprint(path, hasher=None, mode=MODE_FULL, cache=True):
+    """
+    Return the Fingerprint of the file at path.
+    cache - True for the default FingerprintCache, False for none, or a FingerprintCache
+    """
+    hasher = hasher or default_hasher()
+    if mode not in (MODE_FULL, MODE_SAMPLED):
+        raise Exception(f"Unknown fingerprint mode {mode}, must be one of {(MODE_FULL, MODE_SAMPLED)}")
+    path = os.path.abspath(path)
+    if cache is True:
+        cache = get_fingerprint_cache()
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        key = (path, stat.st_size, stat.st_mtime_ns, stat.st_ino, hasher, mode)
+        digest = cache.get(key) if cache else None
+        if digest is None:
+            h = _new_hash(hasher)
+            if mode == MODE_SAMPLED:
+                _hash_sampled(f, h, stat.st_size)
+            else:
+                _hash_full(f, h)
+            digest = h.hexdigest()
+            if cache:
+                cache.put(key, digest)
+    return Fingerprint(path, stat.st_size, stat.st_mtime_ns, hasher, mode, digest)
+
+
+def fingerprint_files(paths, hasher=None, mode=MODE_FULL, cache=True, max_workers=None):
+    """
+    Return the Fingerprints of paths, in the same order, hashed in parallel threads.
+    """
+    paths = list(paths)
+    hasher = hasher or default_hasher()
+    if cache is True:
+        cache = get_fingerprint_cache()
+    max_workers = max_workers or min(len(paths), os.cpu_count() or 4) or 1
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="omnisci_olio_fingerprint") as executor:
+        return list(executor.map(lambda p: fingerprint(p, hasher=hasher, mode=mode, cache=cache), paths))
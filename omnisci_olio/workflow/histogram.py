@@ -0,0 +1,288 @@
+"""
+In-process latency histograms of the statements run by the client, per SQL fingerprint:
+the SQL with literals replaced by `?`, so that the same statement with different values is counted together.
+
+Histograms are log-linear (HDR style): exact up to 16 microseconds, then 16 buckets per power of 2,
+so percentiles are within about 6%, in a few hundred counters at most.
+
+For example:
+
+    from omnisci_olio.workflow.histogram import get_histograms
+
+    print(get_histograms().to_dataframe().sort_values("sum_s", ascending=False).head(20))
+
+`dump()` and `merge()` combine the histograms of several processes,
+and `flush(con)` appends them to the table `omnisci_db_latency` and resets them.
+Set env var OMNISCI_DB_HISTOGRAMS=0 to not record.
+"""
+
+import os
+import re
+import json
+import socket
+import hashlib
+import datetime
+import threading
+from functools import lru_cache
+
+import pandas as pd
+
+import omnisci_olio.schema as sc
+
+
+_SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+
+
+def _bucket(us):
+    if us < _SUB_BUCKETS:
+        return us
+    shift = us.bit_length() - 1 - _SUB_BUCKET_BITS
+    return _SUB_BUCKETS * (shift + 1) + ((us >> shift) - _SUB_BUCKETS)
+
+
+def _bucket_range(index):
+    """
+    [low, high) microseconds of a bucket.
+    """
+    if index < _SUB_BUCKETS:
+        return index, index + 1
+    shift = index // _SUB_BUCKETS - 1
+    m = index % _SUB_BUCKETS + _SUB_BUCKETS
+    return m << shift, (m + 1) << shift
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.sum_s = 0.0
+        self.min_s = None
+        self.max_s = None
+
+    def record(self, seconds):
+        i = _bucket(max(int(seconds * 1e6), 0))
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self.count += 1
+        self.sum_s += seconds
+        self.min_s = seconds if self.min_s is None else min(self.min_s, seconds)
+        self.max_s = seconds if self.max_s is None else max(self.max_s, seconds)
+
+    def percentile(self, p):
+        """
+        Seconds at percentile p (0 to 100), the middle of its bucket.
+        """
+        if self.count == 0:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                low, high = _bucket_range(i)
+                return min(max((low + high) / 2e6, self.min_s), self.max_s)
+        return self.max_s
+
+    def merge(self, other):
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+        self.count += other.count
+        self.sum_s += other.sum_s
+        if other.min_s is not None:
+            self.min_s = other.min_s if self.min_s is None else min(self.min_s, other.min_s)
+            self.max_s = other.max_s if self.max_s is None else max(self.max_s, other.max_s)
+
+    def to_dict(self):
+        return dict(
+            buckets={str(i): n for i, n in self.buckets.items()},
+            count=self.count,
+            sum_s=self.sum_s,
+            min_s=self.min_s,
+            max_s=self.max_s,
+        )
+
+    @staticmethod
+    def from_dict(d):
+        h = LatencyHistogram()
+        h.buckets = {int(i): n for i, n in d["buckets"].items()}
+        h.count = d["count"]
+        h.sum_s = d["sum_s"]
+        h.min_s = d["min_s"]
+        h.max_s = d["max_s"]
+        return h
+
+
+_comment_re = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_string_re = re.compile(r"'(?:[^']|'')*'")
+_number_re = re.compile(r"(?<![A-Za-z_0-9.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_in_list_re = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+@lru_cache(maxsize=4096)
+def sql_fingerprint(sql):
+    """
+    Return (fingerprint_id, fingerprint): the SQL with comments removed, literals replaced by `?`,
+    lists of literals by `(...)` and whitespace collapsed, and a short hash of it.
+    """
+    text = _comment_re.sub(" ", sql)
+    text = _string_re.sub("?", text)
+    text = _number_re.sub("?", text)
+    text = _in_list_re.sub("(...)", text)
+    text = " ".join(text.split()).rstrip(";").strip()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16], text
+
+
+latency_table = sc.Table(
+    "omnisci_db_latency",
+    [
+        sc.Column("created_at", sc.Timestamp(0)),
+        sc.Column("hostname", sc.text16),
+        sc.Column("pid", sc.Integer()),
+        sc.Column("kind", sc.text8),
+        sc.Column("fingerprint_id", sc.Text()),
+        sc.Column("fingerprint", sc.Text()),
+        sc.Column("op_count", sc.int64),
+        sc.Column("sum_s", sc.Float(64)),
+        sc.Column("min_s", sc.Float(64)),
+        sc.Column("max_s", sc.Float(64)),
+        sc.Column("p50_s", sc.Float(64)),
+        sc.Column("p95_s", sc.Float(64)),
+        sc.Column("p99_s", sc.Float(64)),
+        sc.Column("buckets", sc.Text(encoding=None)),
+    ],
+    props=dict(fragment_size=1000000, max_rollback_epochs=3),
+)
+
+
+# (uri, table name) of the tables created by `flush` in this process
+_created_tables = set()
+_created_tables_lock = threading.Lock()
+
+
+def _create_once(con, table):
+    key = (con.uri, table.name)
+    with _created_tables_lock:
+        if key in _created_tables:
+            return
+    con.create_table(table)
+    with _created_tables_lock:
+        _created_tables.add(key)
+
+
+class LatencyHistograms:
+    """
+    Histograms keyed by (kind, fingerprint_id), where kind is e.g. "query", "update" or "load".
+    """
+
+    def __init__(self, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get("OMNISCI_DB_HISTOGRAMS", "1") not in ("0", "false", "False")
+        self.enabled = enabled
+        self._histograms = {}
+        self._fingerprints = {}
+        self._lock = threading.Lock()
+
+    def record(self, kind, sql, seconds):
+        if not self.enabled or sql is None:
+            return
+        fid, text = sql_fingerprint(sql)
+        key = (kind, fid)
+        with self._lock:
+            h = self._histograms.get(key)
+            if h is None:
+                h = self._histograms[key] = LatencyHistogram()
+                self._fingerprints[fid] = text
+            h.record(seconds)
+
+    def dump(self):
+        """
+        A JSON serializable list of the histograms, for `merge` in another process.
+        """
+        with self._lock:
+            return [
+                dict(kind=kind, fingerprint_id=fid, fingerprint=self._fingerprints[fid], **h.to_dict())
+                for (kind, fid), h in self._histograms.items()
+            ]
+
+    def merge(self, dumped):
+        """
+        Add the histograms of a `dump()` into these.
+        """
+        for d in dumped:
+            key = (d["kind"], d["fingerprint_id"])
+            other = LatencyHistogram.from_dict(d)
+            with self._lock:
+                h = self._histograms.get(key)
+                if h is None:
+                    h = self._histograms[key] = LatencyHistogram()
+                    self._fingerprints[d["fingerprint_id"]] = d["fingerprint"]
+                h.merge(other)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._fingerprints = {}
+
+    def _take(self):
+        """
+        Dump and reset at once, so no records are lost in between.
+        """
+        with self._lock:
+            dumped = [
+                dict(kind=kind, fingerprint_id=fid, fingerprint=self._fingerprints[fid], **h.to_dict())
+                for (kind, fid), h in self._histograms.items()
+            ]
+            self._histograms = {}
+            self._fingerprints = {}
+        return dumped
+
+    def to_dataframe(self, dumped=None):
+        rows = []
+        for d in self.dump() if dumped is None else dumped:
+            h = LatencyHistogram.from_dict(d)
+            rows.append(
+                dict(
+                    kind=d["kind"],
+                    fingerprint_id=d["fingerprint_id"],
+                    fingerprint=d["fingerprint"],
+                    op_count=h.count,
+                    sum_s=h.sum_s,
+                    min_s=h.min_s,
+                    max_s=h.max_s,
+                    p50_s=h.percentile(50),
+                    p95_s=h.percentile(95),
+                    p99_s=h.percentile(99),
+                    buckets=json.dumps(d["buckets"]),
+                )
+            )
+        return pd.DataFrame(rows, columns=[c.name for c in latency_table.columns][3:])
+
+    def flush(self, con, table=latency_table):
+        """
+        Append the histograms to a table with the OmniSciDBClient con, and reset them.
+        The table is created by the first flush of the process.
+        """
+        dumped = self._take()
+        if not dumped:
+            return table.name
+        try:
+            df = self.to_dataframe(dumped)
+            df.insert(0, "created_at", pd.Timestamp(datetime.datetime.now().replace(microsecond=0)))
+            df.insert(1, "hostname", socket.gethostname())
+            df.insert(2, "pid", os.getpid())
+            _create_once(con, table)
+            return con.load_table(table.name, df, take_counts=False)
+        except Exception:
+            # keep them for the next flush
+            self.merge(dumped)
+            raise
+
+
+_histograms = LatencyHistograms()
+
+
+def get_histograms():
+    """
+    The process-wide LatencyHistograms, recorded by all clients.
+    """
+    return _histograms
@@ -0,0 +1,389 @@
+"""
+Columnar Arrow load of DataFrames, pyarrow Tables, RecordBatch iterators and Parquet files,
+in chunks uploaded concurrently over several sessions, and Parquet staging files for COPY FROM.
+
+Arrow data is not converted to pandas: record batches are reconciled with the columns of the target table
+(projected, reordered and cast) and uploaded as they are read, and only the columns of the target table
+are read from Parquet files.
+"""
+
+import os
+import re
+import glob
+import itertools
+from collections.abc import Iterator
+from time import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import omnisci_olio.schema as sc
+from .pool import get_pool
+
+
+DEFAULT_CHUNK_ROWS = 1000000
+
+
+def _to_arrow(df):
+    import pyarrow as pa
+
+    # numeric columns without nulls are converted without copying
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def iter_chunks(df, chunk_rows):
+    """
+    Yield (index, chunk) slices of df, each a view of at most chunk_rows rows.
+    """
+    for i, start in enumerate(range(0, len(df.index), chunk_rows)):
+        yield i, df.iloc[start : start + chunk_rows]
+
+
+def _load_chunk(con, table_name, index, chunk):
+    tstart = time()
+    rows = chunk.num_rows if hasattr(chunk, "num_rows") else len(chunk.index)
+    data = chunk if hasattr(chunk, "num_rows") else _to_arrow(chunk)
+    con.con.load_table_arrow(table_name, data, preserve_index=False)
+    return dict(chunk=index, rows=rows, time_s=round(time() - tstart, 2))
+
+
+def _chunk_failed(table_name, index, loaded):
+    loaded = sorted(r["chunk"] for r in loaded)
+    return Exception(
+        f"Loading chunk {index} into {table_name} failed. "
+        f"The load is not atomic, chunks {loaded} were loaded and are left in the table"
+    )
+
+
+def load_chunks(con, table_name, chunks, parallel=4):
+    """
+    Load (index, chunk) pairs into table_name, where each chunk is a DataFrame or pyarrow Table.
+    Chunks are uploaded on up to `parallel` sessions from the pool for the connection URI.
+    A DataFrame chunk is converted to Arrow by the thread that uploads it,
+    and at most 2 * parallel chunks are converted or in flight at any time.
+
+    The load is not atomic. If a chunk fails, e.g. on a lost connection or a type the server does not accept,
+    no more chunks are started, and once the chunks in flight finish an exception is raised from the error,
+    naming the chunks that were loaded and are left in the table.
+    Rows the server rejects without an error are found by counting the table, see `OmniSciDBClient.load_table`.
+
+    Returns a list of dicts per chunk: chunk, rows and time_s.
+    """
+    uri = getattr(con, "uri", None)
+    if parallel <= 1 or uri is None:
+        # the session of con, one chunk at a time
+        results = []
+        for index, chunk in chunks:
+            try:
+                results.append(_load_chunk(con, table_name, index, chunk))
+            except Exception as e:
+                raise _chunk_failed(table_name, index, results) from e
+        return results
+
+    pool = get_pool(uri)
+
+    def load(index, chunk):
+        with pool.session() as session:
+            return _load_chunk(session, table_name, index, chunk)
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=parallel) as executor:
+        pending = set()
+        for index, chunk in chunks:
+            if len(pending) >= 2 * parallel:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                if any(f.exception() is not None for f in done):
+                    break
+            future = executor.submit(load, index, chunk)
+            futures[future] = index
+            pending.add(future)
+    results = sorted((f.result() for f in futures if f.exception() is None), key=lambda r: r["chunk"])
+    failed = sorted((index, f.exception()) for f, index in futures.items() if f.exception() is not None)
+    if failed:
+        index, e = failed[0]
+        raise _chunk_failed(table_name, index, results) from e
+    return results
+
+
+def load_dataframe_arrow(con, table_name, df, chunk_rows=None, parallel=4):
+    """
+    Load a DataFrame through the Arrow load path, split into chunks of chunk_rows rows.
+    """
+    return load_chunks(con, table_name, iter_chunks(df, chunk_rows or DEFAULT_CHUNK_ROWS), parallel)
+
+
+def write_parquet_chunks(df, directory, chunk_rows=None, parallel=4):
+    """
+    Write df as Parquet files of chunk_rows rows in directory, `parallel` files at a time.
+    Returns the list of file paths.
+    """
+    import pyarrow.parquet as pq
+
+    os.makedirs(directory, exist_ok=True)
+
+    def write(index_chunk):
+        index, chunk = index_chunk
+        path = os.path.join(directory, f"part_{index:05}.parquet")
+        pq.write_table(_to_arrow(chunk), path)
+        return path
+
+    with ThreadPoolExecutor(max_workers=max(parallel, 1)) as executor:
+        return list(executor.map(write, iter_chunks(df, chunk_rows or DEFAULT_CHUNK_ROWS)))
+
+
+_PARQUET_SUFFIXES = (".parquet", ".parq")
+
+
+class _RecordBatches(Iterator):
+    """
+    An iterator of record batches, whose first batch was read to check that it is one, and for its schema.
+    """
+
+    def __init__(self, schema, batches):
+        self.schema = schema
+        self._batches = batches
+
+    def __next__(self):
+        return next(self._batches)
+
+
+def _is_parquet_path(path):
+    if os.path.isdir(path):
+        return next(
+            (True for p in glob.iglob(os.path.join(path, "**", "*"), recursive=True) if _is_parquet_path(p)), False
+        )
+    return path.lower().endswith(_PARQUET_SUFFIXES)
+
+
+def is_arrow_data(data):
+    """
+    True if data is a pyarrow Table, RecordBatch, RecordBatchReader or Dataset,
+    an iterator of RecordBatches from `as_arrow_data`, a Parquet file path (or glob pattern) ending in .parquet,
+    or a pathlib.Path of a Parquet file or of a directory with Parquet files.
+    """
+    if type(data).__module__.split(".")[0] == "pyarrow" or isinstance(data, _RecordBatches):
+        return True
+    if isinstance(data, str):
+        return data.lower().endswith(_PARQUET_SUFFIXES)
+    if isinstance(data, os.PathLike):
+        return _is_parquet_path(os.fspath(data))
+    return False
+
+
+def as_arrow_data(data):
+    """
+    Return (data, True) if data is Arrow data, see `is_arrow_data`, else (data, False).
+    The first item of an iterator is read: it is Arrow data if that is a pyarrow RecordBatch,
+    and is returned as a new iterator starting with that item.
+    """
+    if isinstance(data, Iterator) and not is_arrow_data(data):
+        import pyarrow as pa
+
+        first = next(data, None)
+        batches = itertools.chain([] if first is None else [first], data)
+        if isinstance(first, pa.RecordBatch):
+            return _RecordBatches(first.schema, batches), True
+        return batches, False
+    return data, is_arrow_data(data)
+
+
+def _open_parquet(data):
+    import pyarrow.dataset as ds
+
+    if isinstance(data, str) and glob.has_magic(data):
+        paths = sorted(glob.glob(data))
+        if not paths:
+            raise Exception(f"No Parquet files match {data}")
+        data = paths
+    elif isinstance(data, os.PathLike):
+        data = os.fspath(data)
+    return ds.dataset(data, format="parquet")
+
+
+def arrow_batches(data, columns=None, batch_rows=None):
+    """
+    Return (schema, iterator of RecordBatches) of Arrow data, see `is_arrow_data`.
+    columns - the column names to read from a Parquet file or Dataset, columns not in the data are ignored
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    batch_rows = batch_rows or DEFAULT_CHUNK_ROWS
+    if isinstance(data, (str, os.PathLike)):
+        data = _open_parquet(data)
+    if isinstance(data, ds.Dataset):
+        if columns is not None:
+            columns = [c for c in columns if c in data.schema.names]
+        schema = data.schema if columns is None else pa.schema([data.schema.field(c) for c in columns])
+        # the projection is read from the files, the other columns are not read
+        return schema, iter(data.to_batches(columns=columns, batch_size=batch_rows))
+    if isinstance(data, pa.RecordBatch):
+        return data.schema, iter([data])
+    if isinstance(data, pa.Table):
+        return data.schema, iter(data.to_batches(max_chunksize=batch_rows))
+    if isinstance(data, pa.RecordBatchReader):
+        return data.schema, iter(data)
+    batches = iter(data)
+    first = next(batches, None)
+    if first is None:
+        raise Exception("No record batches to load")
+    if not isinstance(first, pa.RecordBatch):
+        raise Exception(f"Expected an iterator of pyarrow RecordBatches, got {type(first)}")
+    return first.schema, itertools.chain([first], batches)
+
+
+_TIMESTAMP_UNITS = {0: "s", 3: "ms", 6: "us", 9: "ns"}
+
+_ddl_type_re = re.compile(r"\s*([A-Za-z]+)\s*(?:\(\s*(\d+)\s*\))?")
+
+
+def arrow_type(dtype):
+    """
+    The pyarrow type to load into a column of dtype, an `sc.Datatype`, the type text of SHOW CREATE TABLE,
+    e.g. "TIMESTAMP(3)", or an Ibis dtype, which may not have the precision of a timestamp,
+    or None to load the data as it is, e.g. for arrays, decimals and geometry.
+    """
+    import pyarrow as pa
+
+    if isinstance(dtype, str):
+        if "[" in dtype:
+            return None
+        m = _ddl_type_re.match(dtype)
+        name = m[1].lower()
+        precision = int(m[2]) if m[2] else None
+    elif isinstance(dtype, sc.Datatype):
+        if dtype.array:
+            return None
+        name = dtype.typename.lower()
+        precision = dtype.precision
+    else:
+        if getattr(dtype, "value_type", None) is not None:
+            # Ibis array
+            return None
+        name = str(dtype).lstrip("!").split("(")[0]
+        precision = getattr(dtype, "scale", None)
+    types = {
+        "tinyint": pa.int8(),
+        "int8": pa.int8(),
+        "smallint": pa.int16(),
+        "int16": pa.int16(),
+        "integer": pa.int32(),
+        "int32": pa.int32(),
+        "bigint": pa.int64(),
+        "int64": pa.int64(),
+        "float": pa.float32(),
+        "float32": pa.float32(),
+        "double": pa.float64(),
+        "float64": pa.float64(),
+        "boolean": pa.bool_(),
+        "text": pa.string(),
+        "string": pa.string(),
+        "date": pa.date32(),
+        "time": pa.time64("us"),
+    }
+    if name == "timestamp":
+        return pa.timestamp(_TIMESTAMP_UNITS.get(precision or 0, "ns"))
+    return types.get(name)
+
+
+def _sc_datatype(t):
+    import pyarrow as pa
+
+    if pa.types.is_dictionary(t):
+        t = t.value_type
+    if pa.types.is_unsigned_integer(t):
+        # the signed type twice as wide holds all the values
+        if t.bit_width == 64:
+            raise Exception(f"No OmniSci type for Arrow type {t}, cast it to int64 or a decimal first")
+        return sc.Integer(t.bit_width * 2)
+    if pa.types.is_integer(t):
+        return sc.Integer(t.bit_width)
+    if pa.types.is_floating(t):
+        return sc.Float(64 if t.bit_width == 64 else 32)
+    if pa.types.is_boolean(t):
+        return sc.Boolean()
+    if pa.types.is_string(t) or pa.types.is_large_string(t):
+        return sc.Text()
+    if pa.types.is_timestamp(t):
+        return sc.Timestamp({"s": 0, "ms": 3, "us": 6, "ns": 9}[t.unit])
+    if pa.types.is_date(t):
+        return sc.Date()
+    raise Exception(f"No OmniSci type for Arrow type {t}")
+
+
+def table_from_arrow_schema(name, schema):
+    """
+    An sc.Table with the columns of a pyarrow schema.
+    """
+    return sc.Table(name, [sc.Column(f.name, _sc_datatype(f.type)) for f in schema])
+
+
+class ArrowReconciliation:
+    """
+    The projection, order and casts of the columns of record batches of a schema
+    to load into target columns, a list of (name, dtype) where dtype is as for `arrow_type`.
+    """
+
+    def __init__(self, schema, target):
+        import pyarrow as pa
+
+        missing = [name for name, _ in target if name not in schema.names]
+        if missing:
+            raise Exception(f"Columns missing from the Arrow data: {missing}")
+        self.columns = []
+        self.casts = []
+        for name, dtype in target:
+            i = schema.get_field_index(name)
+            to = arrow_type(dtype)
+            source = schema.field(i).type
+            cast = None
+            if to is not None and source != to:
+                # dictionary encoded strings are loaded as they are
+                if not (pa.types.is_dictionary(source) and source.value_type == to):
+                    cast = to
+            self.columns.append((name, i, cast))
+            if cast is not None:
+                self.casts.append(name)
+
+    def apply(self, batch):
+        import pyarrow as pa
+
+        arrays = [
+            batch.column(i) if cast is None else batch.column(i).cast(cast) for _, i, cast in self.columns
+        ]
+        return pa.RecordBatch.from_arrays(arrays, names=[name for name, _, _ in self.columns])
+
+
+def iter_arrow_chunks(batches, reconcile=None, chunk_rows=None):
+    """
+    Yield (index, pyarrow Table) chunks of at most chunk_rows rows from record batches, reconciled,
+    where consecutive small batches, e.g. of small Parquet row groups, are combined without copying.
+    """
+    import pyarrow as pa
+
+    chunk_rows = chunk_rows or DEFAULT_CHUNK_ROWS
+    pending = []
+    pending_rows = 0
+    index = 0
+    for batch in batches:
+        if reconcile is not None:
+            batch = reconcile.apply(batch)
+        for start in range(0, batch.num_rows, chunk_rows):
+            part = batch.slice(start, chunk_rows)
+            if pending_rows + part.num_rows > chunk_rows and pending:
+                yield index, pa.Table.from_batches(pending)
+                index += 1
+                pending = []
+                pending_rows = 0
+            pending.append(part)
+            pending_rows += part.num_rows
+    if pending:
+        yield index, pa.Table.from_batches(pending)
+
+
+def load_arrow(con, table_name, schema, batches, target=None, chunk_rows=None, parallel=4):
+    """
+    Load record batches of schema into table_name, reconciled with the target columns if not None.
+    Returns (chunks, casts): the results of `load_chunks` and the names of the columns that were cast.
+    """
+    reconcile = None if target is None else ArrowReconciliation(schema, target)
+    chunks = load_chunks(con, table_name, iter_arrow_chunks(batches, reconcile, chunk_rows), parallel)
+    return chunks, None if reconcile is None else reconcile.casts
@@ -0,0 +1,212 @@
+"""
+Maintenance of the `omnisci_db_update_log` table:
+
+1. roll up the detail rows older than the retention into hourly and daily aggregates
+    per operation, target table and process_app, in the table `omnisci_db_update_log_rollup`
+2. delete the detail rows older than the retention
+3. rewrite the table sorted by `created_at`, so that queries of a time range skip fragments
+
+The table is replaced by renaming it out of the way and renaming the sorted copy in its place,
+so it is missing only between two renames. Rows written while the table is copied are copied after the renames.
+If a client creates the log table between the renames, the sorted rows are appended to that table instead.
+
+From the command line, with the log DB URL in env var OMNISCI_DB_LOG_URL (or OMNISCI_DB_URL):
+
+    python -m omnisci_olio.workflow.logmaint --retention-days 90
+"""
+
+import os
+import sys
+import argparse
+from time import time
+
+import omnisci_olio.schema as sc
+from .client import connect, db_update_log_table
+
+
+ROLLUP_PERIODS = ("hour", "day")
+
+rollup_table = sc.Table(
+    "omnisci_db_update_log_rollup",
+    [
+        sc.Column("period", sc.text8),
+        sc.Column("period_start", sc.Timestamp(0)),
+        sc.Column("operation", sc.Text(16)),
+        sc.Column("tgt_table", sc.Text(16)),
+        sc.Column("process_app", sc.Text(16)),
+        sc.Column("op_count", sc.int64),
+        sc.Column("error_count", sc.int64),
+        sc.Column("process_rows", sc.int64),
+        sc.Column("process_sec", sc.Float(64)),
+        sc.Column("process_sec_max", sc.Float(64)),
+        sc.Column("first_created_at", sc.Timestamp(9)),
+        sc.Column("last_created_at", sc.Timestamp(9)),
+    ],
+    props=dict(fragment_size=1000000, max_rollback_epochs=3),
+)
+
+
+def default_retention_days():
+    return float(os.environ.get("OMNISCI_DB_LOG_RETENTION_DAYS", 90))
+
+
+def _cutoff_sql(retention_days):
+    # whole days, so that the rolled up periods are complete
+    return f"DATE_TRUNC(day, NOW() - INTERVAL '{int(retention_days * 24 * 3600)}' SECOND)"
+
+
+def rollup(con, retention_days, periods=ROLLUP_PERIODS, log_table=None, table=None):
+    """
+    Insert the aggregates of the detail rows older than the retention.
+    Aggregates of the same periods from an earlier run that did not delete its detail rows are replaced.
+    """
+    log_table = log_table or db_update_log_table.name
+    table = table or rollup_table
+    con.create_table(table)
+    cutoff = _cutoff_sql(retention_days)
+    old = f"FROM {log_table} WHERE created_at < {cutoff}"
+    for period in periods:
+        con.exec_update(
+            table.name,
+            f"""DELETE FROM {table.name} WHERE period = '{period}'
+            AND period_start >= (SELECT DATE_TRUNC({period}, MIN(created_at)) {old})
+            AND period_start < {cutoff};""",
+            cmd="LOG ROLLUP",
+        )
+        con.exec_update(
+            table.name,
+            f"""INSERT INTO {table.name}
+            SELECT '{period}', CAST(DATE_TRUNC({period}, created_at) AS TIMESTAMP(0)),
+                operation, tgt_table, process_app,
+                CAST(COUNT(*) AS BIGINT), CAST(SUM(error_count) AS BIGINT), CAST(SUM(process_rows) AS BIGINT),
+                CAST(SUM(process_sec) AS DOUBLE), CAST(MAX(process_sec) AS DOUBLE),
+                MIN(created_at), MAX(created_at)
+            {old}
+            GROUP BY 2, 3, 4, 5;""",
+            sources=[log_table],
+            cmd="LOG ROLLUP",
+        )
+    return table.name
+
+
+def delete_expired(con, retention_days, log_table=None):
+    log_table = log_table or db_update_log_table.name
+    return con.exec_update(
+        log_table,
+        f"DELETE FROM {log_table} WHERE created_at < {_cutoff_sql(retention_days)};",
+        cmd="LOG RETENTION",
+    )
+
+
+def _names(log_table):
+    return f"{log_table}__sorted", f"{log_table}__old"
+
+
+def _columns():
+    return ", ".join(c.name for c in db_update_log_table.columns)
+
+
+def rewrite_statements(log_table, max_rowid):
+    """
+    The statements of `rewrite_sorted`, in order, copying the rows up to max_rowid sorted,
+    and the rows written after them unsorted.
+    """
+    tmp, old = _names(log_table)
+    cols = _columns()
+    return [
+        f"DROP TABLE IF EXISTS {tmp};",
+        f"DROP TABLE IF EXISTS {old};",
+        db_update_log_table.copy_named(tmp).compile(),
+        f"INSERT INTO {tmp} ({cols}) SELECT {cols} FROM {log_table} WHERE rowid <= {max_rowid} ORDER BY created_at;",
+        # the table is not dropped before the sorted copy has its name
+        f"ALTER TABLE {log_table} RENAME TO {old};",
+        f"ALTER TABLE {tmp} RENAME TO {log_table};",
+        f"INSERT INTO {log_table} ({cols}) SELECT {cols} FROM {old} WHERE rowid > {max_rowid};",
+        f"DROP TABLE {old};",
+    ]
+
+
+def _recover_statements(log_table, max_rowid):
+    # the log table was created again between the renames, append the sorted rows to it
+    tmp, old = _names(log_table)
+    cols = _columns()
+    return [
+        f"INSERT INTO {log_table} ({cols}) SELECT {cols} FROM {tmp};",
+        f"INSERT INTO {log_table} ({cols}) SELECT {cols} FROM {old} WHERE rowid > {max_rowid};",
+        f"DROP TABLE {tmp};",
+        f"DROP TABLE {old};",
+    ]
+
+
+def rewrite_sorted(con, log_table=None):
+    """
+    Copy the table sorted by created_at into a new table, and replace the table with it.
+    """
+    log_table = log_table or db_update_log_table.name
+    tstart = time()
+    before = con._count_exact(log_table)
+    # write the pending log rows before the table is copied
+    if con._log_sink is not None:
+        con._log_sink.flush()
+    # rows are appended with larger rowids, so the rows written while the table is copied are after this one
+    max_rowid = con.con.con.execute(f"SELECT MAX(rowid) FROM {log_table}").fetchone()[0]
+    if max_rowid is None:
+        return log_table
+    statements = rewrite_statements(log_table, max_rowid)
+    rename = statements.index(f"ALTER TABLE {_names(log_table)[0]} RENAME TO {log_table};")
+    # not by exec_update, to not write log rows into the table while it is replaced
+    try:
+        for i, sql in enumerate(statements):
+            try:
+                con.con.con.execute(sql)
+            except Exception:
+                con.table_cache.invalidate([log_table])
+                if i != rename or not con.exists_table(log_table):
+                    raise
+                statements = statements[:i] + _recover_statements(log_table, max_rowid)
+                for recover_sql in statements[i:]:
+                    con.con.con.execute(recover_sql)
+                break
+    finally:
+        con._tables_changed([log_table, *_names(log_table)], ddl=True)
+    con.log("LOG REWRITE", tstart, log_table, None, before, con._count_exact(log_table), sql=" ".join(statements))
+    return log_table
+
+
+def maintain_update_log(con, retention_days=None, periods=ROLLUP_PERIODS, rewrite=True):
+    """
+    con - an OmniSciDBClient connected to the DB of the log
+    retention_days - detail rows are kept for this many days, by default env var OMNISCI_DB_LOG_RETENTION_DAYS or 90
+    periods - the rollup periods, DATE_TRUNC units
+    rewrite - rewrite the table sorted by created_at
+    """
+    retention_days = default_retention_days() if retention_days is None else retention_days
+    log_table = db_update_log_table.name
+    if not con.exists_table(log_table):
+        return None
+    if periods:
+        rollup(con, retention_days, periods)
+    delete_expired(con, retention_days)
+    if rewrite:
+        rewrite_sorted(con)
+    return log_table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--url", default=os.environ.get("OMNISCI_DB_LOG_URL"), help="log DB URL")
+    parser.add_argument("--retention-days", type=float, default=None)
+    parser.add_argument("--periods", default=",".join(ROLLUP_PERIODS), help="comma separated, or empty for no rollup")
+    parser.add_argument("--no-rewrite", action="store_true", help="do not rewrite the table sorted")
+    args = parser.parse_args(argv)
+    with connect(args.url) as con:
+        maintain_update_log(
+            con,
+            retention_days=args.retention_days,
+            periods=tuple(p for p in args.periods.split(",") if p),
+            rewrite=not args.no_rewrite,
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
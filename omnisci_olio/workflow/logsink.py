@@ -0,0 +1,237 @@
+"""
+Background writer for the DB update log table.
+
+Rows are buffered in a bounded queue and loaded in batches by a daemon thread,
+so that writing the audit log is not a server round trip for each logged operation.
+"""
+
+import os
+import queue
+import atexit
+import logging
+import threading
+from time import time
+
+import pandas as pd
+
+import omnisci_olio.schema as sc
+from .pool import get_pool
+
+
+def _logger():
+    return logging.getLogger("omnisci_olio_logsink")
+
+
+def _pandas_dtype(datatype):
+    if datatype.array:
+        return None
+    elif isinstance(datatype, sc.Integer):
+        return f"Int{datatype.size}"
+    elif isinstance(datatype, sc.Float):
+        return f"float{datatype.size}"
+    elif isinstance(datatype, sc.Timestamp):
+        return "datetime64[ns]"
+    else:
+        return None
+
+
+class LogSink:
+    """
+    Buffer rows for `table` (a sc.Table) and load them in batches to the DB at `uri`.
+
+    batch_rows - flush when this many rows are buffered
+    flush_interval_s - flush buffered rows at least this often
+    max_queue - rows that can be buffered; rows logged when the queue is full are dropped and counted
+    flush_timeout_s - how long `flush()` waits for the background thread,
+        by default env var OMNISCI_DB_LOG_FLUSH_TIMEOUT_S or 30
+    """
+
+    # how often a batch being filled checks for a flush request
+    _poll_s = 0.05
+
+    def __init__(self, uri, table, batch_rows=None, flush_interval_s=None, max_queue=None, flush_timeout_s=None):
+        self.uri = uri
+        self.table = table
+        self.batch_rows = batch_rows or int(os.environ.get("OMNISCI_DB_LOG_BATCH_ROWS", 500))
+        self.flush_interval_s = flush_interval_s or float(
+            os.environ.get("OMNISCI_DB_LOG_FLUSH_S", 5)
+        )
+        self.max_queue = max_queue or int(os.environ.get("OMNISCI_DB_LOG_MAX_QUEUE", 10000))
+        self.flush_timeout_s = flush_timeout_s or float(os.environ.get("OMNISCI_DB_LOG_FLUSH_TIMEOUT_S", 30))
+        self.columns = [c.name for c in table.columns]
+        self.dtypes = {
+            c.name: _pandas_dtype(c.datatype)
+            for c in table.columns
+            if _pandas_dtype(c.datatype) is not None
+        }
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._stats_lock = threading.Lock()
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._write_lock = threading.Lock()
+        # flush requests are numbered, the background thread reports the last one it completed
+        self._flush_event = threading.Event()
+        self._flush_cond = threading.Condition()
+        self._flush_requested = 0
+        self._flush_completed = 0
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name="omnisci_olio_logsink", daemon=True
+        )
+        self._thread.start()
+
+    def _count(self, **increments):
+        with self._stats_lock:
+            for k, n in increments.items():
+                setattr(self, k, getattr(self, k) + n)
+
+    def write(self, row):
+        """
+        Queue a row, never blocks. Returns False if the row was dropped.
+        """
+        if self._stopped:
+            self._count(dropped=1)
+            return False
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self._count(dropped=1)
+            return False
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(
+                queued=self._queue.qsize(),
+                written=self.written,
+                dropped=self.dropped,
+                failed=self.failed,
+                batches=self.batches,
+            )
+
+    def _take(self, max_rows, timeout):
+        """
+        Up to max_rows queued rows, waiting up to timeout for them, or less if a flush is requested.
+        """
+        rows = []
+        deadline = time() + timeout
+        while len(rows) < max_rows:
+            remaining = deadline - time()
+            try:
+                if remaining > 0 and not self._flush_event.is_set():
+                    rows.append(self._queue.get(timeout=min(remaining, self._poll_s)))
+                else:
+                    rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                if remaining <= 0 or self._flush_event.is_set():
+                    break
+        return rows
+
+    def _drain(self):
+        """
+        Write the rows queued now, but not the rows queued while writing, so it ends while others keep logging.
+        """
+        rows = self._take(self._queue.qsize(), 0)
+        for i in range(0, len(rows), self.batch_rows):
+            self._write(rows[i : i + self.batch_rows])
+
+    def _run(self):
+        while not self._stopped:
+            rows = self._take(self.batch_rows, self.flush_interval_s)
+            if rows:
+                self._write(rows)
+            if self._flush_event.is_set():
+                self._flush_event.clear()
+                with self._flush_cond:
+                    requested = self._flush_requested
+                self._drain()
+                with self._flush_cond:
+                    self._flush_completed = requested
+                    self._flush_cond.notify_all()
+
+    def _to_dataframe(self, rows):
+        df = pd.DataFrame.from_records(rows, columns=self.columns)
+        for column, dtype in self.dtypes.items():
+            df[column] = df[column].astype(dtype)
+        return df
+
+    def _write(self, rows):
+        with self._write_lock:
+            try:
+                with get_pool(self.uri).session() as con:
+                    try:
+                        con.con.load_table(
+                            self.table.name, self._to_dataframe(rows), method="columnar"
+                        )
+                    except (TypeError, ValueError):
+                        # fall back to rows if the data does not convert to columns
+                        con.con.load_table(self.table.name, rows, method="rows")
+                self._count(written=len(rows), batches=1)
+            except Exception as e:
+                self._count(failed=len(rows))
+                _logger().warning(
+                    str(dict(cmd="log_sink", table=self.table.name, rows=len(rows), exception=e))
+                )
+
+    def flush(self, timeout=None):
+        """
+        Ask the background thread to write the rows queued so far, including the batch it is filling,
+        and wait up to timeout (by default flush_timeout_s) for it.
+        Returns True if the rows were written (or failed and were counted), False on timeout.
+        """
+        if not self._thread.is_alive():
+            self._drain()
+            return True
+        with self._flush_cond:
+            self._flush_requested += 1
+            request = self._flush_requested
+            self._flush_event.set()
+            done = self._flush_cond.wait_for(
+                lambda: self._flush_completed >= request,
+                timeout=self.flush_timeout_s if timeout is None else timeout,
+            )
+        if not done:
+            _logger().warning(str(dict(cmd="log_sink", table=self.table.name, flush="timeout", **self.stats())))
+        return done
+
+    def close(self):
+        self.flush()
+        self._stopped = True
+        # to end the batch being filled now
+        self._flush_event.set()
+        self._thread.join(self._poll_s * 4 + 1)
+        # rows queued after the flush
+        self._drain()
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def get_log_sink(uri, table, **kwargs):
+    """
+    Return the process-wide LogSink for `uri` and `table`, creating it on first use.
+    """
+    key = (uri, table.name)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None or sink._stopped:
+            sink = LogSink(uri, table, **kwargs)
+            _sinks[key] = sink
+        return sink
+
+
+def close_log_sinks():
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+        _sinks.clear()
+    for sink in sinks:
+        sink.close()
+
+
+# registered after the pool module's handler, so it runs first and can still use the pools
+atexit.register(close_log_sinks)
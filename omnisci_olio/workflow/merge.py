@@ -0,0 +1,196 @@
+"""
+Upsert rows into a table: stage them in a temporary table, delete the target rows with matching keys,
+and insert the staged rows.
+
+The target rows are deleted by `key IN (SELECT key FROM staging)`, the form of DELETE ... JOIN the server supports.
+A NULL key matches a NULL key, by a separate DELETE run only when staged keys are NULL.
+Composite keys are compared as one text of the key columns.
+
+The staged rows are merged in chunks of `chunk_rows` rows by `rowid` of the staging table,
+so that a very large input does not need one huge DELETE and INSERT.
+"""
+
+from time import time
+
+import pandas as pd
+
+from omnisci_olio.pymapd import trace
+
+
+def _key_expr(keys):
+    """
+    SQL of the key of a row, one column, or the columns concatenated as text,
+    where a NULL is N and a value is V and its text, so that a NULL key does not match an empty text key.
+    Text keys in a composite key must not contain '|'.
+    """
+    if len(keys) == 1:
+        return keys[0]
+    return " || '|' || ".join(f"CASE WHEN {k} IS NULL THEN 'N' ELSE 'V' || CAST({k} AS TEXT) END" for k in keys)
+
+
+def _any_null(keys):
+    return "(" + " OR ".join(f"{k} IS NULL" for k in keys) + ")"
+
+
+class MergeReport:
+    def __init__(self, target, keys):
+        self.target = target
+        self.keys = keys
+        self.staged = 0
+        self.updated = 0
+        self.inserted = 0
+        self.chunks = 0
+        self.phase_s = dict(stage=0.0, delete=0.0, insert=0.0, cleanup=0.0)
+
+    def to_dict(self):
+        return dict(
+            target=self.target,
+            keys=self.keys,
+            staged=self.staged,
+            updated=self.updated,
+            inserted=self.inserted,
+            chunks=self.chunks,
+            **{f"{k}_s": round(v, 3) for k, v in self.phase_s.items()},
+        )
+
+    def __str__(self):
+        return str(self.to_dict())
+
+
+class Merge:
+    """
+    client - an OmniSciDBClient
+    chunk_rows - staged rows merged per DELETE and INSERT, None for all at once
+    """
+
+    def __init__(self, client, chunk_rows=None):
+        self.client = client
+        self.chunk_rows = chunk_rows
+
+    def _count(self, table_name):
+        # not by client.table, which would record the staging table as a source of later operations
+        client = self.client
+        return client.con.execute(client.table_cache.table(client.con, table_name).count())
+
+    def _stage(self, staging, target, source, columns, sources):
+        client = self.client
+        if isinstance(source, pd.DataFrame):
+            cols = [c for c in source.columns if c in columns]
+            # same column types as the target
+            client.create_table_as(
+                staging, f"SELECT {', '.join(cols)} FROM {target} WHERE 1 = 0", sources=[target]
+            )
+            client.load_table(staging, source[cols], take_counts=False)
+        else:
+            client.create_table_as(staging, client.to_sql(source), sources=sources)
+        return [c for c in client.table_cache.schema(client.con, staging).names if c in columns]
+
+    def _chunk_ranges(self, staging):
+        if not self.chunk_rows:
+            return [None]
+        hi = self.client.con.con.execute(f"SELECT MAX(rowid) FROM {staging}").fetchone()[0]
+        if hi is None:
+            return []
+        return [(lo, lo + self.chunk_rows) for lo in range(0, hi + 1, self.chunk_rows)]
+
+    def _has_null_keys(self, staging, any_null, chunk):
+        sql = f"SELECT COUNT(*) FROM {staging} WHERE {any_null}{chunk}"
+        return self.client.con.con.execute(sql).fetchone()[0] > 0
+
+    def merge(self, target, source, keys, sources=None, update_key=None):
+        """
+        Returns a MergeReport, with the rows updated (deleted and inserted again) and inserted,
+        assuming the staged keys are unique.
+        """
+        client = self.client
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        target = client._name(target)
+        # a unique name, so that concurrent merges into the same target do not share the staging table
+        tmp = client.temp_tables(temporary=False)
+        staging = tmp.name("merge", target)
+        report = MergeReport(target, keys)
+        tstart = time()
+        first = before = None
+        columns = list(client.table_cache.schema(client.con, target).names)
+        missing = [k for k in keys if k not in columns]
+        if missing:
+            raise Exception(f"Merge keys {missing} are not columns of {target}")
+
+        try:
+            t = time()
+            with trace.span("merge.stage", target=target):
+                cols = self._stage(staging, target, source, columns, sources)
+                report.staged = self._count(staging)
+            report.phase_s["stage"] += time() - t
+            missing = [k for k in keys if k not in cols]
+            if missing:
+                raise Exception(f"Merge keys {missing} are not columns of the source")
+            col_list = ", ".join(cols)
+
+            before = first = self._count(target)
+            key = _key_expr(keys)
+            any_null = _any_null(keys)
+            for rows in self._chunk_ranges(staging):
+                rowids = None if rows is None else f"rowid >= {rows[0]} AND rowid < {rows[1]}"
+                where = "" if rowids is None else f" WHERE {rowids}"
+                chunk = "" if rowids is None else f" AND {rowids}"
+                t = time()
+                with trace.span("merge.delete", target=target):
+                    # an IN subquery is the form of DELETE ... JOIN the server supports,
+                    # and a NULL key is not equal to any key, so rows with NULL keys are deleted separately
+                    client.exec_update(
+                        target,
+                        f"DELETE FROM {target} WHERE {key} IN "
+                        f"(SELECT {key} FROM {staging} WHERE NOT {any_null}{chunk});",
+                        sources=[staging],
+                        cmd="MERGE DELETE",
+                        update_key=update_key,
+                        count_strategy="none",
+                    )
+                    if self._has_null_keys(staging, any_null, chunk):
+                        null_match = any_null
+                        if len(keys) > 1:
+                            null_match += f" AND {key} IN (SELECT {key} FROM {staging} WHERE {any_null}{chunk})"
+                        client.exec_update(
+                            target,
+                            f"DELETE FROM {target} WHERE {null_match};",
+                            sources=[staging],
+                            cmd="MERGE DELETE NULL KEYS",
+                            update_key=update_key,
+                            count_strategy="none",
+                        )
+                    deleted = before - self._count(target)
+                report.phase_s["delete"] += time() - t
+                t = time()
+                with trace.span("merge.insert", target=target):
+                    client.exec_update(
+                        target,
+                        f"INSERT INTO {target} ({col_list}) SELECT {col_list} FROM {staging}{where};",
+                        sources=[staging],
+                        cmd="MERGE INSERT",
+                        update_key=update_key,
+                        count_strategy="none",
+                    )
+                    after = self._count(target)
+                report.phase_s["insert"] += time() - t
+                report.updated += deleted
+                report.inserted += (after - before)
+                report.chunks += 1
+                before = after
+        finally:
+            t = time()
+            tmp.close()
+            report.phase_s["cleanup"] += time() - t
+
+        client.log(
+            "MERGE",
+            tstart,
+            target,
+            sources,
+            first,
+            before,
+            process_rows=report.staged,
+            update_key=update_key,
+            **{k: v for k, v in report.to_dict().items() if k not in ("target",)},
+        )
+        return report
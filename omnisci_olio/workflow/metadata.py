@@ -0,0 +1,141 @@
+"""
+Cache of table names and schemas, to avoid repeated `list_tables` and schema calls to the server.
+"""
+
+import os
+import re
+import threading
+from time import time
+
+from omnisci_olio.pymapd import trace
+
+
+# statements that may create, drop, rename or change the columns of a table
+_DDL_RE = re.compile(r"^\s*(CREATE|DROP|ALTER|RENAME|COPY)\b", re.IGNORECASE)
+
+
+def is_ddl(sql):
+    return sql is not None and _DDL_RE.match(sql) is not None
+
+
+def _table_expr(con, name, schema):
+    """
+    Build an Ibis table expression from a known schema, without fetching the schema from the server.
+    """
+    try:
+        node = con.table_class(name, schema, con)
+        return con.table_expr_class(node)
+    except (AttributeError, TypeError):
+        # older ibis_omniscidb without table_class
+        return con.table(name)
+
+
+class TableCache:
+    """
+    Table names and schemas of one database.
+
+    Entries expire after ttl_s seconds, for changes made by other clients.
+    The client invalidates entries itself when it runs DDL.
+    """
+
+    def __init__(self, ttl_s=None):
+        if ttl_s is None:
+            ttl_s = float(os.environ.get("OMNISCI_DB_METADATA_TTL_S", 60))
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self._names = None
+        self._names_time = 0
+        self._views = None
+        self._views_time = 0
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, t):
+        return time() - t < self.ttl_s
+
+    def table_names(self, con):
+        with self._lock:
+            if self._names is not None and self._fresh(self._names_time):
+                self.hits += 1
+                return self._names
+        with trace.span("list_tables"):
+            names = set(con.list_tables())
+        with self._lock:
+            self.misses += 1
+            self._names = names
+            self._names_time = time()
+        return names
+
+    def view_names(self, con):
+        """
+        Names of the views, which are also in `table_names`.
+        """
+        with self._lock:
+            if self._views is not None and self._fresh(self._views_time):
+                self.hits += 1
+                return self._views
+        with trace.span("get_views"):
+            views = set(con.con._client.get_views(con.con._session))
+        with self._lock:
+            self.misses += 1
+            self._views = views
+            self._views_time = time()
+        return views
+
+    def exists(self, con, name):
+        return name in self.table_names(con)
+
+    def schema(self, con, name):
+        with self._lock:
+            entry = self._schemas.get(name)
+            if entry is not None and self._fresh(entry[0]):
+                self.hits += 1
+                return entry[1]
+        with trace.span("get_schema", table=name):
+            try:
+                schema = con.get_schema(name)
+            except AttributeError:
+                schema = con.table(name).schema()
+        with self._lock:
+            self.misses += 1
+            self._schemas[name] = (time(), schema)
+        return schema
+
+    def table(self, con, name):
+        """
+        Return an Ibis table expression for `name` bound to `con`, using the cached schema.
+        """
+        return _table_expr(con, name, self.schema(con, name))
+
+    def invalidate(self, names=None):
+        """
+        Forget the table list and the schemas of `names`, or of all tables if names is None.
+        """
+        with self._lock:
+            self._names = None
+            self._views = None
+            if names is None:
+                self._schemas.clear()
+            else:
+                for name in names:
+                    self._schemas.pop(name, None)
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, schemas=len(self._schemas))
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def get_table_cache(uri, ttl_s=None):
+    """
+    Return the process-wide TableCache shared by clients connected to `uri`.
+    """
+    with _shared_lock:
+        cache = _shared.get(uri)
+        if cache is None:
+            cache = TableCache(ttl_s=ttl_s)
+            _shared[uri] = cache
+        return cache
@@ -0,0 +1,212 @@
+"""
+Store the result of a query by INSERT ... SELECT of key ranges, run concurrently on separate sessions.
+
+The ranges of the key column are found on the server, either equal ranges between MIN and MAX ("minmax"),
+or ranges of about the same number of rows between APPROX_QUANTILE values ("quantile").
+The first range also holds NULL keys, and the first and last ranges are open, so every row is in one range.
+
+Each partition is logged in `omnisci_db_update_log`, with the same `process_run`.
+"""
+
+import uuid
+import decimal
+import datetime
+from time import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .compilecache import sql_literal
+
+
+PARTITION_MINMAX = "minmax"
+PARTITION_QUANTILE = "quantile"
+
+
+def _interpolate(lo, hi, fraction):
+    if isinstance(lo, (pd.Timestamp, np.datetime64)) or hasattr(lo, "isoformat"):
+        lo = pd.Timestamp(lo)
+        return lo + (pd.Timestamp(hi) - lo) * fraction
+    elif isinstance(lo, (int, np.integer)) and isinstance(hi, (int, np.integer)):
+        return int(lo + (hi - lo) * fraction)
+    elif isinstance(lo, decimal.Decimal):
+        return lo + (hi - lo) * decimal.Decimal(str(fraction))
+    else:
+        return lo + (hi - lo) * fraction
+
+
+def _is_range_key(value):
+    if isinstance(value, (bool, np.bool_)):
+        return False
+    return isinstance(value, (int, float, decimal.Decimal, np.number, datetime.date, np.datetime64))
+
+
+def partition_bounds(client, sql, key, partitions, method=PARTITION_MINMAX):
+    """
+    Return the sorted distinct bounds between partitions, at most partitions - 1 values.
+    With method "minmax", the key must be a number, timestamp or date.
+    """
+    if partitions < 2:
+        return []
+    if method == PARTITION_QUANTILE:
+        fractions = [i / partitions for i in range(1, partitions)]
+        cols = ", ".join(f"APPROX_QUANTILE({key}, {f})" for f in fractions)
+        bounds = list(client.con.con.execute(f"SELECT {cols} FROM ({sql}) AS src").fetchone())
+    elif method == PARTITION_MINMAX:
+        lo, hi = client.con.con.execute(f"SELECT MIN({key}), MAX({key}) FROM ({sql}) AS src").fetchone()
+        if lo is None or hi is None:
+            return []
+        if not (_is_range_key(lo) and _is_range_key(hi)):
+            raise Exception(
+                f"Partition key {key} must be a number, timestamp or date to split its range, not {type(lo).__name__}"
+            )
+        bounds = [_interpolate(lo, hi, i / partitions) for i in range(1, partitions)]
+    else:
+        raise Exception(f"Unknown partition method {method}, must be one of {(PARTITION_MINMAX, PARTITION_QUANTILE)}")
+    return sorted({b for b in bounds if b is not None})
+
+
+def partition_conditions(key, bounds):
+    """
+    WHERE conditions of the ranges between bounds, covering all rows including NULL keys.
+    """
+    if not bounds:
+        return ["TRUE"]
+    literals = [sql_literal(b) for b in bounds]
+    conditions = [f"({key} < {literals[0]} OR {key} IS NULL)"]
+    for lo, hi in zip(literals, literals[1:]):
+        conditions.append(f"{key} >= {lo} AND {key} < {hi}")
+    conditions.append(f"{key} >= {literals[-1]}")
+    return conditions
+
+
+class PartitionedStore:
+    """
+    client - an OmniSciDBClient connected by URL, each partition runs on a session_clone of it
+    retries - times a failed partition is run again, on its own, after deleting its key range,
+        only if the range of the table was empty before the first attempt, to not load its rows twice
+    """
+
+    def __init__(self, client, max_workers=None, retries=2):
+        self.client = client
+        self.max_workers = max_workers
+        self.retries = retries
+
+    def _run_partition(self, table_name, sql, condition, index, count, sources, update_key, created, process_run):
+        insert = f'INSERT INTO "{table_name}" SELECT * FROM ({sql}) AS src WHERE {condition};'
+        cmd = f"INSERT PARTITION {index + 1}/{count}"
+        # a table created by this run has no rows before the first attempt
+        range_empty = True if created else None
+        inserted = False
+        error = None
+        for attempt in range(self.retries + 1):
+            try:
+                with self.client.session_clone(process_run=process_run) as con:
+                    if range_empty is None:
+                        range_empty = (
+                            con.con.con.execute(f'SELECT COUNT(*) FROM "{table_name}" WHERE {condition}').fetchone()[0] == 0
+                        )
+                    if inserted:
+                        # the failed INSERT may have committed, so the range holds only its rows, if any
+                        con.delete_where(table_name, condition)
+                    inserted = True
+                    con.exec_update(table_name, insert, sources=sources, cmd=cmd, update_key=update_key)
+                return attempt
+            except Exception as e:
+                error = e
+                self.client.default_logger(cmd=cmd, target=table_name, attempt=attempt, exception=e)
+                if inserted and not range_empty:
+                    # the range had rows before, so the rows of a committed INSERT can not be told apart
+                    break
+        raise error
+
+    def store(
+        self,
+        expr,
+        table_name,
+        key,
+        partitions=4,
+        method=PARTITION_MINMAX,
+        sources=None,
+        update_key=None,
+        drop=False,
+        ddl=None,
+        fragment_size=None,
+    ):
+        """
+        expr - Ibis expression or SQL text of the rows to store
+        key - column of expr to partition by, a number, timestamp or date
+        partitions - number of key ranges
+        ddl, fragment_size - to create the table if it does not exist, by default with the columns of expr
+        Returns table_name, or raises an Exception naming the partitions that failed after retries.
+        """
+        client = self.client
+        tstart = time()
+        sql = client.to_sql(expr).strip().rstrip(";")
+        # before the table is dropped or created, in case the key can not be partitioned
+        bounds = partition_bounds(client, sql, key, partitions, method)
+        conditions = partition_conditions(key, bounds)
+        if drop:
+            client.drop_table(table_name)
+        created = False
+        if not client.exists_table(table_name):
+            if ddl:
+                client.create_table(table_name, ddl)
+            else:
+                client.create_table_as(
+                    table_name, f"SELECT * FROM ({sql}) AS src WHERE 1 = 0", sources=sources, fragment_size=fragment_size
+                )
+            created = True
+
+        # the partitions are logged with the process_run of the client, or a new one,
+        # set on their session clones, not on the client, which other threads may be using
+        process_run = client.process_run or uuid.uuid4().hex
+        before = client._count_rows(table_name)
+        max_workers = self.max_workers or len(conditions)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="omnisci_olio_partition") as executor:
+            futures = [
+                executor.submit(
+                    self._run_partition,
+                    table_name,
+                    sql,
+                    cond,
+                    i,
+                    len(conditions),
+                    sources,
+                    update_key,
+                    created,
+                    process_run,
+                )
+                for i, cond in enumerate(conditions)
+            ]
+        failed = {}
+        retried = 0
+        for cond, future in zip(conditions, futures):
+            if future.exception() is not None:
+                failed[cond] = future.exception()
+            else:
+                retried += future.result()
+        after = client._count_rows(table_name)
+        client.log(
+            "INSERT PARTITIONED",
+            tstart,
+            table_name,
+            sources,
+            before,
+            after,
+            process_rows=None if before is None or after is None else after - before,
+            error_count=len(failed),
+            update_key=update_key,
+            process_run=process_run,
+            partitions=len(conditions),
+            retries=retried,
+            key=key,
+            method=method,
+        )
+        if failed:
+            raise Exception(
+                f"{len(failed)} of {len(conditions)} partitions failed storing {table_name}: "
+                + str({cond: str(e) for cond, e in failed.items()})
+            )
+        return table_name
@@ -0,0 +1,236 @@
+"""
+Run a set of store operations concurrently, in the order of their table dependencies.
+
+For example:
+
+    with connect(url) as con:
+        p = Pipeline(con, max_workers=4)
+        p.add("daily", daily_expr, target="sales_daily")
+        p.add("monthly", "SELECT ... FROM sales_daily ...", target="sales_monthly")
+        p.add("regions", regions_expr, target="sales_regions")
+        report = p.run()
+        print(report)
+
+"monthly" reads "sales_daily", so it runs after "daily", and "regions" runs concurrently with both.
+"""
+
+from time import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
+
+import ibis
+import omnisci_olio.schema as sc
+from .resultcache import sql_tables
+
+
+class PipelineNode:
+    def __init__(self, name, op, target, sources, kwargs):
+        self.name = name
+        self.op = op
+        self.target = target
+        self.sources = sources
+        self.kwargs = kwargs
+        self.deps = set()
+        self.reads = set()
+        self.ready = None
+        self.start = None
+        self.end = None
+        self.error = None
+        self.skipped = False
+
+    @property
+    def wall_s(self):
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+
+def _expr_tables(expr):
+    """
+    Names of the DB tables an Ibis expression reads, or None if they can not be found.
+    """
+    try:
+        return [t.name for t in expr.op().root_tables()]
+    except Exception:
+        return None
+
+
+class PipelineReport:
+    def __init__(self, nodes, total_s, max_workers):
+        self.nodes = nodes
+        self.total_s = total_s
+        self.max_workers = max_workers
+        self.critical_path, self.critical_path_s = self._critical_path()
+        busy_s = sum(n.wall_s for n in nodes.values())
+        self.idle_s = max(min(max_workers, len(nodes)) * total_s - busy_s, 0.0)
+
+    def _critical_path(self):
+        # longest path by wall time, nodes are in insertion order which is a topological order
+        best = {}
+        for name, node in self.nodes.items():
+            prev = max(node.deps, key=lambda d: best[d][0], default=None)
+            prev_s, prev_path = best[prev] if prev is not None else (0.0, [])
+            best[name] = (prev_s + node.wall_s, prev_path + [name])
+        if not best:
+            return [], 0.0
+        total, path = max(best.values(), key=lambda x: x[0])
+        return path, total
+
+    @property
+    def errors(self):
+        return {n.name: n.error for n in self.nodes.values() if n.error is not None}
+
+    def to_dataframe(self):
+        t0 = min((n.ready for n in self.nodes.values() if n.ready is not None), default=0)
+        return pd.DataFrame(
+            [
+                dict(
+                    name=n.name,
+                    target=n.target,
+                    deps=sorted(n.deps),
+                    start_s=None if n.start is None else round(n.start - t0, 3),
+                    wait_s=None if n.start is None else round(n.start - n.ready, 3),
+                    wall_s=round(n.wall_s, 3),
+                    critical=n.name in self.critical_path,
+                    skipped=n.skipped,
+                    error=None if n.error is None else str(n.error),
+                )
+                for n in self.nodes.values()
+            ]
+        )
+
+    def __str__(self):
+        return str(
+            dict(
+                total_s=round(self.total_s, 2),
+                critical_path=self.critical_path,
+                critical_path_s=round(self.critical_path_s, 2),
+                idle_s=round(self.idle_s, 2),
+                errors=self.errors,
+            )
+        )
+
+
+class Pipeline:
+    """
+    client - an OmniSciDBClient connected by URL, each operation runs on a session_clone of it
+    max_workers - maximum operations running at the same time
+    """
+
+    def __init__(self, client, max_workers=4):
+        self.client = client
+        self.max_workers = max_workers
+        self.nodes = {}
+
+    def add(self, name, op, target=None, sources=None, **store_kwargs):
+        """
+        op - Ibis expression, SQL text or sc.ModelOperation
+        target - table stored by `client.store(op, target)`, not needed for a ModelOperation
+        sources - tables read by op, by default found from the expression or SQL
+        store_kwargs - passed to `store`, e.g. drop=True
+        """
+        if name in self.nodes:
+            raise Exception(f"Duplicate pipeline operation name: {name}")
+        if isinstance(op, sc.ModelOperation):
+            target = target or op.model_table().name
+        if target is None:
+            raise Exception(f"Pipeline operation {name} must have a target table")
+        self.nodes[name] = PipelineNode(name, op, target, sources, store_kwargs)
+        return self
+
+    def _reads(self, node, known_tables):
+        if node.sources is not None:
+            return set(node.sources)
+        if isinstance(node.op, ibis.expr.types.Expr):
+            tables = _expr_tables(node.op)
+            if tables is not None:
+                return set(tables)
+        return set(sql_tables(self.client.to_sql(node.op), known_tables))
+
+    def dependencies(self):
+        """
+        Return a dict of operation name to the names of the operations it depends on:
+        those that store a table it reads, and earlier operations storing the same table.
+        """
+        targets = {n.target for n in self.nodes.values()}
+        known_tables = targets | self.client.table_cache.table_names(self.client.con)
+        names = list(self.nodes)
+        for i, name in enumerate(names):
+            node = self.nodes[name]
+            node.reads = self._reads(node, known_tables) - {node.target}
+            reads = node.reads
+            node.deps = {
+                other
+                for other in names[:i]
+                if self.nodes[other].target in reads or self.nodes[other].target == node.target
+            }
+            # a later operation can not be a dependency, it would be a cycle
+            later = {other for other in names[i + 1 :] if self.nodes[other].target in reads}
+            if later:
+                raise Exception(
+                    f"Pipeline operation {name} reads the target of later operations {sorted(later)}, add them first"
+                )
+        return {name: set(node.deps) for name, node in self.nodes.items()}
+
+    def _run_node(self, node):
+        node.start = time()
+        try:
+            with self.client.session_clone() as con:
+                if isinstance(node.op, sc.ModelOperation):
+                    con.execute(node.op, sources=sorted(node.reads))
+                else:
+                    con.store(node.op, node.target, sources=sorted(node.reads), **node.kwargs)
+        finally:
+            node.end = time()
+
+    def run(self):
+        """
+        Run all operations, independent operations concurrently.
+        Operations depending on a failed operation are skipped.
+        Returns a PipelineReport, or raises an Exception with the report if any operation failed.
+        """
+        self.dependencies()
+        tstart = time()
+        pending = dict(self.nodes)
+        done = set()
+        failed = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, node in list(pending.items()):
+                    if node.deps & failed:
+                        node.skipped = True
+                        failed.add(name)
+                        del pending[name]
+                    elif node.deps <= done:
+                        node.ready = node.ready or time()
+                        running[executor.submit(self._run_node, node)] = name
+                        del pending[name]
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        done.add(name)
+                    else:
+                        self.nodes[name].error = error
+                        failed.add(name)
+
+        report = PipelineReport(self.nodes, time() - tstart, self.max_workers)
+        self.client.log(
+            "pipeline",
+            tstart,
+            process_rows=len(done),
+            error_count=len(failed),
+            critical_path=report.critical_path,
+            critical_path_s=round(report.critical_path_s, 2),
+            idle_s=round(report.idle_s, 2),
+            nodes={n.name: round(n.wall_s, 2) for n in self.nodes.values()},
+        )
+        if failed:
+            raise Exception("Pipeline failed. " + str(report))
+        return report
@@ -0,0 +1,282 @@
+"""
+Process-wide pool of OmniSciDB sessions, keyed by connection URI.
+
+Logging in to OmniSciDB is a full Thrift round trip, so workflows with many small tasks
+reuse logged-in Ibis connections instead of connecting for every task.
+"""
+
+import os
+import atexit
+import threading
+from time import time
+from contextlib import contextmanager
+
+from omnisci_olio.ibis import connect as ibis_connect
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_float(name, default):
+    value = os.environ.get(name)
+    return float(value) if value else default
+
+
+class _PooledSession:
+    def __init__(self, con):
+        self.con = con
+        self.created = time()
+        self.last_used = self.created
+
+
+class SessionPool:
+    """
+    Pool of Ibis OmniSciDB connections (each a logged-in session) for one URI.
+
+    min_sessions - sessions kept open even when idle
+    max_sessions - maximum sessions open at the same time (checked out or idle)
+    max_idle_s - idle sessions above min_sessions are closed after this many seconds,
+        at the next checkout (there is no background thread closing them)
+    check_after_s - an idle session is checked with a server call before reuse
+        if it has not been used for this many seconds
+    timeout - seconds to wait for a session when max_sessions are checked out,
+        by default env var OMNISCI_DB_POOL_TIMEOUT_S or 30, 0 waits forever
+    """
+
+    def __init__(
+        self,
+        uri,
+        min_sessions=None,
+        max_sessions=None,
+        max_idle_s=None,
+        check_after_s=None,
+        timeout=None,
+        connect=ibis_connect,
+    ):
+        self.uri = uri
+        self.min_sessions = (
+            min_sessions if min_sessions is not None else _env_int("OMNISCI_DB_POOL_MIN", 0)
+        )
+        self.max_sessions = (
+            max_sessions if max_sessions is not None else _env_int("OMNISCI_DB_POOL_MAX", 8)
+        )
+        self.max_idle_s = (
+            max_idle_s if max_idle_s is not None else _env_int("OMNISCI_DB_POOL_IDLE_S", 300)
+        )
+        self.check_after_s = check_after_s if check_after_s is not None else 30
+        self.timeout = timeout if timeout is not None else _env_float("OMNISCI_DB_POOL_TIMEOUT_S", 30)
+        self._connect = connect
+        self._idle = []
+        self._in_use = {}
+        self._cond = threading.Condition()
+        self._closed = False
+
+        for _ in range(self.min_sessions):
+            self._idle.append(_PooledSession(self._connect(self.uri)))
+
+    def size(self):
+        with self._cond:
+            return len(self._idle) + len(self._in_use)
+
+    def stats(self):
+        with self._cond:
+            return dict(uri_host=self._host(), idle=len(self._idle), in_use=len(self._in_use))
+
+    def _host(self):
+        # do not expose the password from the uri
+        return self.uri.split("@")[-1] if self.uri else None
+
+    def _alive(self, con):
+        try:
+            con.con._client.get_server_status(con.con._session)
+            return True
+        except Exception:
+            return False
+
+    def _close_session(self, session):
+        try:
+            session.con.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, now):
+        """
+        Close sessions idle for longer than max_idle_s, keeping at least min_sessions open.
+        Must be called holding the lock. Returns the sessions to close.
+        """
+        evict = []
+        keep = []
+        # idle list is ordered by last use, oldest first
+        for session in self._idle:
+            if (
+                now - session.last_used > self.max_idle_s
+                and len(self._idle) - len(evict) + len(self._in_use) > self.min_sessions
+            ):
+                evict.append(session)
+            else:
+                keep.append(session)
+        self._idle = keep
+        return evict
+
+    def checkout(self):
+        """
+        Return an Ibis connection for exclusive use by the caller until `checkin`.
+        """
+        deadline = None if not self.timeout else time() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise Exception("SessionPool is closed")
+                evict = self._evict_idle(time())
+                session = None
+                if self._idle:
+                    # most recently used first, it is the most likely to still be alive
+                    session = self._idle.pop()
+                elif len(self._in_use) < self.max_sessions:
+                    # reserve the slot, connect outside the lock
+                    session = _PooledSession(None)
+                    self._in_use[id(session)] = session
+                else:
+                    remaining = None if deadline is None else deadline - time()
+                    if remaining is not None and remaining <= 0:
+                        raise Exception(
+                            f"Timeout after {self.timeout}s waiting for an OmniSciDB session of {self._host()}, "
+                            f"all max_sessions={self.max_sessions} are checked out. "
+                            "Clients made by `connect()` return their session at the end of a `with` block: "
+                            "use `with connect() as con:`, or connect without pooled=True, "
+                            "or raise env var OMNISCI_DB_POOL_MAX or OMNISCI_DB_POOL_TIMEOUT_S"
+                        )
+                    self._cond.wait(remaining)
+                if session is not None and session.con is not None:
+                    self._in_use[id(session.con)] = session
+
+            for s in evict:
+                self._close_session(s)
+
+            if session is None:
+                continue
+
+            if session.con is None:
+                try:
+                    session.con = self._connect(self.uri)
+                except Exception:
+                    with self._cond:
+                        del self._in_use[id(session)]
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    del self._in_use[id(session)]
+                    self._in_use[id(session.con)] = session
+                return session.con
+
+            if time() - session.last_used > self.check_after_s and not self._alive(session.con):
+                self._discard(session)
+                continue
+
+            return session.con
+
+    def checkin(self, con, discard=False):
+        """
+        Return a connection from `checkout` to the pool.
+        discard - close the session rather than reuse it, for example after a connection error
+        """
+        with self._cond:
+            session = self._in_use.pop(id(con), None)
+            if session is None:
+                return
+            if discard or self._closed:
+                self._cond.notify()
+            else:
+                session.last_used = time()
+                self._idle.append(session)
+                self._cond.notify()
+                return
+        self._close_session(session)
+
+    def replace(self, con):
+        """
+        Close a checked out connection that is broken, and return a new one checked out in its place.
+        """
+        with self._cond:
+            session = self._in_use.pop(id(con), None)
+            if session is not None:
+                # keep the slot of the broken session reserved while connecting
+                reserved = _PooledSession(None)
+                self._in_use[id(reserved)] = reserved
+        if session is None:
+            # not checked out of this pool, so there is no slot to reuse, and it is closed by its owner
+            return self.checkout()
+        self._close_session(session)
+        try:
+            new_con = self._connect(self.uri)
+        finally:
+            with self._cond:
+                del self._in_use[id(reserved)]
+                self._cond.notify()
+        with self._cond:
+            self._in_use[id(new_con)] = _PooledSession(new_con)
+        return new_con
+
+    def _discard(self, session):
+        with self._cond:
+            self._in_use.pop(id(session.con), None)
+            self._cond.notify()
+        self._close_session(session)
+
+    @contextmanager
+    def session(self):
+        """
+        with pool.session() as con:
+            con.list_tables()
+        """
+        con = self.checkout()
+        try:
+            yield con
+        except Exception:
+            self.checkin(con, discard=not self._alive(con))
+            raise
+        else:
+            self.checkin(con)
+
+    def close(self):
+        """
+        Close idle sessions and stop handing out sessions.
+        Sessions still checked out are closed when they are returned.
+        """
+        with self._cond:
+            self._closed = True
+            idle = self._idle
+            self._idle = []
+            self._cond.notify_all()
+        for session in idle:
+            self._close_session(session)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(uri, **kwargs):
+    """
+    Return the process-wide SessionPool for `uri`, creating it on first use.
+    kwargs are passed to SessionPool when it is created, and ignored afterwards.
+    """
+    with _pools_lock:
+        pool = _pools.get(uri)
+        if pool is None or pool._closed:
+            pool = SessionPool(uri, **kwargs)
+            _pools[uri] = pool
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
@@ -1,3 +1,4 @@
+import os
 import prefect
 from prefect import task, Task, Flow, Parameter, unmapped, apply_map
 from prefect.core.task import Task
@@ -5,6 +6,7 @@ from prefect.tasks.secrets import EnvVarSecret
 from prefect.engine.signals import LOOP
 
 from omnisci_olio.workflow import connect
+from omnisci_olio.workflow.logmaint import maintain_update_log, ROLLUP_PERIODS
 
 
 def _fullclassname(obj):
@@ -20,12 +22,18 @@ class OmnisciStorageTask(Task):
     def __init__(
         self,
         drop_target=False,
+        pooled=True,
     ):
+        """
+        drop_target - drop the target table before storing
+        pooled - reuse logged-in DB sessions across task runs in the same process
+        """
         super().__init__(
             name=_fullclassname(self),
             # slug=_fullclassname(self),
         )
         self.drop_target = drop_target
+        self.pooled = pooled
 
     def gen_sql(self, con, **kwargs):
         """
@@ -44,7 +52,7 @@ class OmnisciStorageTask(Task):
         return con.store(query, load_table=target, sources=sources, drop=drop)
 
     def run(self, con_url, sources, target, **kwargs):
-        with connect(con_url) as con:
+        with connect(con_url, pooled=self.pooled) as con:
             return self.store(
                 con, sources=sources, target=target, drop=self.drop_target, **kwargs
             )
@@ -101,7 +109,7 @@ class OmnisciStorageLoopTask(OmnisciStorageTask):
         loop_keys_processed = loop_payload.get("loop_keys_processed", [])
         loop_keys = loop_payload.get("loop_keys", None)
 
-        with connect(con_url) as con:
+        with connect(con_url, pooled=self.pooled) as con:
 
             # only on the first iteration of the loop
             if len(loop_payload) == 0:
@@ -132,3 +140,13 @@ class OmnisciStorageLoopTask(OmnisciStorageTask):
         raise LOOP(
             message=str(dict(task=_fullclassname(self), result=result)), result=result
         )
+
+
+@task
+def update_log_maintenance(con_url=None, retention_days=None, periods=ROLLUP_PERIODS, rewrite=True):
+    """
+    Roll up, expire and rewrite sorted the omnisci_db_update_log table, see `omnisci_olio.workflow.logmaint`.
+    con_url - URL of the log DB, by default env var OMNISCI_DB_LOG_URL or OMNISCI_DB_URL
+    """
+    with connect(con_url or os.environ.get("OMNISCI_DB_LOG_URL")) as con:
+        return maintain_update_log(con, retention_days=retention_days, periods=periods, rewrite=rewrite)
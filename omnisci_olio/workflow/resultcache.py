@@ -0,0 +1,210 @@
+"""
+Cache of query results, keyed by the normalized SQL and the epochs of the tables it reads.
+
+Results are kept in memory up to a size in bytes, least recently used first out,
+and optionally written as Parquet files to a directory, also bounded in bytes.
+
+Only results of tables are cached, not of views, whose epoch does not change when the tables they read do.
+"""
+
+import os
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+_from_re = re.compile(r'\b(?:FROM|JOIN)\s+"?([A-Za-z_][A-Za-z0-9_]*)"?', re.IGNORECASE)
+_cte_re = re.compile(r'(?:\bWITH|,)\s*"?([A-Za-z_][A-Za-z0-9_]*)"?\s+AS\s*\(', re.IGNORECASE)
+
+
+def normalize_sql(sql):
+    return " ".join(sql.split()).rstrip(";").strip()
+
+
+def sql_names(sql):
+    """
+    Names after FROM and JOIN in sql, other than the names of its WITH queries.
+    """
+    return set(_from_re.findall(sql)) - set(_cte_re.findall(sql))
+
+
+def sql_tables(sql, known_tables):
+    """
+    Names of the tables in known_tables that are read by sql.
+    """
+    return sorted(sql_names(sql) & set(known_tables))
+
+
+def result_key(sql, versions):
+    """
+    versions - dict of table name to epoch (or row count) of each table read by sql
+    """
+    text = normalize_sql(sql) + "\n" + repr(sorted(versions.items()))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    max_bytes - memory for cached DataFrames, by default env var OMNISCI_DB_RESULT_CACHE_MB or 256 MB
+    disk_dir - if set, results are also written to Parquet files in this directory,
+        and read from there when evicted from memory
+    disk_max_bytes - size of the files in disk_dir, least recently used first out,
+        by default env var OMNISCI_DB_RESULT_CACHE_DISK_MB or 1024 MB
+    """
+
+    def __init__(self, max_bytes=None, disk_dir=None, disk_max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("OMNISCI_DB_RESULT_CACHE_MB", 256)) * 1024 ** 2)
+        if disk_max_bytes is None:
+            disk_max_bytes = int(float(os.environ.get("OMNISCI_DB_RESULT_CACHE_DISK_MB", 1024)) * 1024 ** 2)
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self.disk_bytes = 0
+        # key -> (df, nbytes, tables)
+        self._entries = OrderedDict()
+        # key -> (tables, nbytes), of the files in disk_dir, least recently used first
+        self._disk_entries = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _scan_disk(self):
+        # files of earlier processes, the tables they read are not known, but their keys have the table epochs
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".parquet"):
+                st = os.stat(os.path.join(self.disk_dir, name))
+                files.append((st.st_mtime, name[: -len(".parquet")], st.st_size))
+        for _, key, nbytes in sorted(files):
+            self._disk_entries[key] = ((), nbytes)
+            self.disk_bytes += nbytes
+        self._remove_files(self._evict_disk())
+
+    def _evict_disk(self):
+        """
+        Must be called holding the lock, or before the cache is shared. Returns the keys of the files to remove.
+        """
+        evict = []
+        while self.disk_bytes > self.disk_max_bytes and self._disk_entries:
+            key, (_, nbytes) = self._disk_entries.popitem(last=False)
+            self.disk_bytes -= nbytes
+            evict.append(key)
+        return evict
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.parquet")
+
+    def get(self, key):
+        """
+        Return a copy of the cached DataFrame, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy()
+        if self.disk_dir:
+            with self._lock:
+                entry = self._disk_entries.get(key)
+                if entry is not None:
+                    self._disk_entries.move_to_end(key)
+            df = None
+            if entry is not None:
+                try:
+                    df = pd.read_parquet(self._disk_path(key))
+                except Exception:
+                    pass
+            if df is not None:
+                with self._lock:
+                    self.hits += 1
+                self._put_memory(key, df, entry[0])
+                return df.copy()
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _put_memory(self, key, df, tables):
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (df, nbytes, tuple(tables))
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self.bytes -= evicted_bytes
+
+    def put(self, key, df, tables):
+        """
+        tables - names of the tables read, to invalidate the entry when one of them is updated
+        """
+        df = df.copy()
+        self._put_memory(key, df, tables)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                df.to_parquet(path, index=False)
+                nbytes = os.path.getsize(path)
+            except Exception:
+                # not all DataFrames can be written as Parquet, e.g. geo columns, keep it in memory only
+                return
+            with self._lock:
+                old = self._disk_entries.pop(key, None)
+                if old is not None:
+                    self.disk_bytes -= old[1]
+                self._disk_entries[key] = (tuple(tables), nbytes)
+                self.disk_bytes += nbytes
+                evict = self._evict_disk()
+            self._remove_files(evict)
+
+    def invalidate_tables(self, table_names):
+        """
+        Remove cached results that read any of table_names.
+        """
+        names = set(table_names)
+        with self._lock:
+            keys = [k for k, (_, _, tables) in self._entries.items() if names.intersection(tables)]
+            for key in keys:
+                self.bytes -= self._entries.pop(key)[1]
+            disk_keys = [k for k, (tables, _) in self._disk_entries.items() if names.intersection(tables)]
+            for key in disk_keys:
+                self.disk_bytes -= self._disk_entries.pop(key)[1]
+        self._remove_files(disk_keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            disk_keys = list(self._disk_entries)
+            self._disk_entries.clear()
+            self.disk_bytes = 0
+        self._remove_files(disk_keys)
+
+    def stats(self):
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            entries=len(self._entries),
+            bytes=self.bytes,
+            disk_entries=len(self._disk_entries),
+            disk_bytes=self.disk_bytes,
+        )
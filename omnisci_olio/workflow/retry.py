@@ -0,0 +1,126 @@
+"""
+Retry of statements that failed by a transient error, such as a dropped connection or an expired session.
+
+Only statements that are safe to run again are retried automatically:
+
+- idempotent: SELECT, SHOW, DROP ... IF EXISTS, CREATE ... IF NOT EXISTS, DELETE, TRUNCATE
+- not idempotent: INSERT, UPDATE, COPY, ALTER, RENAME, CREATE without IF NOT EXISTS,
+    unless the caller knows better, e.g. CREATE TABLE AS after dropping the table
+"""
+
+import os
+import re
+import errno
+import random
+import socket
+from time import sleep
+
+
+_IDEMPOTENT_RE = re.compile(
+    r"^\s*(SELECT|WITH|SHOW|EXPLAIN|DELETE|TRUNCATE|"
+    r"DROP\s+(TABLE|VIEW)\s+IF\s+EXISTS|CREATE\s+(TEMPORARY\s+)?(TABLE|VIEW)\s+IF\s+NOT\s+EXISTS)\b",
+    re.IGNORECASE,
+)
+
+# errors of the Thrift transport, or of the server when the session is gone
+_RETRYABLE_CLASSES = {"TTransportException", "EOFError", "ConnectionError", "TimeoutError"}
+_RETRYABLE_RE = re.compile(
+    "|".join(
+        [
+            "Session not valid",
+            "Session .* not found",
+            "Connection reset",
+            "Connection refused",
+            "Broken pipe",
+            "timed out",
+            "Could not connect",
+            "TSocket read 0 bytes",
+            "unexpected EOF",
+        ]
+    ),
+    re.IGNORECASE,
+)
+_RETRYABLE_ERRNOS = {errno.ECONNRESET, errno.ECONNREFUSED, errno.ECONNABORTED, errno.EPIPE, errno.ETIMEDOUT}
+
+
+def is_idempotent(sql):
+    return sql is not None and _IDEMPOTENT_RE.match(sql) is not None
+
+
+def _chain(exc):
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def is_retryable(exc):
+    """
+    True if exc, or an exception it was raised from, is a transient network or session error.
+    """
+    for e in _chain(exc):
+        if any(c.__name__ in _RETRYABLE_CLASSES for c in type(e).__mro__):
+            return True
+        if isinstance(e, (socket.timeout, ConnectionError)):
+            return True
+        if isinstance(e, OSError) and e.errno in _RETRYABLE_ERRNOS:
+            return True
+        # server errors carry the message in `error_msg`
+        msg = getattr(e, "error_msg", None) or getattr(e, "message", None)
+        if _RETRYABLE_RE.search(str(msg) if msg else str(e)):
+            return True
+    return False
+
+
+class RetryPolicy:
+    """
+    max_attempts - attempts of a statement in total, by default env var OMNISCI_DB_RETRY_ATTEMPTS or 3
+    base_s - backoff before the first retry, doubled for each retry up to max_s,
+        by default env var OMNISCI_DB_RETRY_BASE_S or 1
+    jitter - random fraction added to the backoff, so that concurrent tasks do not retry together
+    """
+
+    def __init__(self, max_attempts=None, base_s=None, max_s=60.0, jitter=0.2):
+        self.max_attempts = max_attempts or int(os.environ.get("OMNISCI_DB_RETRY_ATTEMPTS", 3))
+        self.base_s = base_s if base_s is not None else float(os.environ.get("OMNISCI_DB_RETRY_BASE_S", 1.0))
+        self.max_s = max_s
+        self.jitter = jitter
+
+    def backoff_s(self, retry):
+        """
+        Seconds to wait before retry number `retry`, starting at 1.
+        """
+        s = min(self.base_s * 2 ** (retry - 1), self.max_s)
+        return s * (1 + random.uniform(0, self.jitter))
+
+    def run(self, fn, idempotent, reconnect=None, prepare=None, on_retry=None):
+        """
+        Return (fn(), retries, backoff_s), retrying fn after a transient error if idempotent.
+        reconnect() - called before a retry, to login again, if it raises the error of fn is raised
+        prepare() - called before a retry, after reconnect, e.g. to drop a partially created table
+        on_retry(retry, exc, backoff_s) - called before waiting for each retry
+        """
+        retries = 0
+        backoff_total = 0.0
+        error = None
+        while True:
+            if retries > 0 and reconnect is not None:
+                try:
+                    reconnect()
+                except Exception as e:
+                    raise error from e
+            try:
+                if retries > 0 and prepare is not None:
+                    prepare()
+                return fn(), retries, backoff_total
+            except Exception as e:
+                error = e
+                if not idempotent or retries + 1 >= self.max_attempts or not is_retryable(e):
+                    raise
+                retries += 1
+                wait_s = self.backoff_s(retries)
+                if on_retry is not None:
+                    on_retry(retries, e, wait_s)
+                sleep(wait_s)
+                backoff_total += wait_s
@@ -0,0 +1,182 @@
+"""
+Scoped tables for intermediate results, dropped when the scope exits, also after an error.
+
+    with con.temp_tables() as tmp:
+        for day in days:
+            # a TEMPORARY table, truncated and reused while the task and schema are the same
+            stage = tmp.create("stage", stage_table)
+            con.load_table(stage, load_day(day))
+            con.insert_as(target, f"SELECT * FROM {stage}")
+
+TEMPORARY tables are not written to disk and do not survive a server restart,
+but they are visible to other sessions until dropped.
+Names end in the UTC creation time, the pid and a counter, `tmp_{task}__{args}__{YYYYmmddHHMMSS}_{pid}_{n}`,
+so that `sweep_temp_tables` can drop the tables of processes that were killed,
+older than env var OMNISCI_DB_TEMP_TABLE_HOURS or 24 hours.
+The sweep can not tell whether a process on another host is still running, so it drops by age,
+except for the tables of the sweeping process itself:
+set the hours above the longest time a scope stays open, or its tables are dropped while in use.
+"""
+
+import os
+import re
+import datetime
+import itertools
+import threading
+
+import pandas as pd
+
+import omnisci_olio.schema as sc
+from .ingest import as_arrow_data, arrow_batches, table_from_arrow_schema
+
+
+TEMP_PREFIX = "tmp_"
+
+_STAMP_FORMAT = "%Y%m%d%H%M%S"
+_name_re = re.compile(r"__(\d{14})_(\d+)_\d+$")
+_counter = itertools.count(1)
+
+
+def default_sweep_hours():
+    return float(os.environ.get("OMNISCI_DB_TEMP_TABLE_HOURS", 24))
+
+
+def created_at(name):
+    """
+    The UTC creation time in a temp table name, or None if it is not a temp table name.
+    """
+    m = _name_re.search(name)
+    return None if m is None else datetime.datetime.strptime(m[1], _STAMP_FORMAT)
+
+
+def created_by(name):
+    """
+    The pid in a temp table name, or None if it is not a temp table name.
+    """
+    m = _name_re.search(name)
+    return None if m is None else int(m[2])
+
+
+def _signature(table):
+    return table.compile(name="_")
+
+
+class TempTables:
+    """
+    client - an OmniSciDBClient
+    temporary - create TEMPORARY tables, False for regular tables, e.g. to look at them after a failure
+    """
+
+    def __init__(self, client, temporary=True):
+        self.client = client
+        self.temporary = temporary
+        # (task, args, signature) -> name, of the tables to reuse
+        self._reusable = {}
+        self._names = []
+        self._lock = threading.Lock()
+
+    def name(self, task, *args):
+        """
+        A new unique temp table name, dropped on exit if a table is created with it.
+        """
+        stamp = datetime.datetime.utcnow().strftime(_STAMP_FORMAT)
+        parts = [f"{TEMP_PREFIX}{task}"] + [str(a) for a in args] + [f"{stamp}_{os.getpid()}_{next(_counter)}"]
+        name = self.client.clean_name("__".join(parts))
+        with self._lock:
+            self._names.append(name)
+        return name
+
+    def create(self, task, table, *args):
+        """
+        Return the name of an empty table with the columns and props of the sc.Table `table`, whose name is not used.
+        A table created in this scope with the same task, args and schema is truncated and returned.
+        """
+        client = self.client
+        key = (task, args, _signature(table))
+        with self._lock:
+            name = self._reusable.get(key)
+        if name is not None and client.exists_table(name):
+            client.exec_update(name, f"TRUNCATE TABLE {name};", cmd="TRUNCATE", count_strategy="none")
+            return name
+        name = self.name(task, *args)
+        tbl = table.copy_named(name)
+        tbl.temp = self.temporary
+        client.create_table(tbl)
+        with self._lock:
+            self._reusable[key] = name
+        return name
+
+    def store(self, task, data, table=None, **load_kwargs):
+        """
+        Store data in a table of this scope, and return its name.
+        data - a DataFrame or Arrow data, loaded into a table created by `create` with the columns of `table`,
+            or of the data if table is None; or an Ibis expression or SQL, stored by CREATE TABLE AS
+            in a new regular table, dropped on exit like the others
+        """
+        client = self.client
+        if table is None:
+            data, arrow = as_arrow_data(data)
+            if isinstance(data, pd.DataFrame):
+                table = sc.Table.from_dataframe(task, data)
+            elif arrow:
+                schema = getattr(data, "schema", None)
+                if schema is None and isinstance(data, (str, os.PathLike)):
+                    schema = arrow_batches(data)[0]
+                table = table_from_arrow_schema(task, schema)
+            else:
+                name = self.name(task)
+                client.create_table_as(name, data)
+                return name
+        name = self.create(task, table)
+        client.load_table(name, data, **load_kwargs)
+        return name
+
+    def drop(self, name):
+        with self._lock:
+            self._reusable = {k: v for k, v in self._reusable.items() if v != name}
+            if name in self._names:
+                self._names.remove(name)
+        self.client.drop_table(name)
+
+    def close(self):
+        """
+        Drop the tables of this scope, last created first. Errors are logged, and do not stop the others.
+        """
+        with self._lock:
+            names = list(reversed(self._names))
+            self._names = []
+            self._reusable = {}
+        # the table list may be cached from before the tables were created
+        self.client.table_cache.invalidate(names)
+        for name in names:
+            try:
+                self.client.drop_table(name)
+            except Exception as e:
+                self.client.get_logger_severity("WARNING")(cmd="DROP TEMP TABLE", target=name, exception=e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def sweep_temp_tables(client, older_than_hours=None, prefix=TEMP_PREFIX):
+    """
+    Drop the temp tables, named by `TempTables.name`, created more than older_than_hours ago,
+    by default env var OMNISCI_DB_TEMP_TABLE_HOURS or 24, other than the tables of this process.
+    Returns the names of the dropped tables.
+    """
+    hours = default_sweep_hours() if older_than_hours is None else older_than_hours
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(hours=hours)
+    client.table_cache.invalidate()
+    dropped = []
+    for name in sorted(client.table_cache.table_names(client.con)):
+        if not name.startswith(prefix):
+            continue
+        t = created_at(name)
+        # the tables of this process may be in use, those of another host with the same pid are kept until later
+        if t is not None and t < cutoff and created_by(name) != os.getpid():
+            client.drop_table(name)
+            dropped.append(name)
+    return dropped
@@ -0,0 +1,134 @@
+"""
+A fake OmniSciDBClient for the tests that need no server.
+"""
+
+import copy
+import time
+import threading
+from contextlib import contextmanager
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class FakeConnection:
+    """
+    Stands in for both the Ibis connection `client.con` and the pyomnisci connection `client.con.con`.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.con = self
+        self.uri = None
+
+    def execute(self, sql):
+        return FakeCursor(self.client.execute_sql(sql))
+
+
+class FakeTableCache:
+    def __init__(self, names=()):
+        self.names = set(names)
+
+    def table_names(self, con):
+        return self.names
+
+    def invalidate(self, names=None):
+        pass
+
+
+class FakeClient:
+    """
+    Records the statements it runs, the tables stored and dropped and the log rows, in lists shared with its session clones.
+
+    tables - the table names of the database
+    fail - a statement containing one of these, or a store into one of these tables, raises, once for each of them
+    respond(sql) - the rows returned by a statement
+    store_s - seconds a store takes
+    """
+
+    def __init__(self, tables=(), fail=(), respond=None, store_s=0):
+        self.con = FakeConnection(self)
+        self.table_cache = FakeTableCache(tables)
+        self.fail = set(fail)
+        self.respond = respond or (lambda sql: [])
+        self.store_s = store_s
+        self.process_run = None
+        self.executed = []
+        self.stored = []
+        self.dropped = []
+        self.logged = []
+        self._lock = threading.Lock()
+
+    def _fail_once(self, text):
+        with self._lock:
+            failed = next((f for f in self.fail if f in text), None)
+            self.fail.discard(failed)
+        if failed is not None:
+            raise Exception(f"failed {failed}")
+
+    def execute_sql(self, sql):
+        with self._lock:
+            self.executed.append(sql)
+        self._fail_once(sql)
+        return self.respond(sql)
+
+    def to_sql(self, op):
+        return op
+
+    def store(self, op, target, sources=None, **kwargs):
+        time.sleep(self.store_s)
+        self._fail_once(target)
+        with self._lock:
+            self.stored.append((target, sources))
+
+    def exists_table(self, name):
+        return name in self.table_cache.names
+
+    def create_table_as(self, name, sql, **kwargs):
+        self.execute_sql(f"CREATE TABLE {name} AS {sql}")
+        self.table_cache.names.add(name)
+
+    def drop_table(self, name):
+        with self._lock:
+            self.dropped.append(name)
+        self.table_cache.names.discard(name)
+
+    def exec_update(self, table_name, sql, sources=None, cmd="execute_update", **kwargs):
+        self.execute_sql(sql)
+        self.log(cmd, 0, table_name, sources)
+        return table_name
+
+    def delete_where(self, table_name, where_sql):
+        return self.exec_update(table_name, f"DELETE FROM {table_name} WHERE {where_sql};", cmd="DELETE")
+
+    @contextmanager
+    def session_clone(self, process_run=None):
+        clone = copy.copy(self)
+        clone.con = FakeConnection(clone)
+        if process_run is not None:
+            clone.process_run = process_run
+        yield clone
+
+    def _with_props(self, props):
+        return ""
+
+    def _count_rows(self, table_name, strategy=None):
+        return None
+
+    def _tables_changed(self, names, ddl=False):
+        pass
+
+    def log(self, cmd, tstart, *args, process_run=None, **kwargs):
+        with self._lock:
+            self.logged.append(dict(kwargs, cmd=cmd, args=args, process_run=process_run or self.process_run))
+
+    def default_logger(self, **kwargs):
+        pass
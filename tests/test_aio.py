@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+
+from omnisci_olio.workflow.aio import AsyncOmniSciDBClient
+
+
+def test_concurrency_bound(monkeypatch):
+    monkeypatch.delenv("OMNISCI_DB_LOG_URL", raising=False)
+    state = dict(running=0, max_running=0)
+    lock = threading.Lock()
+
+    def call(method, args, kwargs):
+        with lock:
+            state["running"] += 1
+            state["max_running"] = max(state["max_running"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return (method, args)
+
+    async def main():
+        # the client connects on first use, so no server is needed
+        async with AsyncOmniSciDBClient("omnisci://user:pw@localhost:6274/test_aio", concurrency=2) as con:
+            monkeypatch.setattr(con, "_call", call)
+            return await asyncio.gather(*[con.query1(i) for i in range(6)])
+
+    assert asyncio.run(main()) == [("query1", (i,)) for i in range(6)]
+    assert state["max_running"] == 2
+
+
+def test_async_queries():
+    async def main():
+        async with AsyncOmniSciDBClient(concurrency=4) as con:
+            await con.store("SELECT 1 AS x", "test_aio_store", drop=True)
+            values = await asyncio.gather(*[con.query1(f"SELECT {i} + x FROM test_aio_store") for i in range(8)])
+            await con.run("drop_table", "test_aio_store")
+            return values
+
+    assert asyncio.run(main()) == list(range(1, 9))
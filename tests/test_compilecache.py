@@ -0,0 +1,64 @@
+from omnisci_olio.workflow.compilecache import CompileCache, sql_literal
+
+
+class FakeExpr:
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def equals(self, other):
+        return self.name == other.name
+
+
+class FakeBackend:
+    """
+    Compiles like Ibis would, with its own quoting of text literals.
+    """
+
+    def __init__(self):
+        self.compiles = 0
+
+    def compile(self, expr, params=None):
+        self.compiles += 1
+        where = " AND ".join(f"{p.name} = {self.literal(v)}" for p, v in (params or {}).items()) or "TRUE"
+        return f"SELECT * FROM {expr.name} WHERE {where}"
+
+    def literal(self, value):
+        if isinstance(value, str):
+            return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+        return sql_literal(value)
+
+
+def test_template():
+    con = FakeBackend()
+    cache = CompileCache()
+    t = FakeExpr("t")
+    x = FakeExpr("x")
+    assert cache.compile(con, t, {x: 1}) == "SELECT * FROM t WHERE x = 1"
+    assert cache.compile(con, t, {x: 2}) == "SELECT * FROM t WHERE x = 2"
+    # the first compile of the value and of the sentinel
+    assert con.compiles == 2
+
+
+def test_template_values_checked():
+    con = FakeBackend()
+    cache = CompileCache()
+    t = FakeExpr("t")
+    x = FakeExpr("x")
+    assert cache.compile(con, t, {x: "a"}) == "SELECT * FROM t WHERE x = 'a'"
+    # values that Ibis may format differently are compiled by Ibis
+    assert cache.compile(con, t, {x: "it's"}) == con.compile(t, {x: "it's"})
+    assert cache.compile(con, t, {x: 3}) == "SELECT * FROM t WHERE x = 3"
+
+
+def test_key_has_params():
+    con = FakeBackend()
+    cache = CompileCache()
+    t = FakeExpr("t")
+    assert cache.compile(con, t) == "SELECT * FROM t WHERE TRUE"
+    assert cache.compile(con, t, {FakeExpr("x"): 1}) == "SELECT * FROM t WHERE x = 1"
+    assert cache.compile(con, t, {FakeExpr("y"): 1}) == "SELECT * FROM t WHERE y = 1"
+    assert cache.compile(con, t) == "SELECT * FROM t WHERE TRUE"
+    assert cache.stats()["entries"] == 3
@@ -0,0 +1,56 @@
+import pytest
+
+from omnisci_olio.workflow.copyfiles import BulkCopy, _table_semaphore, size_groups
+from tests.conftest import FakeClient
+
+
+def _client(fail=()):
+    return FakeClient(fail=fail, respond=lambda sql: [("Loaded: 10 recs, Rejected: 0 recs in 0.1 secs",)])
+
+
+def _copied(client):
+    return [sql.split("'")[1] for sql in client.executed]
+
+
+def _files(tmp_path, sizes):
+    paths = []
+    for i, size in enumerate(sizes):
+        p = tmp_path / f"f{i}.csv"
+        p.write_bytes(b"x" * size)
+        paths.append(str(p))
+    return paths
+
+
+def test_size_groups(tmp_path):
+    paths = _files(tmp_path, [50, 40, 30, 20, 10])
+    groups = size_groups(paths, group_bytes=1000, min_groups=2)
+    assert sorted(p for g in groups for p in g) == sorted(paths)
+    assert groups == [[paths[0], paths[3], paths[4]], [paths[1], paths[2]]]
+    assert len(size_groups(paths, group_bytes=60)) == 3
+
+
+def test_table_semaphore_shared():
+    a = _table_semaphore("omnisci://test_table_semaphore", "t", 2)
+    assert _table_semaphore("omnisci://test_table_semaphore", "t", 4) is a
+    assert _table_semaphore("omnisci://test_table_semaphore", "u", 4) is not a
+
+
+def test_failed_copy_not_retried(tmp_path):
+    paths = _files(tmp_path, [30, 20, 10])
+    client = _client(fail=[paths[0]])
+    with pytest.raises(Exception, match="did not load 1 of 3 files") as e:
+        BulkCopy(client, max_in_flight=1).copy("test_copyfiles", paths)
+    assert "(not retried, see retry_failed)" in str(e.value) and paths[0] in str(e.value)
+    # the failed COPY may have committed, the files after it in the group are copied on retry
+    assert sorted(_copied(client)) == sorted(paths)
+    # one COPY per file
+    assert all(sql.startswith('COPY "test_copyfiles" FROM') for sql in client.executed)
+
+
+def test_failed_copy_retried(tmp_path):
+    paths = _files(tmp_path, [30, 20, 10])
+    client = _client(fail=[paths[0]])
+    report = BulkCopy(client, max_in_flight=1, retry_failed=True).copy("test_copyfiles", paths)
+    assert _copied(client).count(paths[0]) == 2
+    assert report.set_index("path").loc[paths[0], "attempts"] == 2
+    assert report["loaded"].sum() == 30
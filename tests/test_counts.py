@@ -0,0 +1,44 @@
+from omnisci_olio.workflow.counts import COUNT_EPOCH_CACHED, RowCounter, parse_copy_response
+
+
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.epoch = 1
+        self.counts = 0
+        self.epochs = 0
+
+    def count(self, table_name):
+        self.counts += 1
+        return self.rows
+
+    def get_epoch(self, table_name):
+        self.epochs += 1
+        return self.epoch
+
+
+def test_parse_copy_response():
+    assert parse_copy_response("Loaded: 10 recs, Rejected: 2 recs in 0.5 secs") == (10, 2)
+    assert parse_copy_response("Loader Failed") is None
+
+
+def test_epoch_cached_shared_with_clone():
+    t = FakeTable(5)
+    counter = RowCounter(t.count, t.get_epoch, strategy=COUNT_EPOCH_CACHED)
+    clone = RowCounter(t.count, t.get_epoch, strategy=COUNT_EPOCH_CACHED, shared=counter)
+    assert counter.count("t") == 5
+    # a load of 3 rows on the clone, known from its response
+    t.rows, t.epoch = 8, 2
+    assert clone.count_after("t", 5, loaded=3) == 8
+    assert counter.count("t") == 8
+    assert t.counts == 1
+
+
+def test_epoch_cached_unknown_loaded():
+    t = FakeTable(5)
+    counter = RowCounter(t.count, t.get_epoch, strategy=COUNT_EPOCH_CACHED)
+    t.rows, t.epoch = 7, 2
+    epochs = t.epochs
+    assert counter.count_after("t", 5) == 7
+    # counted exactly, without reading the epoch
+    assert t.epochs == epochs
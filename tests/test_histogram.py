@@ -0,0 +1,85 @@
+import json
+
+import pandas as pd
+
+from omnisci_olio.workflow.histogram import (
+    LatencyHistogram,
+    LatencyHistograms,
+    _bucket,
+    _bucket_range,
+    sql_fingerprint,
+)
+
+
+def test_bucket_range():
+    previous_high = 0
+    for i in range(400):
+        low, high = _bucket_range(i)
+        # buckets are contiguous, and each value is in its own bucket
+        assert low == previous_high
+        assert _bucket(low) == i and _bucket(high - 1) == i
+        # within about 6% above 16 microseconds
+        assert high - low == 1 or (high - low) / low <= 1 / 16
+        previous_high = high
+
+
+def test_percentile():
+    h = LatencyHistogram()
+    assert h.percentile(50) is None
+    for ms in range(1, 101):
+        h.record(ms / 1000)
+    assert h.count == 100
+    assert abs(h.percentile(50) - 0.050) / 0.050 < 0.07
+    assert abs(h.percentile(99) - 0.099) / 0.099 < 0.07
+    assert h.percentile(100) <= h.max_s == 0.1
+    assert h.percentile(0) >= h.min_s == 0.001
+
+
+def test_dump_merge_take():
+    a = LatencyHistograms(enabled=True)
+    b = LatencyHistograms(enabled=True)
+    a.record("query", "SELECT * FROM t WHERE x = 1", 0.01)
+    b.record("query", "SELECT * FROM t WHERE x = 2", 0.02)
+    b.record("update", "DELETE FROM t", 0.5)
+    a.merge(json.loads(json.dumps(b.dump())))
+    df = a.to_dataframe().set_index("kind")
+    assert df.loc["query", "op_count"] == 2
+    assert df.loc["query", "fingerprint"] == "SELECT * FROM t WHERE x = ?"
+    assert df.loc["update", "max_s"] == 0.5
+
+    taken = a._take()
+    assert len(taken) == 2 and a.dump() == []
+    assert LatencyHistograms(enabled=False).dump() == []
+
+
+def test_sql_fingerprint():
+    fid, text = sql_fingerprint("SELECT a1, 'x''y' FROM t -- note\nWHERE b IN (1, 2.5, -3) AND c = 1e3;")
+    assert text == "SELECT a1, ? FROM t WHERE b IN (...) AND c = ?"
+    assert len(fid) == 16
+    assert fid == sql_fingerprint("SELECT a1, 'z' FROM t WHERE b IN (4) AND c = 7")[0]
+
+
+class FakeClient:
+    uri = "omnisci://test_histogram_flush"
+
+    def __init__(self):
+        self.creates = 0
+        self.loaded = []
+
+    def create_table(self, table):
+        self.creates += 1
+
+    def load_table(self, name, df, take_counts=True):
+        assert isinstance(df, pd.DataFrame)
+        self.loaded.append(len(df))
+        return name
+
+
+def test_flush_creates_table_once():
+    h = LatencyHistograms(enabled=True)
+    con = FakeClient()
+    for _ in range(3):
+        h.record("query", "SELECT 1", 0.01)
+        h.flush(con)
+    assert con.creates == 1
+    assert con.loaded == [1, 1, 1]
@@ -0,0 +1,149 @@
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import omnisci_olio.schema as sc
+from omnisci_olio.workflow.ingest import (
+    ArrowReconciliation,
+    arrow_type,
+    as_arrow_data,
+    is_arrow_data,
+    iter_arrow_chunks,
+    table_from_arrow_schema,
+)
+
+
+def _batch(n, start=0):
+    return pa.record_batch([pa.array(range(start, start + n), pa.int64())], names=["id"])
+
+
+def test_as_arrow_data(tmp_path):
+    data, arrow = as_arrow_data(iter([_batch(2), _batch(3)]))
+    assert arrow and is_arrow_data(data)
+    assert data.schema.names == ["id"]
+    assert [b.num_rows for b in data] == [2, 3]
+
+    # not a RecordBatch iterator, returned with its first item
+    data, arrow = as_arrow_data(iter([1, 2]))
+    assert not arrow and list(data) == [1, 2]
+    assert not is_arrow_data(iter([_batch(1)]))
+
+    path = tmp_path / "parts" / "part.parquet"
+    path.parent.mkdir()
+    pq.write_table(pa.Table.from_batches([_batch(2)]), str(path))
+    assert is_arrow_data(path) and is_arrow_data(path.parent) and is_arrow_data(str(path))
+    assert not is_arrow_data(tmp_path / "data.csv")
+    assert not is_arrow_data("SELECT * FROM t")
+
+
+def test_arrow_type():
+    assert arrow_type("TIMESTAMP(3)") == pa.timestamp("ms")
+    assert arrow_type("TIMESTAMP(0) ENCODING FIXED(32)") == pa.timestamp("s")
+    assert arrow_type("TEXT ENCODING DICT(32)") == pa.string()
+    assert arrow_type("INTEGER[]") is None
+    assert arrow_type("DECIMAL(10,2)") is None
+    assert arrow_type(sc.Timestamp(9)) == pa.timestamp("ns")
+
+
+def test_unsigned_widened():
+    schema = pa.schema([("a", pa.uint8()), ("b", pa.uint16()), ("c", pa.uint32()), ("d", pa.int8())])
+    tbl = table_from_arrow_schema("t", schema)
+    assert [c.datatype.typename for c in tbl.columns] == ["SMALLINT", "INTEGER", "BIGINT", "TINYINT"]
+    with pytest.raises(Exception, match="uint64"):
+        table_from_arrow_schema("t", pa.schema([("a", pa.uint64())]))
+
+
+def test_reconcile_and_chunks():
+    ts = pa.array([0, 1000, 2000], pa.timestamp("ns"))
+    batch = pa.record_batch([ts, pa.array([1, 2, 3], pa.int64()), pa.array([0.5] * 3)], names=["ts", "id", "x"])
+    reconcile = ArrowReconciliation(batch.schema, [("id", "INTEGER"), ("ts", "TIMESTAMP(6)")])
+    assert reconcile.casts == ["id", "ts"]
+    out = reconcile.apply(batch)
+    assert out.schema == pa.schema([("id", pa.int32()), ("ts", pa.timestamp("us"))])
+
+    chunks = list(iter_arrow_chunks([_batch(5), _batch(2, 5), _batch(4, 7)], chunk_rows=4))
+    assert [i for i, _ in chunks] == [0, 1, 2]
+    # small batches are combined up to chunk_rows, without splitting them again
+    assert [t.num_rows for _, t in chunks] == [4, 3, 4]
+    assert pa.concat_tables([t for _, t in chunks]).column("id").to_pylist() == list(range(11))
+
+
+class FakeArrowBackend:
+    """
+    Records the chunks loaded, and fails the chunks with an id in `fail`.
+    """
+
+    def __init__(self, uri=None, fail=(), loaded=None):
+        self.uri = uri
+        self.con = self
+        self.fail = set(fail)
+        self.loaded = [] if loaded is None else loaded
+
+    def load_table_arrow(self, table_name, data, preserve_index=False):
+        assert isinstance(data, pa.Table)
+        ids = data.column("id").to_pylist()
+        if self.fail.intersection(ids):
+            raise Exception("Loader failed")
+        self.loaded.append(ids)
+
+    def close(self):
+        pass
+
+
+def test_load_dataframe_arrow_failed():
+    import pandas as pd
+    from omnisci_olio.workflow.ingest import load_dataframe_arrow
+
+    df = pd.DataFrame({"id": range(10), "name": [str(i) for i in range(10)]})
+    con = FakeArrowBackend()
+    chunks = load_dataframe_arrow(con, "t", df, chunk_rows=4, parallel=1)
+    assert [(c["chunk"], c["rows"]) for c in chunks] == [(0, 4), (1, 4), (2, 2)]
+
+    con = FakeArrowBackend(fail=[5])
+    with pytest.raises(Exception, match=r"chunk 1 into t failed.*chunks \[0\] were loaded") as e:
+        load_dataframe_arrow(con, "t", df, chunk_rows=4, parallel=1)
+    assert str(e.value.__cause__) == "Loader failed"
+    # no chunk is loaded after the failed one
+    assert con.loaded == [[0, 1, 2, 3]]
+
+
+def test_load_chunks_pooled(monkeypatch):
+    import omnisci_olio.workflow.ingest as ingest
+    from omnisci_olio.workflow.pool import SessionPool
+
+    def pool(fail):
+        loaded = []
+        pool = SessionPool(
+            "omnisci://test_load_chunks", max_sessions=2, connect=lambda uri: FakeArrowBackend(uri, fail, loaded)
+        )
+        monkeypatch.setattr(ingest, "get_pool", lambda uri: pool)
+        return pool, loaded
+
+    batches = [_batch(3, start) for start in range(0, 12, 3)]
+    con = FakeArrowBackend("omnisci://test_load_chunks")
+    p, loaded = pool(())
+    chunks = ingest.load_chunks(con, "t", iter_arrow_chunks(batches, chunk_rows=3), parallel=2)
+    # in chunk order, whichever session finished first
+    assert [c["chunk"] for c in chunks] == [0, 1, 2, 3]
+    assert sorted(i for ids in loaded for i in ids) == list(range(12))
+    assert p.size() <= 2
+
+    batches = [_batch(3, start) for start in range(0, 30, 3)]
+    p, loaded = pool([0])
+    with pytest.raises(Exception, match="chunk 0 into t failed"):
+        ingest.load_chunks(con, "t", iter_arrow_chunks(batches, chunk_rows=3), parallel=2)
+    # chunks were in flight when the first failed, but no more are started after it
+    assert 0 < len(loaded) < 9
+    assert p.size() <= 2
+
+
+def test_write_parquet_chunks(tmp_path):
+    import pandas as pd
+    from omnisci_olio.workflow.ingest import write_parquet_chunks
+
+    df = pd.DataFrame({"id": range(10)})
+    paths = write_parquet_chunks(df, str(tmp_path / "staged"), chunk_rows=4, parallel=2)
+    assert [os.path.basename(p) for p in paths] == ["part_00000.parquet", "part_00001.parquet", "part_00002.parquet"]
+    assert pq.read_table(str(tmp_path / "staged")).column("id").to_pylist() == list(range(10))
@@ -0,0 +1,44 @@
+from omnisci_olio.workflow import connect
+from omnisci_olio.workflow.client import db_update_log_table
+from omnisci_olio.workflow.logmaint import rollup, rollup_table, delete_expired, rewrite_sorted, rewrite_statements
+
+
+def test_rewrite_statements_rename_before_drop():
+    statements = rewrite_statements("log", 41)
+    renames = [i for i, s in enumerate(statements) if "RENAME" in s]
+    assert statements[renames[0]] == "ALTER TABLE log RENAME TO log__old;"
+    assert statements[renames[1]] == "ALTER TABLE log__sorted RENAME TO log;"
+    # the log table is never dropped, only the old table after the sorted copy took its name
+    assert not any(s.startswith("DROP TABLE log;") for s in statements)
+    assert statements[-1] == "DROP TABLE log__old;"
+    assert "WHERE rowid <= 41 ORDER BY created_at" in statements[3]
+    assert statements[6].endswith("FROM log__old WHERE rowid > 41;")
+
+
+def test_rollup_and_rewrite():
+    log_table = "test_logmaint_log"
+    rollup_test = rollup_table.copy_named("test_logmaint_rollup")
+    with connect() as con:
+        con.drop_table(log_table)
+        con.drop_table(rollup_test.name)
+        con.create_table(db_update_log_table.copy_named(log_table))
+        for days, sec in [(2, 1.0), (10, 2.0), (10, 3.0), (400, 4.0)]:
+            con.exec_update(
+                log_table,
+                f"""INSERT INTO {log_table} (created_at, operation, tgt_table, process_app, process_sec,
+                process_rows, error_count)
+                VALUES (NOW() - INTERVAL '{days}' DAY, 'INSERT', 't', 'test', {sec}, 10, 0);""",
+            )
+        rollup(con, 5, periods=("day",), log_table=log_table, table=rollup_test)
+        days = con.query(f"SELECT op_count, process_sec FROM {rollup_test.name} ORDER BY period_start")
+        assert list(days["op_count"]) == [1, 2]
+        assert list(days["process_sec"]) == [4.0, 5.0]
+
+        delete_expired(con, 5, log_table=log_table)
+        assert 1 == con.table(log_table).count().execute()
+
+        rewrite_sorted(con, log_table=log_table)
+        assert 1 == con.table(log_table).count().execute()
+        assert not con.exists_table(f"{log_table}__old")
+        con.drop_table(log_table)
+        con.drop_table(rollup_test.name)
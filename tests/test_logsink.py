@@ -0,0 +1,54 @@
+import threading
+from time import time
+
+import omnisci_olio.schema as sc
+from omnisci_olio.workflow.logsink import LogSink
+
+
+class MemorySink(LogSink):
+    # rows are kept instead of loaded to a DB
+    def __init__(self, **kwargs):
+        self.rows = []
+        super().__init__("omnisci://unused", sc.Table("test_logsink", [sc.Column("i", sc.Integer())]), **kwargs)
+
+    def _write(self, rows):
+        with self._write_lock:
+            self.rows.extend(rows)
+            self._count(written=len(rows), batches=1)
+
+
+def test_flush_does_not_wait_for_the_interval():
+    sink = MemorySink(flush_interval_s=60)
+    for i in range(10):
+        sink.write((i,))
+    tstart = time()
+    assert sink.flush(timeout=10)
+    assert time() - tstart < 5
+    assert [r[0] for r in sink.rows] == list(range(10))
+    sink.close()
+
+
+def test_flush_while_others_keep_logging():
+    sink = MemorySink(flush_interval_s=60, batch_rows=7)
+    stop = threading.Event()
+
+    def log():
+        while not stop.is_set():
+            sink.write((0,))
+
+    writers = [threading.Thread(target=log) for _ in range(2)]
+    for t in writers:
+        t.start()
+    try:
+        for _ in range(3):
+            sink.write((1,))
+            assert sink.flush(timeout=10)
+    finally:
+        stop.set()
+        for t in writers:
+            t.join()
+    sink.close()
+    stats = sink.stats()
+    assert stats["written"] + stats["dropped"] >= 3
+    assert stats["written"] == len(sink.rows)
+    assert stats["queued"] == 0
@@ -0,0 +1,81 @@
+import omnisci_olio.workflow.metadata as metadata
+from omnisci_olio.workflow.metadata import TableCache, is_ddl
+
+
+class FakeThriftClient:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_views(self, session):
+        self.calls.append("get_views")
+        return ["v"]
+
+
+class FakeConnection:
+    """
+    Ibis connection counting its server calls.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.con = self
+        self._session = "session"
+        self._client = FakeThriftClient(self.calls)
+
+    def list_tables(self):
+        self.calls.append("list_tables")
+        return ["t", "v"]
+
+    def get_schema(self, name):
+        self.calls.append(("get_schema", name))
+        return {"name": name}
+
+    def table(self, name):
+        return ("table", name)
+
+
+def test_is_ddl():
+    assert is_ddl("  create table t (x int)") and is_ddl("DROP VIEW v") and is_ddl("COPY t FROM 'f.csv'")
+    assert not is_ddl("INSERT INTO t SELECT * FROM u") and not is_ddl("UPDATE t SET x = 1")
+    assert not is_ddl("SELECT 1 AS created") and not is_ddl(None)
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(metadata, "time", lambda: now[0])
+    con = FakeConnection()
+    cache = TableCache(ttl_s=60)
+    assert cache.exists(con, "t") and not cache.exists(con, "u")
+    assert cache.view_names(con) == {"v"} and cache.view_names(con) == {"v"}
+    assert cache.schema(con, "t") == cache.schema(con, "t") == {"name": "t"}
+    assert con.calls == ["list_tables", "get_views", ("get_schema", "t")]
+    assert cache.stats() == dict(hits=3, misses=3, schemas=1)
+
+    now[0] += 61
+    cache.exists(con, "t")
+    cache.view_names(con)
+    cache.schema(con, "t")
+    assert con.calls[3:] == ["list_tables", "get_views", ("get_schema", "t")]
+
+
+def test_invalidate():
+    con = FakeConnection()
+    cache = TableCache(ttl_s=60)
+    for name in ["t", "u"]:
+        cache.schema(con, name)
+    cache.view_names(con)
+    cache.exists(con, "t")
+    del con.calls[:]
+
+    # after DDL on t, the table list, the views and the schema of t are fetched again
+    cache.invalidate(["t"])
+    cache.exists(con, "t")
+    cache.view_names(con)
+    cache.schema(con, "t")
+    cache.schema(con, "u")
+    assert con.calls == ["list_tables", "get_views", ("get_schema", "t")]
+
+    cache.invalidate()
+    assert cache.stats()["schemas"] == 0
+    # a connection without table_class builds the table by name
+    assert cache.table(con, "u") == ("table", "u")
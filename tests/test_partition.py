@@ -0,0 +1,94 @@
+import datetime
+import decimal
+
+import pandas as pd
+import pytest
+
+from omnisci_olio.workflow.partition import (
+    PartitionedStore,
+    _interpolate,
+    partition_bounds,
+    partition_conditions,
+)
+from tests.conftest import FakeClient
+
+
+def test_interpolate():
+    assert _interpolate(0, 10, 0.25) == 2 and isinstance(_interpolate(0, 10, 0.25), int)
+    assert _interpolate(0.0, 1.0, 0.5) == 0.5
+    assert _interpolate(decimal.Decimal("1.00"), decimal.Decimal("2.00"), 0.5) == decimal.Decimal("1.5")
+    assert _interpolate(datetime.date(2021, 1, 1), datetime.date(2021, 1, 5), 0.5) == pd.Timestamp("2021-01-03")
+    lo = pd.Timestamp("2021-01-01")
+    assert _interpolate(lo, lo + pd.Timedelta(hours=4), 0.25) == lo + pd.Timedelta(hours=1)
+
+
+def _client(lo=None, hi=None, quantiles=None, range_rows=0, **kwargs):
+    def respond(sql):
+        if sql.startswith("SELECT MIN("):
+            return [(lo, hi)]
+        if sql.startswith("SELECT APPROX_QUANTILE("):
+            return [tuple(quantiles)]
+        if sql.startswith("SELECT COUNT(*)"):
+            return [(range_rows,)]
+        return []
+
+    return FakeClient(respond=respond, **kwargs)
+
+
+def test_bounds():
+    assert partition_bounds(_client(0, 100), "src", "k", 4) == [25, 50, 75]
+    # an empty source, or a single partition, has no bounds
+    assert partition_bounds(_client(None, None), "src", "k", 4) == []
+    assert partition_bounds(_client(0, 100), "src", "k", 1) == []
+    # quantiles of a skewed key may repeat, or be NULL
+    assert partition_bounds(_client(quantiles=[5, 5, None]), "src", "k", 4, method="quantile") == [5]
+    # ranges of a few values are not split below the key values
+    assert partition_bounds(_client(0, 2), "src", "k", 4) == [0, 1]
+
+    with pytest.raises(Exception, match="must be a number, timestamp or date"):
+        partition_bounds(_client("AK", "WY"), "src", "state", 4)
+    with pytest.raises(Exception, match="Unknown partition method"):
+        partition_bounds(_client(0, 100), "src", "k", 4, method="hash")
+
+
+def test_conditions():
+    assert partition_conditions("k", []) == ["TRUE"]
+    assert partition_conditions("k", [25, 50]) == ["(k < 25 OR k IS NULL)", "k >= 25 AND k < 50", "k >= 50"]
+
+
+def _inserts(client):
+    return [sql for sql in client.executed if sql.startswith("INSERT")]
+
+
+def test_store_retry_deletes_range():
+    insert = 'INSERT INTO "t" SELECT * FROM (SELECT * FROM src) AS src WHERE k >= 50 AND k < 75'
+    client = _client(0, 100, fail=[insert])
+    assert PartitionedStore(client).store("SELECT * FROM src", "t", "k") == "t"
+    assert len(_inserts(client)) == 5
+    # the failed INSERT may have committed, so its range is deleted before it runs again
+    retry = [sql for sql in client.executed if "k >= 50 AND k < 75" in sql]
+    assert [sql.split()[0] for sql in retry] == ["INSERT", "DELETE", "INSERT"]
+    # all logged with the same new process_run, which is not set on the client
+    assert client.process_run is None
+    runs = {row["process_run"] for row in client.logged}
+    assert len(runs) == 1 and None not in runs
+    assert client.logged[-1]["cmd"] == "INSERT PARTITIONED" and client.logged[-1]["retries"] == 1
+
+
+def test_store_not_retried_if_range_had_rows():
+    insert = 'INSERT INTO "t" SELECT * FROM (SELECT * FROM src) AS src WHERE k >= 50 AND k < 75'
+    client = _client(0, 100, range_rows=3, tables=["t"], fail=[insert])
+    client.process_run = "run"
+    with pytest.raises(Exception, match="1 of 4 partitions failed"):
+        PartitionedStore(client).store("SELECT * FROM src", "t", "k")
+    assert len(_inserts(client)) == 4
+    assert not [sql for sql in client.executed if sql.startswith("DELETE")]
+    assert {row["process_run"] for row in client.logged} == {"run"}
+
+
+def test_store_text_key_rejected():
+    client = _client("AK", "WY")
+    with pytest.raises(Exception, match="must be a number"):
+        PartitionedStore(client).store("SELECT * FROM src", "t", "state", drop=True)
+    # nothing is dropped or created
+    assert client.dropped == [] and client.executed == ["SELECT MIN(state), MAX(state) FROM (SELECT * FROM src) AS src"]
@@ -0,0 +1,49 @@
+import pytest
+
+from omnisci_olio.workflow.pipeline import Pipeline
+from tests.conftest import FakeClient
+
+
+def _client(fail=()):
+    return FakeClient(tables=["sales", "regions"], fail=fail, store_s=0.02)
+
+
+def _pipeline(client):
+    p = Pipeline(client, max_workers=2)
+    p.add("daily", "SELECT * FROM sales", target="sales_daily")
+    p.add("monthly", "SELECT * FROM sales_daily JOIN regions ON TRUE", target="sales_monthly")
+    p.add("yearly", "WITH m AS (SELECT * FROM sales_monthly) SELECT * FROM m", target="sales_yearly")
+    p.add("regions", "SELECT * FROM regions", target="regions_copy")
+    return p
+
+
+def test_dependencies():
+    p = _pipeline(_client())
+    assert p.dependencies() == dict(daily=set(), monthly={"daily"}, yearly={"monthly"}, regions=set())
+    assert p.nodes["monthly"].reads == {"sales_daily", "regions"}
+
+    p.add("early", "SELECT * FROM later_target", target="early_target")
+    p.add("later", "SELECT * FROM sales", target="later_target")
+    with pytest.raises(Exception, match="add them first"):
+        p.dependencies()
+
+
+def test_run_report():
+    client = _client()
+    report = _pipeline(client).run()
+    targets = [t for t, _ in client.stored]
+    assert targets.index("sales_daily") < targets.index("sales_monthly") < targets.index("sales_yearly")
+    assert ("sales_monthly", ["regions", "sales_daily"]) in client.stored
+    assert report.critical_path == ["daily", "monthly", "yearly"]
+    assert report.errors == {}
+    df = report.to_dataframe().set_index("name")
+    assert df.loc["monthly", "deps"] == ["daily"] and df.loc["monthly", "critical"]
+    assert client.logged[0]["process_rows"] == 4
+
+
+def test_run_failure_skips_dependents():
+    client = _client(fail=["sales_daily"])
+    with pytest.raises(Exception, match="Pipeline failed"):
+        _pipeline(client).run()
+    assert [t for t, _ in client.stored] == ["regions_copy"]
+    assert client.logged[0]["error_count"] == 3
@@ -0,0 +1,35 @@
+import pytest
+
+from omnisci_olio.workflow.pool import SessionPool
+
+
+class FakeConnection:
+    def __init__(self, uri):
+        self.uri = uri
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_checkout_timeout():
+    pool = SessionPool("omnisci://unused", max_sessions=2, timeout=0.2, connect=FakeConnection)
+    a = pool.checkout()
+    pool.checkout()
+    with pytest.raises(Exception, match="Timeout"):
+        pool.checkout()
+    pool.checkin(a)
+    assert pool.checkout() is a
+
+
+def test_replace_keeps_max_sessions():
+    pool = SessionPool("omnisci://unused", max_sessions=1, timeout=0.2, connect=FakeConnection)
+    a = pool.checkout()
+    b = pool.replace(a)
+    assert a.closed and b is not a
+    assert pool.size() == 1
+    # a connection that is not checked out of the pool waits for a slot like checkout
+    with pytest.raises(Exception, match="Timeout"):
+        pool.replace(FakeConnection("omnisci://unused"))
+    pool.checkin(b)
+    assert pool.size() == 1
@@ -0,0 +1,36 @@
+import os
+
+import pandas as pd
+
+from omnisci_olio.workflow.resultcache import ResultCache, sql_names, sql_tables
+
+
+def test_sql_names():
+    sql = """WITH recent AS (SELECT * FROM events WHERE ts > NOW()), totals AS (SELECT * FROM recent)
+        SELECT * FROM totals JOIN "users" ON totals.uid = users.uid"""
+    assert sql_names(sql) == {"events", "users"}
+    assert sql_tables(sql, ["users", "other"]) == ["users"]
+
+
+def test_disk_lru(tmp_path):
+    df = pd.DataFrame({"x": range(1000)})
+    cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path))
+    cache.put("a", df, ["t"])
+    size = cache.disk_bytes
+    cache.disk_max_bytes = 2 * size
+    cache.put("b", df, ["t"])
+    # a is used more recently than b, so b is evicted
+    assert cache.get("a") is not None
+    cache.put("c", df, ["u"])
+    assert cache.disk_bytes == 2 * size
+    assert sorted(os.listdir(tmp_path)) == ["a.parquet", "c.parquet"]
+    assert cache.get("b") is None
+
+    # the files of an earlier process are counted
+    assert ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=size).stats()["disk_entries"] == 1
+
+    cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path))
+    cache.put("c", df, ["u"])
+    cache.invalidate_tables(["u"])
+    assert cache.get("c") is None
+    assert not os.path.exists(tmp_path / "c.parquet")
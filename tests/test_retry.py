@@ -0,0 +1,84 @@
+import errno
+import socket
+
+import pytest
+
+from omnisci_olio.workflow.retry import RetryPolicy, is_idempotent, is_retryable
+
+
+class TTransportException(Exception):
+    pass
+
+
+class TOmniSciException(Exception):
+    def __init__(self, error_msg):
+        super().__init__(error_msg)
+        self.error_msg = error_msg
+
+
+def test_is_idempotent():
+    assert is_idempotent("SELECT 1")
+    assert is_idempotent("  with t AS (SELECT 1) SELECT * FROM t")
+    assert is_idempotent("DELETE FROM t WHERE x = 1")
+    assert is_idempotent("DROP TABLE IF EXISTS t")
+    assert is_idempotent("CREATE TEMPORARY TABLE IF NOT EXISTS t (x INTEGER)")
+    assert not is_idempotent("DROP TABLE t")
+    assert not is_idempotent("CREATE TABLE t (x INTEGER)")
+    assert not is_idempotent("INSERT INTO t SELECT * FROM s")
+    assert not is_idempotent("UPDATE t SET x = 1")
+    assert not is_idempotent("COPY t FROM '/tmp/t.csv'")
+    assert not is_idempotent("SELECTED")
+    assert not is_idempotent(None)
+
+
+def test_is_retryable():
+    assert is_retryable(TTransportException("TSocket read 0 bytes"))
+    assert is_retryable(socket.timeout())
+    assert is_retryable(ConnectionResetError())
+    assert is_retryable(OSError(errno.EPIPE, "Broken pipe"))
+    assert is_retryable(TOmniSciException("Session not valid."))
+    assert not is_retryable(TOmniSciException("Table t does not exist."))
+    assert not is_retryable(ValueError("invalid literal"))
+    assert not is_retryable(OSError(errno.ENOENT, "No such file"))
+
+    # raised from a transient error
+    try:
+        try:
+            raise ConnectionRefusedError()
+        except Exception as e:
+            raise Exception("SELECT 1") from e
+    except Exception as e:
+        assert is_retryable(e)
+
+
+def test_run_reconnect_fails():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise TTransportException("TSocket read 0 bytes")
+
+    def reconnect():
+        raise Exception("Can not reconnect")
+
+    policy = RetryPolicy(max_attempts=3, base_s=0)
+    with pytest.raises(TTransportException):
+        policy.run(fn, idempotent=True, reconnect=reconnect)
+    assert len(calls) == 1
+
+
+def test_run_retries():
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TTransportException("TSocket read 0 bytes")
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=3, base_s=0)
+    assert policy.run(fn, idempotent=True)[:2] == ("ok", 2)
+    calls.clear()
+    with pytest.raises(TTransportException):
+        policy.run(fn, idempotent=False)
+    assert len(calls) == 1
@@ -88,3 +88,44 @@ def test_schema_evolution():
 def test_parse_ddl_to_python():
     code_text = sc.parse_ddl_to_python(test1_ddl)
     assert test1_code_text == code_text
+
+def test_plan_migration():
+    tbl = sc.Table(
+        "test_schema_datatypes",
+        [
+            sc.Column("text_", sc.Text(16)),
+            sc.Column("text_none_", sc.Text(encoding=None)),
+            sc.Column("text_8_", sc.Text(8), is_drop=True),
+            sc.Column("int_32_", sc.Integer(), rename_from="int_"),
+            sc.Column("int64_", sc.Integer(64)),
+            sc.Column("new_", sc.Float(64)),
+        ],
+    )
+    plan = sc.plan_migration(tbl, test1_ddl)
+    assert [s.compile() for s in plan] == [
+        "ALTER TABLE test_schema_datatypes DROP COLUMN text_8_",
+        "ALTER TABLE test_schema_datatypes RENAME COLUMN int_ TO int_32_",
+        "ALTER TABLE test_schema_datatypes ADD COLUMN text___migrate TEXT ENCODING DICT(16)",
+        "UPDATE test_schema_datatypes SET text___migrate = CAST(text_ AS TEXT)",
+        "ALTER TABLE test_schema_datatypes DROP COLUMN text_",
+        "ALTER TABLE test_schema_datatypes RENAME COLUMN text___migrate TO text_",
+        "ALTER TABLE test_schema_datatypes ADD (new_ DOUBLE)",
+    ]
+    assert len(sc.plan_migration(test1_tbl, test1_ddl)) == 0
+
+
+def test_plan_migration_constraints():
+    ddl = """\
+CREATE TABLE test_schema_constraints (
+  i INTEGER NOT NULL,
+  t TEXT NOT NULL DEFAULT 'a, b' ENCODING DICT(32),
+  d DOUBLE DEFAULT -1.5);"""
+    tbl = sc.Table(
+        "test_schema_constraints",
+        [sc.Column("i", sc.Integer()), sc.Column("t", sc.Text()), sc.Column("d", sc.Float(64))],
+    )
+    assert sc.parse_ddl_columns(ddl) == dict(i="INTEGER", t="TEXT ENCODING DICT(32)", d="DOUBLE")
+    assert len(sc.plan_migration(tbl, ddl)) == 0
+    # without the live types, only columns are added
+    plan = sc.plan_migration(tbl, dict(i=None, t=None))
+    assert [s.compile() for s in plan] == ["ALTER TABLE test_schema_constraints ADD (d DOUBLE)"]
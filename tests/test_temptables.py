@@ -0,0 +1,21 @@
+import os
+import datetime
+
+from omnisci_olio.workflow.temptables import created_at, created_by, sweep_temp_tables
+from tests.conftest import FakeClient
+
+
+def test_created_at():
+    name = "tmp_stage__2021__20210102030405_123_7"
+    assert created_at(name) == datetime.datetime(2021, 1, 2, 3, 4, 5)
+    assert created_by(name) == 123
+    assert created_at("tmp_stage") is None and created_by("tmp_stage") is None
+
+
+def test_sweep():
+    old = "tmp_a__20000101000000_1_1"
+    mine = f"tmp_b__20000101000000_{os.getpid()}_1"
+    recent = datetime.datetime.utcnow().strftime("tmp_c__%Y%m%d%H%M%S_1_1")
+    client = FakeClient(tables=[old, mine, recent, "tmp_other", "events"])
+    assert sweep_temp_tables(client, older_than_hours=1) == [old]
+    assert client.dropped == [old]
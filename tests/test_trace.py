@@ -0,0 +1,92 @@
+import json
+
+import pytest
+
+from omnisci_olio.pymapd import trace
+
+
+@pytest.fixture
+def spans():
+    exporter = trace.MemoryExporter()
+    trace.enable(exporter)
+    yield exporter
+    trace.disable()
+
+
+class FakeThriftClient:
+    def get_server_status(self, session):
+        return "ok"
+
+
+class FakeConnection:
+    def __init__(self):
+        self._client = FakeThriftClient()
+        self._session = "session"
+
+
+def test_disabled():
+    assert not trace.is_enabled()
+    with trace.span("noop") as s:
+        s.set(rows=1)
+    assert trace.current_span() is None
+
+
+def test_spans_and_thrift_calls(spans):
+    con = trace.instrument(FakeConnection())
+    assert trace.instrument(con)._client is con._client
+    with trace.span("store", table="t") as root:
+        con._client.get_server_status(con._session)
+        with trace.span("statement") as child:
+            assert trace.current_span() is child
+            con._client.get_server_status(con._session)
+            con._client.get_server_status(con._session)
+        root.set(rows=3)
+    with pytest.raises(ValueError):
+        with trace.span("failing"):
+            raise ValueError("bad")
+
+    assert [s.name for s in spans.spans] == ["store", "failing"]
+    assert root.children == [child]
+    # the calls of the children are counted in their parents
+    assert (root.thrift_calls, child.thrift_calls) == (3, 2)
+    assert child.trace_id == root.trace_id and root.duration_s >= child.duration_s
+    assert spans.spans[1].error == "ValueError: bad"
+    df = spans.to_dataframe()
+    assert list(df["name"]) == ["store", "statement", "failing"]
+    assert list(df["depth"]) == [0, 1, 0]
+    assert df.loc[0, "rows"] == 3 and df.loc[0, "table"] == "t"
+
+
+def test_exporters(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    received = []
+    trace.enable(trace.JsonLinesExporter(str(path)), trace.CallbackExporter(received.append))
+    try:
+        with trace.span("query", sql=object()):
+            with trace.span("fetch"):
+                pass
+    finally:
+        trace.disable()
+    assert not trace.is_enabled()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(d["name"], d["depth"]) for d in lines] == [("query", 0), ("fetch", 1)]
+    assert lines[1]["parent_span_id"] == lines[0]["span_id"]
+
+    root, child = received
+    assert child["parent_span_id"] == root["span_id"] and root["parent_span_id"] is None
+    assert root["trace_id"] == child["trace_id"] and len(root["trace_id"]) == 32
+    assert root["status_code"] == "OK" and root["end_time_unix_nano"] >= root["start_time_unix_nano"]
+    # attributes are strings, numbers or booleans
+    assert isinstance(root["attributes"]["sql"], str)
+    assert root["attributes"]["omnisci.thrift_calls"] == 0
+
+
+def test_exporter_errors_ignored(spans):
+    def fail(d):
+        raise Exception("exporter failed")
+
+    trace.enable(trace.CallbackExporter(fail))
+    with trace.span("op"):
+        pass
+    assert [s.name for s in spans.spans] == ["op"]